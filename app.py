@@ -1,11 +1,17 @@
 # app.py
-from flask import Flask, render_template, jsonify, request, session, current_app, redirect, url_for
+from flask import Flask, render_template, jsonify, session, current_app, redirect, url_for
 from flask_cors import CORS
 import logging
 import os
 
 from configuracion import Config
-from servicios.servicio_catalogo.presentacion.rutas import catalogo_bp
+from servicios.servicio_catalogo.presentacion.rutas import catalogo_bp, repositorio_producto
+from servicios.servicio_catalogo.infraestructura.indices.relacionados import iniciar_recalculo_relacionados
+from servicios.servicio_catalogo.infraestructura.analitica.registro_busquedas import iniciar_registro_busquedas
+from servicios.notificaciones.infraestructura.outbox import iniciar_despachador
+from servicios.facturacion.infraestructura.archivo_frio import iniciar_archivo
+from servicios.carrito.presentacion.rutas_carrito import carrito_bp
+from servicios.carrito.infraestructura.almacen_carritos import iniciar_purga as iniciar_purga_carritos
 from servicios.servicio_autenticacion.presentacion.rutas import auth_bp  # <- NUEVO
 from servicios.api_externa.presentacion.rutas_books import books_bp
 from servicios.api_externa.presentacion.rutas_postal import postal_bp
@@ -61,62 +67,14 @@ def crear_app():
     app.register_blueprint(ia_bp)        # <- NUEVO: /api/v1/ia/*
     app.register_blueprint(ai_dev_bp)    # <- NUEVO: /api/v1/ai/gemini-ping
     app.register_blueprint(admin_bp)     # <- NUEVO: /api/v1/admin/*
-
-    # ----------------- Carrito -----------------
-    def get_cart():
-        return session.setdefault("cart", {})
-
-    @app.get("/api/v1/cart")
-    def cart_get():
-        return jsonify(get_cart()), 200
-
-    @app.post("/api/v1/cart/add")
-    def cart_add():
-        data = request.get_json(force=True, silent=True) or {}
-        pid = data.get("id")
-        if not pid:
-            return jsonify({"ok": False, "error": "Falta id"}), 400
-        name = data.get("nombre", "Producto")
-        price = float(data.get("precio", 0))
-        img = data.get("portada_url")
-        qty = int(data.get("cantidad", 1))
-
-        cart = get_cart()
-        if pid in cart:
-            cart[pid]["cantidad"] += qty
-        else:
-            cart[pid] = {"id": pid, "nombre": name, "precio": price, "portada_url": img, "cantidad": qty}
-        session["cart"] = cart
-        return jsonify({"ok": True, "cart": cart}), 200
-
-    @app.post("/api/v1/cart/update")
-    def cart_update():
-        data = request.get_json(force=True, silent=True) or {}
-        pid = data.get("id")
-        qty = int(data.get("cantidad", 1))
-        cart = get_cart()
-        if pid not in cart:
-            return jsonify({"ok": False, "error": "No existe en carrito"}), 404
-        if qty <= 0:
-            cart.pop(pid)
-        else:
-            cart[pid]["cantidad"] = qty
-        session["cart"] = cart
-        return jsonify({"ok": True, "cart": cart}), 200
-
-    @app.post("/api/v1/cart/remove")
-    def cart_remove():
-        data = request.get_json(force=True, silent=True) or {}
-        pid = data.get("id")
-        cart = get_cart()
-        cart.pop(pid, None)
-        session["cart"] = cart
-        return jsonify({"ok": True, "cart": cart}), 200
-
-    @app.post("/api/v1/cart/clear")
-    def cart_clear():
-        session["cart"] = {}
-        return jsonify({"ok": True, "cart": {}}), 200
+    app.register_blueprint(carrito_bp)   # /api/v1/cart/* (carrito en el servidor)
+
+    # Tareas en segundo plano (por worker). Un intervalo 0 desactiva cada una.
+    iniciar_recalculo_relacionados(repositorio_producto)
+    iniciar_registro_busquedas()
+    iniciar_despachador()
+    iniciar_archivo()
+    iniciar_purga_carritos()
 
     # ----------------- Rutas base -----------------
     @app.route("/")
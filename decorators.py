@@ -1,6 +1,8 @@
+import secrets
 from functools import wraps
-from flask import request, jsonify
+from flask import request, jsonify, current_app, Response, session, g
 from configuracion import Config
+from utils import idempotencia
 from utils.jwt import decode_jwt, JWTError
 
 
@@ -11,19 +13,116 @@ def _get_bearer_token() -> str | None:
     return auth.split(" ", 1)[1].strip()
 
 
+def jwt_de_peticion() -> dict | None:
+    """Payload del Bearer de la petición actual (None sin token); JWTError si no es válido.
+    Se verifica como mucho una vez por petición: el resultado queda en flask.g."""
+    hit = g.get("_jwt")
+    if hit is None:
+        token = _get_bearer_token()
+        try:
+            hit = (decode_jwt(token, getattr(Config, "SECRET_KEY", "")) if token else None, None)
+        except JWTError as e:
+            hit = (None, e)
+        g._jwt = hit
+    if hit[1] is not None:
+        raise hit[1]
+    return hit[0]
+
+
+def es_admin_peticion() -> bool:
+    """Admin por JWT Bearer (claim is_admin) o, sin token, por la sesión + ADMIN_EMAILS."""
+    try:
+        payload = jwt_de_peticion()
+    except JWTError:
+        return False
+    if payload is not None:
+        return bool(payload.get("is_admin"))
+    email = (session.get("user_email") or "").lower().strip()
+    return bool(email and email in (getattr(Config, "ADMIN_EMAILS", []) or []))
+
+
 def admin_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        token = _get_bearer_token()
-        if not token:
-            return jsonify({"error": "Token requerido"}), 401
         try:
-            payload = decode_jwt(token, getattr(Config, "SECRET_KEY", ""))
+            payload = jwt_de_peticion()
         except JWTError as e:
             return jsonify({"error": str(e)}), 401
+        if payload is None:
+            return jsonify({"error": "Token requerido"}), 401
         if not bool(payload.get("is_admin")):
             return jsonify({"error": "No autorizado"}), 403
         # opcional: exponer payload en request context si se necesita
         return fn(*args, **kwargs)
     return wrapper
 
+
+def clave_idempotencia() -> str | None:
+    """Clave de idempotencia de la petición en curso, ya acotada a usuario y ruta (hash), para
+    reenviarla a proveedores externos; None sin cabecera Idempotency-Key."""
+    return g.get("_idempotencia_clave")
+
+
+def _llamante() -> str:
+    """Quién hace la petición, para acotar las claves de idempotencia: sub del JWT, usuario
+    de la sesión o, para invitados, un id aleatorio guardado en su cookie de sesión."""
+    try:
+        payload = jwt_de_peticion()
+    except JWTError:
+        payload = None
+    if payload and payload.get("sub"):
+        return f"jwt:{payload['sub']}"
+    if session.get("user_id") or session.get("user_email"):
+        return f"u:{session.get('user_id') or session.get('user_email')}"
+    if not session.get("idem_sid"):
+        session["idem_sid"] = secrets.token_urlsafe(12)
+    return f"s:{session['idem_sid']}"
+
+
+# Estados que no se guardan para la clave (además de 5xx): son transitorios
+_NO_GUARDAR = (409, 429)
+
+
+def idempotente(fn):
+    """Honra la cabecera Idempotency-Key: un reintento con la misma clave (mismo llamante,
+    ruta y cuerpo) recibe la respuesta original sin repetir el trabajo. El llamante es el sub
+    del JWT, el usuario de la sesión o el id de invitado de la cookie (_llamante); un cliente
+    sin token ni cookie nunca ve respuestas ajenas. Sin cabecera no cambia nada."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        clave_cliente = (request.headers.get("Idempotency-Key") or "").strip()
+        if not clave_cliente:
+            return fn(*args, **kwargs)
+        if len(clave_cliente) > 255:
+            return jsonify({"error": "Idempotency-Key demasiado larga (máx. 255)."}), 400
+
+        ambito = f"{request.method} {request.path}|{_llamante()}"
+        clave = idempotencia.clave_de(ambito, clave_cliente)
+        huella = idempotencia.huella_de(request.get_data())
+        estado, previa = idempotencia.reservar(clave, huella)
+        if estado == idempotencia.REPETIR:
+            status, mimetype, cuerpo = previa
+            resp = Response(cuerpo, status=status, mimetype=mimetype)
+            resp.headers["Idempotent-Replayed"] = "true"
+            return resp
+        if estado == idempotencia.CONFLICTO:
+            return jsonify({"error": "Idempotency-Key ya usada con otra petición."}), 422
+        if estado == idempotencia.EN_CURSO:
+            resp = jsonify({"error": "Hay una petición en curso con esta Idempotency-Key. Reintenta en unos segundos."})
+            resp.headers["Retry-After"] = "1"
+            return resp, 409
+
+        g._idempotencia_clave = clave
+        try:
+            resp = current_app.make_response(fn(*args, **kwargs))
+        except Exception:
+            idempotencia.liberar(clave)
+            raise
+        if resp.status_code >= 500 or resp.status_code in _NO_GUARDAR or resp.is_streamed:
+            # Errores transitorios (stock insuficiente, límite de peticiones, fallo interno): no se
+            # repiten; el reintento con la misma clave vuelve a ejecutar la operación
+            idempotencia.liberar(clave)
+        else:
+            idempotencia.guardar(clave, huella, resp.status_code, resp.mimetype, resp.get_data())
+        return resp
+    return wrapper
@@ -11,10 +11,13 @@ from sqlalchemy import (
     Column,
     Integer,
     String,
+    Text,
     Float,
     Enum as SAEnum,
     Boolean,
     DateTime,
+    Index,
+    LargeBinary,
     func,
 )
 from sqlalchemy.orm import sessionmaker, declarative_base
@@ -69,6 +72,116 @@ class ProductoORM(Base):
     material = Column(String, nullable=True)
     categoria = Column(String, nullable=True)          # 'Cuaderno', 'Bolígrafo', etc.
 
+    # JSON pre-renderizado del producto (to_dict + portada resuelta + bucket).
+    # Se regenera en cada escritura de admin; los listados concatenan estos bytes.
+    documento_json = Column(Text, nullable=True)
+
+
+class CatalogoMetaORM(Base):
+    """Metadatos del catálogo. clave='version' sube con cada escritura de productos
+    (los workers la comparan con la del snapshot compartido)."""
+    __tablename__ = "catalogo_meta"
+
+    clave = Column(String, primary_key=True)
+    valor = Column(Integer, nullable=False, default=0)
+
+
+class ProductoRelacionadoORM(Base):
+    """Top-K de productos relacionados por producto (co-compra + contenido).
+    La recalcula un job en segundo plano; el endpoint solo lee."""
+    __tablename__ = "producto_relacionados"
+
+    producto_id = Column(String, primary_key=True)
+    posicion = Column(Integer, primary_key=True)       # 0 = más relacionado
+    relacionado_id = Column(String, nullable=False)
+    puntaje = Column(Float, nullable=False)
+
+
+class BusquedaLogORM(Base):
+    """Búsquedas del catálogo y consultas a la IA (volcadas por lotes desde memoria)."""
+    __tablename__ = "busquedas_log"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    fuente = Column(String, nullable=False)            # 'catalogo' | 'ia'
+    consulta = Column(String, nullable=False, index=True)  # normalizada (minúsculas, sin acentos)
+    resultados = Column(Integer, nullable=False, default=0)
+    latencia_ms = Column(Float, nullable=False, default=0.0)
+    creado_en = Column(DateTime, nullable=False, index=True)
+
+
+class NotificacionORM(Base):
+    """Outbox de notificaciones (correo / Slack). Se escribe en la transacción que
+    origina el aviso y la envía un despachador en segundo plano con reintentos."""
+    __tablename__ = "notificaciones_outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    canal = Column(String, nullable=False)             # 'email' | 'slack'
+    destinatario = Column(String, nullable=True)       # email (en Slack se usa SLACK_WEBHOOK_URL)
+    asunto = Column(String, nullable=True)
+    cuerpo_html = Column(Text, nullable=True)
+    texto_plano = Column(Text, nullable=True)
+    referencia = Column(String, nullable=True)         # p.ej. 'factura:123', 'ticket:7'
+    estado = Column(String, nullable=False, default="pendiente", index=True)  # pendiente|enviando|enviado|fallido
+    intentos = Column(Integer, nullable=False, default=0)
+    proximo_intento = Column(DateTime, nullable=False, server_default=func.now(), index=True)
+    reclamado_por = Column(String, nullable=True)      # lote del despachador que la tomó
+    ultimo_error = Column(Text, nullable=True)
+    creado_en = Column(DateTime, nullable=False, server_default=func.now())
+    enviado_en = Column(DateTime, nullable=True)
+
+
+class IdempotenciaORM(Base):
+    """Respuestas guardadas por Idempotency-Key (POST de facturas y pagos). Un reintento
+    con la misma clave recibe la respuesta original en lugar de repetir el trabajo."""
+    __tablename__ = "idempotencia_claves"
+
+    clave = Column(String, primary_key=True)           # sha256(método ruta | usuario | Idempotency-Key)
+    huella = Column(String, nullable=False)            # sha256 del cuerpo de la petición original
+    estado = Column(String, nullable=False, default="en_curso")  # en_curso|completa
+    status = Column(Integer, nullable=True)
+    mimetype = Column(String, nullable=True)
+    cuerpo = Column(LargeBinary, nullable=True)
+    creada_en = Column(DateTime, nullable=False)
+    expira_en = Column(DateTime, nullable=False, index=True)
+
+
+class ArchivoMesORM(Base):
+    """Resumen por mes de lo movido al archivo frío (data/archivo/<tipo>/<YYYY-MM>.ndjson.gz).
+    id_min/id_max acotan qué archivos leer al buscar un id archivado."""
+    __tablename__ = "archivo_meses"
+
+    tipo = Column(String, primary_key=True)            # 'facturas' | 'tickets'
+    mes = Column(String, primary_key=True)             # 'YYYY-MM'
+    filas = Column(Integer, nullable=False, default=0)
+    items = Column(Integer, nullable=False, default=0)  # líneas de factura
+    total = Column(Float, nullable=False, default=0.0)  # suma de facturas.total
+    id_min = Column(Integer, nullable=True)
+    id_max = Column(Integer, nullable=True)
+    bytes = Column(Integer, nullable=True)              # tamaño confirmado del .ndjson.gz (lo que sigue es de una corrida fallida)
+    actualizado_en = Column(DateTime, nullable=False, server_default=func.now())
+
+
+class CarritoORM(Base):
+    """Carritos del storefront en el servidor; la cookie de sesión solo lleva el id.
+    clave: 's:<id de sesión>' (anónimo) o 'u:<id_usuario>'. lineas: JSON {producto_id: línea}."""
+    __tablename__ = "carritos"
+
+    clave = Column(String, primary_key=True)
+    lineas = Column(Text, nullable=False, default="{}")
+    version = Column(Integer, nullable=False, default=1)   # escritura optimista entre workers
+    actualizado_en = Column(DateTime, nullable=False, server_default=func.now(), index=True)
+
+
+class RefreshFamiliaORM(Base):
+    """Una fila por sesión (familia de refresh tokens rotativos): solo el jti vigente sirve.
+    expira_en es la exp del token vigente; pasada esa fecha ningún token de la familia es válido."""
+    __tablename__ = "refresh_familias"
+
+    familia = Column(String, primary_key=True)
+    jti = Column(String, nullable=False)
+    revocada = Column(Boolean, nullable=False, default=False)
+    expira_en = Column(DateTime, nullable=False, index=True)
+
 
 class LogisticaORM(Base):
     """Tabla de tarifas y tiempos de logística para Guatemala."""
@@ -132,6 +245,21 @@ class FacturaORM(Base):
     total = Column(Float, nullable=False, default=0.0)
     fecha = Column(DateTime, server_default=func.now(), nullable=False)
 
+    # Listados por cliente / por rango de fechas ordenados por (fecha, id) DESC
+    __table_args__ = (
+        Index("ix_facturas_user_email_fecha_id", "user_email", "fecha", "id"),
+        Index("ix_facturas_fecha_id", "fecha", "id"),
+    )
+
+
+class FacturaSecuenciaORM(Base):
+    """Contador diario de numeración de facturas (FCT-YYYYMMDD-NNNN).
+    Se incrementa con un UPDATE/UPSERT ... RETURNING dentro de la transacción de la factura."""
+    __tablename__ = "factura_secuencias"
+
+    dia = Column(String, primary_key=True)             # 'YYYYMMDD'
+    ultimo = Column(Integer, nullable=False, default=0)
+
 
 class FacturaItemORM(Base):
     __tablename__ = "factura_items"
@@ -145,6 +273,29 @@ class FacturaItemORM(Base):
     subtotal = Column(Float, nullable=False, default=0.0)
 
 
+class VentaDiariaORM(Base):
+    """Totales diarios de ventas por dimensión ('total' | 'origen' | 'pago_metodo' | 'entrega_metodo').
+    Se actualiza en la transacción de cada factura; el resumen de ventas lee solo esta tabla."""
+    __tablename__ = "ventas_diarias"
+
+    dia = Column(String, primary_key=True)             # 'YYYY-MM-DD' (de facturas.fecha)
+    dimension = Column(String, primary_key=True)
+    valor = Column(String, primary_key=True)           # p.ej. 'web', 'stripe'; '*' en 'total'
+    facturas = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0.0)
+
+
+class VentaProductoDiariaORM(Base):
+    """Unidades e ingresos diarios por producto (de factura_items)."""
+    __tablename__ = "ventas_productos_diarias"
+
+    dia = Column(String, primary_key=True)
+    producto_id = Column(String, primary_key=True)     # '' si la línea no trae producto_id
+    nombre = Column(String, nullable=False)
+    unidades = Column(Integer, nullable=False, default=0)
+    ingresos = Column(Float, nullable=False, default=0.0)
+
+
 # ----------------------------------------------------------------------
 # Helpers DB
 # ----------------------------------------------------------------------
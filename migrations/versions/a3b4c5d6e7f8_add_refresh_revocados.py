@@ -0,0 +1,32 @@
+"""add refresh_revocados (revocación de refresh tokens rotativos)
+
+Revision ID: a3b4c5d6e7f8
+Revises: f2a3b4c5d6e7
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3b4c5d6e7f8'
+down_revision: Union[str, Sequence[str], None] = 'f2a3b4c5d6e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'refresh_revocados',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('expira_en', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_refresh_revocados_expira_en', 'refresh_revocados', ['expira_en'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_refresh_revocados_expira_en', table_name='refresh_revocados')
+    op.drop_table('refresh_revocados')
@@ -0,0 +1,46 @@
+"""add notificaciones_outbox (correo/Slack en segundo plano)
+
+Revision ID: a7b8c9d0e1f2
+Revises: f6a7b8c9d0e1
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7b8c9d0e1f2'
+down_revision: Union[str, Sequence[str], None] = 'f6a7b8c9d0e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'notificaciones_outbox',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('canal', sa.String(), nullable=False),
+        sa.Column('destinatario', sa.String(), nullable=True),
+        sa.Column('asunto', sa.String(), nullable=True),
+        sa.Column('cuerpo_html', sa.Text(), nullable=True),
+        sa.Column('texto_plano', sa.Text(), nullable=True),
+        sa.Column('referencia', sa.String(), nullable=True),
+        sa.Column('estado', sa.String(), nullable=False, server_default='pendiente'),
+        sa.Column('intentos', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('proximo_intento', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('reclamado_por', sa.String(), nullable=True),
+        sa.Column('ultimo_error', sa.Text(), nullable=True),
+        sa.Column('creado_en', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('enviado_en', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_notificaciones_outbox_estado', 'notificaciones_outbox', ['estado'])
+    op.create_index('ix_notificaciones_outbox_proximo_intento', 'notificaciones_outbox', ['proximo_intento'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_notificaciones_outbox_proximo_intento', table_name='notificaciones_outbox')
+    op.drop_index('ix_notificaciones_outbox_estado', table_name='notificaciones_outbox')
+    op.drop_table('notificaciones_outbox')
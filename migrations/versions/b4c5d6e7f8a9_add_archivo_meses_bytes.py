@@ -0,0 +1,26 @@
+"""add archivo_meses.bytes (tamaño confirmado del archivo mensual)
+
+Revision ID: b4c5d6e7f8a9
+Revises: a3b4c5d6e7f8
+Create Date: 2026-10-19 23:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4c5d6e7f8a9'
+down_revision: Union[str, Sequence[str], None] = 'a3b4c5d6e7f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('archivo_meses', sa.Column('bytes', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('archivo_meses', 'bytes')
@@ -0,0 +1,27 @@
+"""add productos.documento_json (JSON pre-renderizado)
+
+Revision ID: b7c1d2e3f4a5
+Revises: a1b2c3d4e5f6
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c1d2e3f4a5'
+down_revision: Union[str, Sequence[str], None] = 'a1b2c3d4e5f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Se rellena de forma perezosa al cargar el catálogo (filas con NULL)
+    op.add_column('productos', sa.Column('documento_json', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('productos', 'documento_json')
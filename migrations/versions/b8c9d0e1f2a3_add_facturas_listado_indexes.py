@@ -0,0 +1,27 @@
+"""add composite indexes for facturas listing (keyset)
+
+Revision ID: b8c9d0e1f2a3
+Revises: a7b8c9d0e1f2
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8c9d0e1f2a3'
+down_revision: Union[str, Sequence[str], None] = 'a7b8c9d0e1f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_facturas_user_email_fecha_id', 'facturas', ['user_email', 'fecha', 'id'])
+    op.create_index('ix_facturas_fecha_id', 'facturas', ['fecha', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_facturas_fecha_id', table_name='facturas')
+    op.drop_index('ix_facturas_user_email_fecha_id', table_name='facturas')
@@ -0,0 +1,30 @@
+"""add catalogo_meta (versión del catálogo para el snapshot compartido)
+
+Revision ID: c3d4e5f6a7b8
+Revises: b7c1d2e3f4a5
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d4e5f6a7b8'
+down_revision: Union[str, Sequence[str], None] = 'b7c1d2e3f4a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'catalogo_meta',
+        sa.Column('clave', sa.String(), primary_key=True),
+        sa.Column('valor', sa.Integer(), nullable=False, server_default='0'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('catalogo_meta')
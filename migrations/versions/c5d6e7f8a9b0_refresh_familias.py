@@ -0,0 +1,43 @@
+"""refresh_familias reemplaza a refresh_revocados (una fila por sesión, no por jti usado)
+
+Revision ID: c5d6e7f8a9b0
+Revises: b4c5d6e7f8a9
+Create Date: 2026-10-20 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d6e7f8a9b0'
+down_revision: Union[str, Sequence[str], None] = 'b4c5d6e7f8a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'refresh_familias',
+        sa.Column('familia', sa.String(), primary_key=True),
+        sa.Column('jti', sa.String(), nullable=False),
+        sa.Column('revocada', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('expira_en', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_refresh_familias_expira_en', 'refresh_familias', ['expira_en'])
+    # Los refresh tokens emitidos antes no tienen familia registrada: se vuelve a iniciar sesión
+    op.drop_index('ix_refresh_revocados_expira_en', table_name='refresh_revocados')
+    op.drop_table('refresh_revocados')
+
+
+def downgrade() -> None:
+    op.create_table(
+        'refresh_revocados',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('expira_en', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_refresh_revocados_expira_en', 'refresh_revocados', ['expira_en'])
+    op.drop_index('ix_refresh_familias_expira_en', table_name='refresh_familias')
+    op.drop_table('refresh_familias')
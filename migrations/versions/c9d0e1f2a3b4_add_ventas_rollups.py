@@ -0,0 +1,42 @@
+"""add ventas_diarias / ventas_productos_diarias (rollups de ventas)
+
+Revision ID: c9d0e1f2a3b4
+Revises: b8c9d0e1f2a3
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9d0e1f2a3b4'
+down_revision: Union[str, Sequence[str], None] = 'b8c9d0e1f2a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ventas_diarias',
+        sa.Column('dia', sa.String(), primary_key=True),
+        sa.Column('dimension', sa.String(), primary_key=True),
+        sa.Column('valor', sa.String(), primary_key=True),
+        sa.Column('facturas', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total', sa.Float(), nullable=False, server_default='0'),
+    )
+    op.create_table(
+        'ventas_productos_diarias',
+        sa.Column('dia', sa.String(), primary_key=True),
+        sa.Column('producto_id', sa.String(), primary_key=True),
+        sa.Column('nombre', sa.String(), nullable=False),
+        sa.Column('unidades', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('ingresos', sa.Float(), nullable=False, server_default='0'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('ventas_productos_diarias')
+    op.drop_table('ventas_diarias')
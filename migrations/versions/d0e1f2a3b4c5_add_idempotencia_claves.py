@@ -0,0 +1,38 @@
+"""add idempotencia_claves (respuestas por Idempotency-Key)
+
+Revision ID: d0e1f2a3b4c5
+Revises: c9d0e1f2a3b4
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd0e1f2a3b4c5'
+down_revision: Union[str, Sequence[str], None] = 'c9d0e1f2a3b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'idempotencia_claves',
+        sa.Column('clave', sa.String(), primary_key=True),
+        sa.Column('huella', sa.String(), nullable=False),
+        sa.Column('estado', sa.String(), nullable=False, server_default='en_curso'),
+        sa.Column('status', sa.Integer(), nullable=True),
+        sa.Column('mimetype', sa.String(), nullable=True),
+        sa.Column('cuerpo', sa.LargeBinary(), nullable=True),
+        sa.Column('creada_en', sa.DateTime(), nullable=False),
+        sa.Column('expira_en', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_idempotencia_claves_expira_en', 'idempotencia_claves', ['expira_en'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_idempotencia_claves_expira_en', table_name='idempotencia_claves')
+    op.drop_table('idempotencia_claves')
@@ -0,0 +1,32 @@
+"""add producto_relacionados (top-K precalculado)
+
+Revision ID: d4e5f6a7b8c9
+Revises: c3d4e5f6a7b8
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e5f6a7b8c9'
+down_revision: Union[str, Sequence[str], None] = 'c3d4e5f6a7b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'producto_relacionados',
+        sa.Column('producto_id', sa.String(), primary_key=True),
+        sa.Column('posicion', sa.Integer(), primary_key=True),
+        sa.Column('relacionado_id', sa.String(), nullable=False),
+        sa.Column('puntaje', sa.Float(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('producto_relacionados')
@@ -0,0 +1,36 @@
+"""add archivo_meses (resumen del archivo frío de facturas/tickets)
+
+Revision ID: e1f2a3b4c5d6
+Revises: d0e1f2a3b4c5
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1f2a3b4c5d6'
+down_revision: Union[str, Sequence[str], None] = 'd0e1f2a3b4c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'archivo_meses',
+        sa.Column('tipo', sa.String(), primary_key=True),
+        sa.Column('mes', sa.String(), primary_key=True),
+        sa.Column('filas', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('items', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('id_min', sa.Integer(), nullable=True),
+        sa.Column('id_max', sa.Integer(), nullable=True),
+        sa.Column('actualizado_en', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('archivo_meses')
@@ -0,0 +1,38 @@
+"""add busquedas_log (analítica de búsquedas)
+
+Revision ID: e5f6a7b8c9d0
+Revises: d4e5f6a7b8c9
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f6a7b8c9d0'
+down_revision: Union[str, Sequence[str], None] = 'd4e5f6a7b8c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'busquedas_log',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('fuente', sa.String(), nullable=False),
+        sa.Column('consulta', sa.String(), nullable=False),
+        sa.Column('resultados', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('latencia_ms', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('creado_en', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_busquedas_log_consulta', 'busquedas_log', ['consulta'])
+    op.create_index('ix_busquedas_log_creado_en', 'busquedas_log', ['creado_en'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_busquedas_log_creado_en', table_name='busquedas_log')
+    op.drop_index('ix_busquedas_log_consulta', table_name='busquedas_log')
+    op.drop_table('busquedas_log')
@@ -0,0 +1,34 @@
+"""add carritos (carrito en el servidor, cookie solo con el id)
+
+Revision ID: f2a3b4c5d6e7
+Revises: e1f2a3b4c5d6
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a3b4c5d6e7'
+down_revision: Union[str, Sequence[str], None] = 'e1f2a3b4c5d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'carritos',
+        sa.Column('clave', sa.String(), primary_key=True),
+        sa.Column('lineas', sa.Text(), nullable=False, server_default='{}'),
+        sa.Column('version', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('actualizado_en', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index('ix_carritos_actualizado_en', 'carritos', ['actualizado_en'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_carritos_actualizado_en', table_name='carritos')
+    op.drop_table('carritos')
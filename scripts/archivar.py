@@ -0,0 +1,34 @@
+"""Mueve facturas (con sus items) y tickets cerrados viejos al archivo frío.
+
+Uso:
+  python scripts/archivar.py [--horizonte-dias 365] [--lote 500]
+
+Se archivan meses completos anteriores a (hoy - horizonte) en
+ARCHIVO_DIR/<facturas|tickets>/<YYYY-MM>.ndjson.gz y se borran de las tablas por lotes.
+Usa SQLALCHEMY_DATABASE_URI/DATABASE_URL o la SQLite por defecto.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--horizonte-dias", type=int, default=None, help="antigüedad mínima (def. ARCHIVO_HORIZONTE_DIAS=365)")
+    ap.add_argument("--lote", type=int, default=500, help="filas por transacción")
+    args = ap.parse_args()
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+    from inicializar_db import resolve_db_uri, get_engine_and_session
+    from servicios.facturacion.infraestructura import archivo_frio, rollups_ventas
+
+    engine, _ = get_engine_and_session(resolve_db_uri())
+    rollups_ventas.asegurar_tablas(engine)
+    res = archivo_frio.archivar(horizonte_dias=args.horizonte_dias, lote=args.lote)
+    print(f"Archivado: {res}")
+    for m in archivo_frio.resumen_meses():
+        print(f"  {m['tipo']:<8} {m['mes']}  filas={m['filas']:<6} items={m['items']:<7} total=Q{m['total']:,.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""Reconstruye los rollups de ventas (ventas_diarias / ventas_productos_diarias).
+
+Uso:
+  python scripts/backfill_ventas.py [--desde 2025-01-01] [--hasta 2025-12-31]
+
+Sin rango recalcula todo el historial. Usa SQLALCHEMY_DATABASE_URI/DATABASE_URL o la SQLite por defecto.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--desde", help="primer día (YYYY-MM-DD, inclusivo)")
+    ap.add_argument("--hasta", help="último día (YYYY-MM-DD, inclusivo)")
+    args = ap.parse_args()
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+    from inicializar_db import resolve_db_uri, get_engine_and_session
+    from servicios.facturacion.infraestructura import rollups_ventas
+
+    engine, _ = get_engine_and_session(resolve_db_uri())
+    rollups_ventas.asegurar_tablas(engine)
+    res = rollups_ventas.recalcular(desde=args.desde, hasta=args.hasta)
+    print(f"Rollups reconstruidos: {res}")
+
+
+if __name__ == "__main__":
+    main()
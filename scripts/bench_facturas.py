@@ -0,0 +1,96 @@
+"""Benchmark de creación de facturas (POST /api/v1/facturas, flujo POS).
+
+Uso:
+  python scripts/bench_facturas.py [--n 200] [--lineas 30] [--lote 50]
+
+Con --lote N envía las facturas en lotes de N a POST /api/v1/facturas/batch (POS sin conexión)
+y reporta el tiempo por factura.
+
+Sin SQLALCHEMY_DATABASE_URI usa una SQLite temporal (no toca la DB del proyecto).
+Con SQLALCHEMY_DATABASE_URI/DATABASE_URL apunta a esa DB (¡crea facturas reales!).
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200, help="facturas a crear")
+    ap.add_argument("--lineas", type=int, default=30, help="líneas por factura")
+    ap.add_argument("--lote", type=int, default=0, help="facturas por petición a /facturas/batch (0 = una por POST)")
+    args = ap.parse_args()
+
+    if not (os.getenv("SQLALCHEMY_DATABASE_URI") or os.getenv("DATABASE_URL")):
+        tmp = Path(tempfile.mkdtemp()) / "bench.sqlite"
+        os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp.as_posix()}"
+    os.environ.setdefault("RELACIONADOS_INTERVALO", "0")
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+    from inicializar_db import Base, resolve_db_uri, get_engine_and_session
+    engine, _ = get_engine_and_session(resolve_db_uri())
+    Base.metadata.create_all(engine)
+
+    # Productos reales con stock de sobra: crear_factura descuenta stock (FACTURAS_RESERVAR_STOCK)
+    from inicializar_db import ProductoORM, TipoProductoEnum
+    _, Session = get_engine_and_session(resolve_db_uri())
+    with Session() as s:
+        for i in range(args.lineas):
+            s.merge(ProductoORM(id_producto=f"BENCH{i:03d}", nombre=f"Producto {i}", precio=10 + i,
+                                stock=10 ** 9, tipo=TipoProductoEnum.UTIL, categoria="Bench"))
+        s.commit()
+
+    from app import crear_app
+    app = crear_app()
+    client = app.test_client()
+    # Como el POS: sesión admin (el lote y los precios/origen propios lo requieren)
+    from configuracion import Config
+    with client.session_transaction() as ss:
+        ss["user_email"] = (Config.ADMIN_EMAILS or ["admin@libreriajireh.com"])[0]
+    Config.ADMIN_EMAILS = list(Config.ADMIN_EMAILS or []) or [ss["user_email"]]
+
+    payload = {
+        "origen": "tienda",
+        "items": [
+            {"id": f"BENCH{i:03d}", "nombre": f"Producto {i}", "precio": 10 + i, "cantidad": 1 + i % 3}
+            for i in range(args.lineas)
+        ],
+    }
+    # Calentamiento (engine, esquema, primera secuencia del día)
+    client.post("/api/v1/facturas", json=payload)
+
+    if args.lote > 0:
+        t0 = time.perf_counter()
+        enviadas = 0
+        while enviadas < args.n:
+            k = min(args.lote, args.n - enviadas)
+            r = client.post("/api/v1/facturas/batch", json={"facturas": [payload] * k})
+            if r.status_code != 200 or r.get_json()["creadas"] != k:
+                print(f"Fallo: {r.status_code} {r.get_data(as_text=True)[:300]}")
+                return
+            enviadas += k
+        ms = (time.perf_counter() - t0) * 1000
+        print(f"{args.n} facturas x {args.lineas} líneas en lotes de {args.lote}")
+        print(f"  total {ms:.0f} ms | {ms / args.n:.2f} ms por factura")
+        return
+
+    tiempos = []
+    for _ in range(args.n):
+        t0 = time.perf_counter()
+        r = client.post("/api/v1/facturas", json=payload)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+        if r.status_code != 201:
+            print(f"Fallo: {r.status_code} {r.get_data(as_text=True)}")
+            return
+
+    tiempos.sort()
+    p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+    print(f"{args.n} facturas x {args.lineas} líneas")
+    print(f"  media {statistics.mean(tiempos):.2f} ms | p50 {statistics.median(tiempos):.2f} ms | p95 {p95:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Microbenchmark de la verificación JWT en la ruta de autorización admin.
+
+Compara, por petición simulada (N llamadas a _is_admin_request dentro de un mismo
+request context, como hacen las rutas admin que validan más de una vez):
+  - sin caché: HMAC + base64 + json.loads en cada llamada (utils.jwt._verificar)
+  - LRU: decode_jwt con el LRU de tokens verificados
+  - LRU + flask.g: jwt_de_peticion (una verificación por petición como mucho)
+
+Uso:
+  python scripts/bench_jwt.py [--peticiones 20000] [--llamadas 3]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+
+def _medir(nombre: str, peticiones: int, fn) -> None:
+    t0 = time.perf_counter()
+    for _ in range(peticiones):
+        fn()
+    dt = time.perf_counter() - t0
+    print(f"{nombre:<16} {dt * 1e6 / peticiones:8.2f} µs/petición  ({peticiones / dt:,.0f} peticiones/s)")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--peticiones", type=int, default=20000)
+    ap.add_argument("--llamadas", type=int, default=3, help="verificaciones por petición")
+    args = ap.parse_args()
+
+    os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite://")
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+    from flask import Flask, request
+    from configuracion import Config
+    from decorators import jwt_de_peticion
+    from utils.jwt import create_jwt, decode_jwt, _verificar
+
+    secreto = getattr(Config, "SECRET_KEY", "") or "bench"
+    Config.SECRET_KEY = secreto
+    token = create_jwt({"sub": "u-admin", "email": "admin@libreriajireh.com", "nombre": "Admin", "is_admin": True},
+                       secret=secreto, expires_in=3600)
+    app = Flask(__name__)
+    cabeceras = {"Authorization": f"Bearer {token}"}
+    n = args.llamadas
+
+    def bearer():
+        return request.headers.get("Authorization", "").split(" ", 1)[1].strip()
+
+    def vacio():
+        pass
+
+    def sin_cache():
+        for _ in range(n):
+            assert _verificar(bearer(), secreto)["is_admin"]
+
+    def lru():
+        for _ in range(n):
+            assert decode_jwt(bearer(), secreto)["is_admin"]
+
+    # El request context se crea igual en los tres casos para comparar solo la verificación
+    def en_peticion(fn):
+        def correr():
+            with app.test_request_context("/api/v1/admin/check", headers=cabeceras):
+                fn()
+        return correr
+
+    def con_g():
+        for _ in range(n):
+            assert jwt_de_peticion()["is_admin"]
+
+    print(f"{args.peticiones} peticiones x {n} verificaciones (restar el costo del contexto vacío)")
+    _medir("contexto vacío", args.peticiones, en_peticion(vacio))
+    _medir("sin caché", args.peticiones, en_peticion(sin_cache))
+    _medir("LRU", args.peticiones, en_peticion(lru))
+    _medir("LRU + flask.g", args.peticiones, en_peticion(con_g))
+
+
+if __name__ == "__main__":
+    main()
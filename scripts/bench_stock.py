@@ -0,0 +1,101 @@
+"""Benchmark de checkouts concurrentes contra un producto con poco stock.
+
+Varios hilos crean facturas (POST /api/v1/facturas) que compran el mismo producto
+"caliente" más uno de relleno. Al final verifica que no hubo sobreventa:
+stock_final == stock_inicial - unidades_vendidas y nunca negativo.
+
+Uso:
+  python scripts/bench_stock.py [--hilos 8] [--pedidos 50] [--stock 100] [--cantidad 1]
+
+Sin SQLALCHEMY_DATABASE_URI usa una SQLite temporal (no toca la DB del proyecto).
+Con SQLALCHEMY_DATABASE_URI/DATABASE_URL apunta a esa DB (¡crea facturas y descuenta stock reales!).
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--hilos", type=int, default=8, help="checkouts simultáneos")
+    ap.add_argument("--pedidos", type=int, default=50, help="facturas por hilo")
+    ap.add_argument("--stock", type=int, default=100, help="stock inicial del producto caliente")
+    ap.add_argument("--cantidad", type=int, default=1, help="unidades del producto caliente por factura")
+    args = ap.parse_args()
+
+    if not (os.getenv("SQLALCHEMY_DATABASE_URI") or os.getenv("DATABASE_URL")):
+        tmp = Path(tempfile.mkdtemp()) / "bench.sqlite"
+        os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp.as_posix()}"
+    os.environ.setdefault("RELACIONADOS_INTERVALO", "0")
+    os.environ.setdefault("OUTBOX_INTERVALO", "0")
+    os.environ["FACTURAS_RESERVAR_STOCK"] = "true"
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+    from inicializar_db import Base, ProductoORM, TipoProductoEnum, resolve_db_uri, get_engine_and_session
+    engine, Session = get_engine_and_session(resolve_db_uri())
+    Base.metadata.create_all(engine)
+    with Session() as s:
+        s.merge(ProductoORM(id_producto="BENCH-HOT", nombre="Producto caliente", precio=50,
+                            stock=args.stock, tipo=TipoProductoEnum.UTIL, categoria="Bench"))
+        s.merge(ProductoORM(id_producto="BENCH-RELLENO", nombre="Relleno", precio=5,
+                            stock=10 ** 9, tipo=TipoProductoEnum.UTIL, categoria="Bench"))
+        s.commit()
+
+    from app import crear_app
+    app = crear_app()
+
+    payload = {
+        "origen": "tienda",
+        "items": [
+            {"id": "BENCH-HOT", "nombre": "Producto caliente", "precio": 50, "cantidad": args.cantidad},
+            {"id": "BENCH-RELLENO", "nombre": "Relleno", "precio": 5, "cantidad": 2},
+        ],
+    }
+    tiempos = []
+    conteo = {"ok": 0, "sin_stock": 0, "otros": 0}
+    lock = threading.Lock()
+
+    def trabajador() -> None:
+        client = app.test_client()
+        for _ in range(args.pedidos):
+            t0 = time.perf_counter()
+            r = client.post("/api/v1/facturas", json=payload)
+            ms = (time.perf_counter() - t0) * 1000
+            clave = "ok" if r.status_code == 201 else "sin_stock" if r.status_code == 409 else "otros"
+            with lock:
+                tiempos.append(ms)
+                conteo[clave] += 1
+                if clave == "otros" and conteo["otros"] <= 3:
+                    print(f"Fallo: {r.status_code} {r.get_data(as_text=True)[:200]}")
+
+    hilos = [threading.Thread(target=trabajador) for _ in range(args.hilos)]
+    t0 = time.perf_counter()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    duracion = time.perf_counter() - t0
+
+    with Session() as s:
+        final = s.get(ProductoORM, "BENCH-HOT").stock
+    vendidas = conteo["ok"] * args.cantidad
+    esperado = args.stock - vendidas
+
+    tiempos.sort()
+    p95 = tiempos[max(0, int(len(tiempos) * 0.95) - 1)]
+    print(f"{args.hilos} hilos x {args.pedidos} checkouts | stock inicial {args.stock}")
+    print(f"  201: {conteo['ok']} | 409 sin stock: {conteo['sin_stock']} | otros: {conteo['otros']}")
+    print(f"  p50 {statistics.median(tiempos):.2f} ms | p95 {p95:.2f} ms | {len(tiempos) / duracion:.1f} checkouts/s")
+    print(f"  stock final {final} (esperado {esperado})")
+    if final != esperado or final < 0:
+        print("  ERROR: sobreventa o stock inconsistente")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ from sqlalchemy.orm import sessionmaker
 from configuracion import Config
 from inicializar_db import Base, ProductoORM, TipoProductoEnum
 from servicios.admin.infraestructura.productos_repo import AdminProductosRepo
+from servicios.servicio_catalogo.infraestructura.persistencia.pg_repositorio_producto import PGRepositorioProducto
 
 
 def migrate_sqlite_admin_to_postgres() -> Dict[str, Any]:
@@ -75,5 +76,7 @@ def migrate_sqlite_admin_to_postgres() -> Dict[str, Any]:
                 ))
                 created += 1
         s.commit()
+    # Re-renderiza productos.documento_json (también invalida el catálogo en memoria)
+    PGRepositorioProducto().regenerar_documentos()
     return {"created": created, "updated": updated, "total": len(items)}
 
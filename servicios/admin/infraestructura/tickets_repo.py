@@ -15,6 +15,12 @@ class TicketsRepo:
     Repositorio SQLite para tickets de soporte generados por la IA.
     """
 
+    # Columnas proyectables en listar(campos=...) (?fields= del admin)
+    CAMPOS = (
+        "id", "question", "answer", "status", "user_email", "provider", "error", "priority",
+        "tags", "notes", "assigned_to", "assigned_by", "created_at", "updated_at",
+    )
+
     def _conn(self):
         conn = sqlite3.connect(str(CATALOGO_DB))
         conn.row_factory = sqlite3.Row
@@ -68,17 +74,20 @@ class TicketsRepo:
             )
             return int(cur.lastrowid)
 
-    def listar(self, *, status: Optional[str] = None, limit: int = 50, page: int = 1) -> List[Dict[str, Any]]:
+    def listar(self, *, status: Optional[str] = None, limit: int = 50, page: int = 1,
+               campos: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         offset = max(0, (int(page) - 1) * int(limit))
+        # Solo columnas conocidas (los nombres se interpolan en el SQL)
+        cols = ", ".join(c for c in (campos or []) if c in self.CAMPOS) or "*"
         with self._conn() as c:
             if status:
                 rows = c.execute(
-                    "SELECT * FROM tickets WHERE status = ? ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                    f"SELECT {cols} FROM tickets WHERE status = ? ORDER BY created_at DESC LIMIT ? OFFSET ?",
                     (status, int(limit), offset),
                 ).fetchall()
             else:
                 rows = c.execute(
-                    "SELECT * FROM tickets ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                    f"SELECT {cols} FROM tickets ORDER BY created_at DESC LIMIT ? OFFSET ?",
                     (int(limit), offset),
                 ).fetchall()
             return [dict(r) for r in rows]
@@ -117,3 +126,21 @@ class TicketsRepo:
                 (status, answer, notes, int(ticket_id)),
             )
             return cur.rowcount > 0
+
+    # Archivo frío ----------------------------------------------
+    def cerrados_antes(self, antes: str, limite: int) -> List[Dict[str, Any]]:
+        """Tickets resueltos/cerrados sin cambios desde antes de `antes` ('YYYY-MM-DD ...'), por id."""
+        with self._conn() as c:
+            rows = c.execute(
+                "SELECT * FROM tickets WHERE status IN ('resolved', 'closed') AND updated_at < ? ORDER BY id LIMIT ?",
+                (antes, int(limite)),
+            ).fetchall()
+            return [dict(r) for r in rows]
+
+    def eliminar(self, ids: List[int]) -> int:
+        if not ids:
+            return 0
+        with self._conn() as c:
+            marcas = ",".join("?" for _ in ids)
+            cur = c.execute(f"DELETE FROM tickets WHERE id IN ({marcas})", [int(i) for i in ids])
+            return cur.rowcount
@@ -1,22 +1,39 @@
 from __future__ import annotations
 
-from flask import Blueprint, request, jsonify, session, current_app
+from flask import Blueprint, Response, request, jsonify, session, current_app
 from werkzeug.utils import secure_filename
 from sqlalchemy import create_engine, text
 import os
 import re
-import requests
+from datetime import date, datetime, timedelta
 from io import BytesIO
 from typing import Any, Dict
 from pathlib import Path
 
 from configuracion import Config
-from utils.jwt import decode_jwt, JWTError
+from decorators import es_admin_peticion, jwt_de_peticion
+from utils.jwt import JWTError
+from utils.campos import parsear_campos
 from servicios.admin.infraestructura.tickets_repo import TicketsRepo
+from servicios.servicio_catalogo.infraestructura.indices.catalogo_columnar import invalidar_catalogo
+from servicios.servicio_catalogo.infraestructura.persistencia.pg_repositorio_producto import PGRepositorioProducto
+from servicios.servicio_catalogo.infraestructura.analitica import registro_busquedas
+from servicios.notificaciones.infraestructura import outbox
+from servicios.facturacion.infraestructura import archivo_frio, exportar_facturas, rollups_ventas
 
 
 admin_bp = Blueprint("admin_bp", __name__, url_prefix="/api/v1/admin")
 _tickets_repo = TicketsRepo()
+_productos_repo = PGRepositorioProducto()
+
+
+def _regenerar_documentos(*ids: str) -> None:
+    """Re-renderiza productos.documento_json y sube la versión del catálogo (sin ids: todo)."""
+    try:
+        _productos_repo.regenerar_documentos(list(ids) if ids else None)
+    except Exception:
+        current_app.logger.exception("Regenerar documento_json fallo")
+        invalidar_catalogo()
 
 
 def _is_admin() -> bool:
@@ -52,15 +69,7 @@ def _ensure_schema():
 
 def _is_admin_request() -> bool:
     """Permite validar admin via JWT Bearer o via sesión como fallback."""
-    auth = (request.headers.get("Authorization") or "").strip()
-    if auth.lower().startswith("bearer "):
-        token = auth.split(" ", 1)[1].strip()
-        try:
-            payload = decode_jwt(token, getattr(Config, 'SECRET_KEY', ''))
-            return bool(payload.get("is_admin"))
-        except JWTError:
-            return False
-    return _is_admin()
+    return es_admin_peticion()
 
 
 # tickets opcional: no es necesario calentar para productos en Neon
@@ -69,14 +78,12 @@ def _is_admin_request() -> bool:
 @admin_bp.get("/check")
 def admin_check():
     # Preferir JWT si viene en Authorization: Bearer
-    auth = request.headers.get("Authorization") or ""
-    if auth.lower().startswith("bearer "):
-        token = auth.split(" ", 1)[1].strip()
-        try:
-            payload = decode_jwt(token, getattr(Config, 'SECRET_KEY', ''))
-            return jsonify({"admin": bool(payload.get("is_admin"))}), 200
-        except JWTError:
-            return jsonify({"admin": False}), 200
+    try:
+        payload = jwt_de_peticion()
+    except JWTError:
+        return jsonify({"admin": False}), 200
+    if payload is not None:
+        return jsonify({"admin": bool(payload.get("is_admin"))}), 200
     # Fallback compatibilidad: sesión + ADMIN_EMAILS
     return jsonify({"admin": _is_admin()}), 200
 
@@ -90,7 +97,10 @@ def admin_listar_tickets():
     status = request.args.get("status")
     page = int(request.args.get("page", "1") or 1)
     limit = int(request.args.get("limit", "50") or 50)
-    data = _tickets_repo.listar(status=status, page=page, limit=limit)
+    campos, err = parsear_campos(request.args.get("fields"), TicketsRepo.CAMPOS)
+    if err:
+        return jsonify({"error": err}), 400
+    data = _tickets_repo.listar(status=status, page=page, limit=limit, campos=campos)
     return jsonify(data), 200
 
 
@@ -100,7 +110,10 @@ def admin_obtener_ticket(ticket_id: int):
         return jsonify({"error": "No autorizado"}), 403
     tk = _tickets_repo.obtener(ticket_id)
     if not tk:
-        return jsonify({"error": "No existe"}), 404
+        archivado = archivo_frio.buscar("tickets", ticket_id)
+        if archivado is None:
+            return jsonify({"error": "No existe"}), 404
+        return jsonify(dict(archivado, archivado=True)), 200
     return jsonify(tk), 200
 
 
@@ -118,35 +131,26 @@ def admin_asignar_ticket(ticket_id: int):
     ok = _tickets_repo.asignar(ticket_id, assigned_to, assigned_by=assigned_by, notes=notes, priority=priority)
     if not ok:
         return jsonify({"error": "No se pudo asignar (ticket no existe?)"}), 404
-    # Notificar por correo si assigned_to parece un email y SMTP está configurado
+    # Notificaciones (correo y Slack) al outbox: las envía el despachador en segundo plano
     try:
+        detalle = _tickets_repo.obtener(ticket_id) or {}
+        prioridad = priority or detalle.get('priority') or 'normal'
+        referencia = f"ticket:{ticket_id}"
         if re.search(r"@", assigned_to):
-            from servicios.servicio_autenticacion.infraestructura.clientes_externos.google_smtp_cliente import GoogleSMTPCliente
-            smtp = GoogleSMTPCliente()
-            asunto = f"Nuevo ticket asignado #{ticket_id}"
-            detalle = _tickets_repo.obtener(ticket_id) or {}
             html = f"""
                 <h3>Ticket asignado</h3>
                 <p><strong>ID:</strong> {ticket_id}</p>
                 <p><strong>Pregunta:</strong> { (detalle.get('question') or '')[:400] }</p>
                 <p><strong>Estado:</strong> {detalle.get('status') or 'assigned'}</p>
-                <p><strong>Prioridad:</strong> {priority or (detalle.get('priority') or 'normal')}</p>
+                <p><strong>Prioridad:</strong> {prioridad}</p>
                 <p><strong>Notas:</strong> {notes or ''}</p>
                 <hr>
                 <p>Ir al panel: <a href="{getattr(Config, 'APP_BASE_URL', 'http://127.0.0.1:5000')}/admin">Administración</a></p>
             """
-            smtp.enviar_correo(destinatario=assigned_to, asunto=asunto, cuerpo_html=html)
+            outbox.encolar_email(assigned_to, f"Nuevo ticket asignado #{ticket_id}", html, referencia=referencia)
+        outbox.encolar_slack(f"Ticket #{ticket_id} asignado a {assigned_to}. Prioridad: {prioridad}.", referencia=referencia)
     except Exception:
-        pass
-    # Slack opcional
-    try:
-        webhook = os.getenv('SLACK_WEBHOOK_URL')
-        if webhook:
-            detalle = _tickets_repo.obtener(ticket_id) or {}
-            text = f"Ticket #{ticket_id} asignado a {assigned_to}. Prioridad: {priority or detalle.get('priority') or 'normal'}."
-            requests.post(webhook, json={"text": text}, timeout=5)
-    except Exception:
-        pass
+        current_app.logger.exception("No se pudo encolar la notificación del ticket")
     return jsonify({"ok": True}), 200
 
 
@@ -291,7 +295,8 @@ def admin_crear_producto():
                     'categoria': data.get('categoria') if data.get('tipo')=='UtilEscolar' else None,
                     'img': data.get('portada_url')
                 })
-                return jsonify({"ok": True, "id": pid}), 201
+            _regenerar_documentos(pid)
+            return jsonify({"ok": True, "id": pid}), 201
     except Exception:
         current_app.logger.exception("PG crear producto fallo")
         return jsonify({"error": "No se pudo crear"}), 500
@@ -326,7 +331,8 @@ def admin_actualizar_producto(pid: str):
                     params = {k:v for k,v in fields.items() if v is not None}
                     params['id'] = pid
                     conn.execute(text(f"UPDATE productos SET {sets} WHERE id_producto = :id"), params)
-                return jsonify({"ok": True, "id": pid}), 200
+            _regenerar_documentos(pid)
+            return jsonify({"ok": True, "id": pid}), 200
     except Exception:
         current_app.logger.exception("PG actualizar producto fallo")
         return jsonify({"error": "No se pudo actualizar"}), 500
@@ -343,12 +349,194 @@ def admin_eliminar_producto(pid: str):
         engine = create_engine(db_url, future=True)
         with engine.begin() as conn:
             conn.execute(text("DELETE FROM productos WHERE id_producto = :id"), {"id": pid})
-            return jsonify({"ok": True}), 200
+        # Sin fila que re-renderizar: solo sube la versión del catálogo e invalida
+        _regenerar_documentos(pid)
+        return jsonify({"ok": True}), 200
     except Exception:
         current_app.logger.exception("PG eliminar producto fallo")
         return jsonify({"error": "No se pudo eliminar"}), 500
 
 
+# ---------------- Analítica de búsquedas -----------------
+
+@admin_bp.get("/busquedas")
+def admin_resumen_busquedas():
+    """Top consultas y top consultas sin resultados.
+    Query: dias (1..90, def. 7), limit (1..100, def. 20), fuente ('catalogo' | 'ia', opcional)
+    """
+    if not _is_admin_request():
+        return jsonify({"error": "No autorizado"}), 403
+    try:
+        dias = max(1, min(int(request.args.get("dias", 7) or 7), 90))
+        limite = max(1, min(int(request.args.get("limit", 20) or 20), 100))
+    except ValueError:
+        return jsonify({"error": "dias/limit deben ser enteros"}), 400
+    fuente = (request.args.get("fuente") or "").strip() or None
+    try:
+        # Incluir lo que aún está en memoria de este worker
+        registro_busquedas.volcar()
+        return jsonify(registro_busquedas.resumen(dias=dias, limite=limite, fuente=fuente)), 200
+    except Exception:
+        current_app.logger.exception("Resumen de búsquedas fallo")
+        return jsonify({"error": "No se pudo obtener el resumen"}), 500
+
+
+# ---------------- Outbox de notificaciones -----------------
+
+@admin_bp.get("/notificaciones")
+def admin_listar_notificaciones():
+    """Estado de entrega del outbox: conteos por estado y últimas notificaciones.
+    Query: estado ('pendiente' | 'enviando' | 'enviado' | 'fallido'), referencia (p.ej. 'factura:12'), limit (1..200, def. 50)
+    """
+    if not _is_admin_request():
+        return jsonify({"error": "No autorizado"}), 403
+    estado = (request.args.get("estado") or "").strip() or None
+    if estado and estado not in outbox.ESTADOS:
+        return jsonify({"error": "estado inválido"}), 400
+    referencia = (request.args.get("referencia") or "").strip() or None
+    try:
+        limite = max(1, min(int(request.args.get("limit", 50) or 50), 200))
+    except ValueError:
+        return jsonify({"error": "limit debe ser entero"}), 400
+    try:
+        return jsonify(outbox.estado_outbox(estado=estado, referencia=referencia, limite=limite)), 200
+    except Exception:
+        current_app.logger.exception("Estado del outbox fallo")
+        return jsonify({"error": "No se pudo obtener el estado"}), 500
+
+
+@admin_bp.post("/notificaciones/<int:notificacion_id>/reintentar")
+def admin_reintentar_notificacion(notificacion_id: int):
+    if not _is_admin_request():
+        return jsonify({"error": "No autorizado"}), 403
+    if not outbox.reintentar(notificacion_id):
+        return jsonify({"error": "No existe o ya fue enviada"}), 404
+    return jsonify({"ok": True}), 200
+
+
+# ---------------- Resumen de ventas (rollups) -----------------
+
+def _rango_dias(params) -> tuple[str | None, str | None, str | None]:
+    """(desde, hasta, error) como 'YYYY-MM-DD' validados. Acepta desde/hasta o from/to."""
+    out = []
+    for k, alias in (("desde", "from"), ("hasta", "to")):
+        v = (params.get(k) or params.get(alias) or "").strip() or None
+        if v:
+            try:
+                v = date.fromisoformat(v).isoformat()
+            except ValueError:
+                return None, None, f"'{k}' debe tener formato YYYY-MM-DD"
+        out.append(v)
+    return out[0], out[1], None
+
+
+@admin_bp.get("/ventas/resumen")
+def admin_resumen_ventas():
+    """Totales por origen, método de pago, método de entrega, por día y top productos.
+    Lee solo las tablas de rollups (no recorre facturas).
+    Query: desde / hasta (YYYY-MM-DD, inclusivos; alias from / to), top (1..100, def. 10)
+    """
+    if not _is_admin_request():
+        return jsonify({"error": "No autorizado"}), 403
+    desde, hasta, err = _rango_dias(request.args)
+    if err:
+        return jsonify({"error": err}), 400
+    try:
+        top = max(1, min(int(request.args.get("top", 10) or 10), 100))
+    except ValueError:
+        return jsonify({"error": "top debe ser entero"}), 400
+    try:
+        return jsonify(rollups_ventas.resumen(desde=desde, hasta=hasta, top=top)), 200
+    except Exception:
+        current_app.logger.exception("Resumen de ventas fallo")
+        return jsonify({"error": "No se pudo obtener el resumen"}), 500
+
+
+@admin_bp.post("/ventas/recalcular")
+def admin_recalcular_ventas():
+    """Reconstruye los rollups desde facturas/factura_items (backfill o reparación).
+    Body JSON opcional: { desde, hasta } (YYYY-MM-DD); sin rango recalcula todo."""
+    if not _is_admin_request():
+        return jsonify({"error": "No autorizado"}), 403
+    desde, hasta, err = _rango_dias(request.get_json(silent=True) or {})
+    if err:
+        return jsonify({"error": err}), 400
+    try:
+        res = rollups_ventas.recalcular(desde=desde, hasta=hasta)
+        return jsonify({"ok": True, "filas": res}), 200
+    except Exception:
+        current_app.logger.exception("Recalcular rollups de ventas fallo")
+        return jsonify({"error": "No se pudo recalcular"}), 500
+
+
+@admin_bp.get("/archivo")
+def admin_archivo_resumen():
+    """Meses movidos al archivo frío: filas, items, total y rango de ids por tipo (?tipo=facturas|tickets)."""
+    if not _is_admin_request():
+        return jsonify({"error": "No autorizado"}), 403
+    return jsonify({"data": archivo_frio.resumen_meses(request.args.get("tipo") or None)}), 200
+
+
+@admin_bp.post("/archivo/ejecutar")
+def admin_archivo_ejecutar():
+    """Archiva ya facturas y tickets cerrados más viejos que el horizonte.
+    Body JSON opcional: { horizonte_dias } (def. ARCHIVO_HORIZONTE_DIAS)."""
+    if not _is_admin_request():
+        return jsonify({"error": "No autorizado"}), 403
+    body = request.get_json(silent=True) or {}
+    horizonte = body.get("horizonte_dias")
+    if horizonte is not None:
+        try:
+            horizonte = int(horizonte)
+        except (TypeError, ValueError):
+            return jsonify({"error": "'horizonte_dias' debe ser entero"}), 400
+        if horizonte < 30:
+            return jsonify({"error": "'horizonte_dias' mínimo 30"}), 400
+    try:
+        res = archivo_frio.archivar(horizonte_dias=horizonte)
+        if res.get("en_curso"):
+            return jsonify({"error": "Ya hay un archivado en curso"}), 409
+        return jsonify({"ok": True, **res}), 200
+    except Exception:
+        current_app.logger.exception("Archivado fallo")
+        return jsonify({"error": "No se pudo archivar"}), 500
+
+
+@admin_bp.get("/facturas/export")
+def admin_exportar_facturas():
+    """Exporta facturas con sus items en streaming (memoria constante sin importar el rango).
+    Query: from / to (YYYY-MM-DD, inclusivos; alias desde / hasta), format ('csv' | 'ndjson', def. csv),
+           gzip=1 → descarga .gz; si no, se comprime al vuelo cuando el cliente acepta gzip.
+    CSV: una fila por item (datos de la factura repetidos). NDJSON: una línea por factura con 'items'.
+    Incluye los meses movidos al archivo frío (leídos de sus .ndjson.gz, antes que las tablas).
+    """
+    if not _is_admin_request():
+        return jsonify({"error": "No autorizado"}), 403
+    desde, hasta, err = _rango_dias(request.args)
+    if err:
+        return jsonify({"error": err}), 400
+    formato = (request.args.get("format") or "csv").strip().lower()
+    if formato not in exportar_facturas.FORMATOS:
+        return jsonify({"error": "format debe ser 'csv' o 'ndjson'"}), 400
+    desde_dt = datetime.combine(date.fromisoformat(desde), datetime.min.time()) if desde else None
+    hasta_dt = datetime.combine(date.fromisoformat(hasta) + timedelta(days=1), datetime.min.time()) if hasta else None
+
+    archivo_gz = (request.args.get("gzip") or "").lower() in ("1", "true")
+    transparente = not archivo_gz and "gzip" in request.accept_encodings
+    nombre = f"facturas_{desde or 'inicio'}_{hasta or 'hoy'}.{formato}" + (".gz" if archivo_gz else "")
+    mimetype = "application/gzip" if archivo_gz else ("text/csv" if formato == "csv" else "application/x-ndjson")
+    resp = Response(
+        exportar_facturas.exportar(formato, desde_dt, hasta_dt, comprimir=archivo_gz or transparente),
+        mimetype=mimetype,
+        direct_passthrough=True,
+    )
+    resp.headers["Content-Disposition"] = f'attachment; filename="{nombre}"'
+    if transparente:
+        resp.headers["Content-Encoding"] = "gzip"
+        resp.headers["Vary"] = "Accept-Encoding"
+    return resp
+
+
 # ---------------- Catálogos (categorías/materiales) -----------------
 
 @admin_bp.get("/catalog/categories")
@@ -462,6 +650,8 @@ def admin_upload_image():
                 i += 1
         f.save(str(dest))
         url = f"/static/img/productos/{dest.name}"
+        # La portada se resuelve por nombre de archivo: puede cambiar la de cualquier producto
+        _regenerar_documentos()
         return jsonify({"ok": True, "url": url}), 201
     except Exception:
         current_app.logger.exception("Upload fallo")
@@ -556,6 +746,7 @@ def admin_import_static_to_pg():
                     """
                 ), {"id": stem, "nombre": nombre, "precio": precio, "stock": 0, "img": f"/static/img/productos/{file.name}"})
                 created += 1
+        _regenerar_documentos()
         return jsonify({"ok": True, "importados": created}), 200
     except Exception:
         current_app.logger.exception("import static to pg fallo")
@@ -579,8 +770,22 @@ def admin_incrementar_stock(pid: str):
             return jsonify({"error": "DB no configurada"}), 500
         engine = create_engine(db_url, future=True)
         with engine.begin() as conn:
-            conn.execute(text("UPDATE productos SET stock = COALESCE(stock,0) + :delta WHERE id_producto = :id"), {"delta": cantidad, "id": pid})
-        return jsonify({"ok": True, "id": pid, "delta": cantidad}), 200
+            # Condicionado: un ajuste negativo no puede dejar el stock bajo cero (ventas concurrentes)
+            nuevo = conn.execute(
+                text(
+                    "UPDATE productos SET stock = COALESCE(stock,0) + :delta "
+                    "WHERE id_producto = :id AND COALESCE(stock,0) + :delta >= 0 RETURNING stock"
+                ),
+                {"delta": cantidad, "id": pid},
+            ).scalar()
+            if nuevo is None:
+                actual = conn.execute(text("SELECT stock FROM productos WHERE id_producto = :id"), {"id": pid}).first()
+        if nuevo is None:
+            if actual is None:
+                return jsonify({"error": "Producto no encontrado."}), 404
+            return jsonify({"error": "El stock no puede quedar negativo.", "stock": int(actual[0] or 0)}), 409
+        _regenerar_documentos(pid)
+        return jsonify({"ok": True, "id": pid, "delta": cantidad, "stock": int(nuevo)}), 200
     except Exception:
         current_app.logger.exception("PG stock fallo")
         return jsonify({"error": "No se pudo actualizar el stock."}), 500
@@ -638,6 +843,7 @@ def admin_subir_imagen_producto(pid: str):
             engine = create_engine(db_url, future=True)
             with engine.begin() as conn:
                 conn.execute(text("UPDATE productos SET imagen_url=:u WHERE id_producto=:id"), {"u": url, "id": pid})
+            _regenerar_documentos(pid)
         except Exception:
             current_app.logger.exception("PG actualizar imagen_url fallo")
             return jsonify({"error": "No se pudo actualizar la imagen en DB"}), 500
@@ -706,6 +912,7 @@ def admin_actualizar_producto_post(pid: str):
         set_sql = ", ".join(sets)
         with engine.begin() as conn:
             conn.execute(text(f"UPDATE productos SET {set_sql} WHERE id_producto = :id"), params)
+        _regenerar_documentos(pid)
         return jsonify({"ok": True, "id": pid}), 200
     except Exception:
         current_app.logger.exception("PG update producto fallo")
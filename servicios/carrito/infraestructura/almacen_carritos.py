@@ -0,0 +1,201 @@
+# servicios/carrito/infraestructura/almacen_carritos.py
+from __future__ import annotations
+
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from inicializar_db import resolve_db_uri, get_engine_and_session, CarritoORM
+from utils.tareas import TareaPeriodica
+
+# ==============================================================================
+# CARRITOS EN EL SERVIDOR
+# La cookie de sesión solo guarda un id corto (cart_sid); las líneas viven en la
+# tabla carritos, con un LRU por worker delante. Cada escritura sube `version`
+# (UPSERT condicionado): si otro worker cambió el carrito, se relee y se reaplica.
+# Una lectura confía en el LRU durante CARRITO_VALIDAR_SEG; pasado ese plazo compara
+# la versión con la de la DB (SELECT version por PK, sin traer ni parsear el JSON).
+# Lo agregado en otro worker se ve con ese retraso como máximo; las escrituras no
+# dependen de él porque el UPSERT condicionado detecta la versión vieja y reaplica.
+# Al iniciar sesión el carrito anónimo se fusiona con el del usuario.
+# ==============================================================================
+
+_LRU_MAX = int(os.getenv("CARRITO_LRU", "2000"))
+_ANONIMO_DIAS = int(os.getenv("CARRITO_ANONIMO_DIAS", "30"))  # purga de carritos anónimos sin uso
+_REINTENTOS = 5
+_VALIDAR_SEG = float(os.getenv("CARRITO_VALIDAR_SEG", "2"))  # 0 = validar en cada lectura
+
+Lineas = Dict[str, Dict[str, Any]]
+
+_engine = None
+_cache: "OrderedDict[str, Tuple[int, Lineas, float]]" = OrderedDict()  # clave -> (version, lineas, validado_en)
+_lock = threading.Lock()
+
+
+def _motor():
+    global _engine
+    if _engine is None:
+        _engine, _ = get_engine_and_session(resolve_db_uri())
+    return _engine
+
+
+def asegurar_tabla(engine) -> None:
+    CarritoORM.__table__.create(engine, checkfirst=True)
+
+
+# ------------------------------------------------------------------------------
+# Clave del carrito de la petición
+# ------------------------------------------------------------------------------
+def clave_de(sesion, crear: bool = False) -> Optional[str]:
+    """'u:<id>' con sesión iniciada; si no 's:<cart_sid>' (se crea el sid solo al escribir)."""
+    if sesion.get("user_id"):
+        return f"u:{sesion['user_id']}"
+    sid = sesion.get("cart_sid")
+    if not sid and crear:
+        sid = secrets.token_urlsafe(12)
+        sesion["cart_sid"] = sid
+    return f"s:{sid}" if sid else None
+
+
+# ------------------------------------------------------------------------------
+# LRU
+# ------------------------------------------------------------------------------
+def _cachear(clave: str, version: int, lineas: Lineas) -> None:
+    with _lock:
+        _cache[clave] = (version, lineas, time.monotonic())
+        _cache.move_to_end(clave)
+        while len(_cache) > _LRU_MAX:
+            _cache.popitem(last=False)
+
+
+def _de_cache(clave: str) -> Optional[Tuple[int, Lineas, float]]:
+    with _lock:
+        hit = _cache.get(clave)
+        if hit is not None:
+            _cache.move_to_end(clave)
+        return hit
+
+
+def _leer_db(clave: str) -> Tuple[int, Lineas]:
+    with _motor().connect() as conn:
+        fila = conn.execute(text("SELECT version, lineas FROM carritos WHERE clave = :c"), {"c": clave}).first()
+    version, lineas = (int(fila[0]), json.loads(fila[1] or "{}")) if fila else (0, {})
+    _cachear(clave, version, lineas)
+    return version, lineas
+
+
+def _version_db(clave: str) -> int:
+    with _motor().connect() as conn:
+        version = conn.execute(text("SELECT version FROM carritos WHERE clave = :c"), {"c": clave}).scalar()
+    return int(version) if version is not None else 0
+
+
+def _leer(clave: str, validar: bool = False) -> Tuple[int, Lineas]:
+    """Líneas del LRU si se validaron hace poco (o, con `validar`, si su versión sigue
+    siendo la de la DB); si no, se releen."""
+    hit = _de_cache(clave)
+    if hit is not None:
+        version, lineas, validado_en = hit
+        if not validar and time.monotonic() - validado_en < _VALIDAR_SEG:
+            return version, lineas
+        if version == _version_db(clave):
+            _cachear(clave, version, lineas)
+            return version, lineas
+    return _leer_db(clave)
+
+
+def _escribir(clave: str, version: int, lineas: Lineas) -> bool:
+    """UPSERT condicionado a la versión leída; False si otro worker escribió antes."""
+    with _motor().begin() as conn:
+        nueva = conn.execute(
+            text(
+                "INSERT INTO carritos (clave, lineas, version, actualizado_en) VALUES (:c, :l, 1, :ahora) "
+                "ON CONFLICT (clave) DO UPDATE SET lineas = excluded.lineas, version = carritos.version + 1, "
+                "actualizado_en = excluded.actualizado_en WHERE carritos.version = :v RETURNING version"
+            ),
+            {"c": clave, "l": json.dumps(lineas, ensure_ascii=False, separators=(",", ":")),
+             "ahora": datetime.now(), "v": version},
+        ).scalar()
+    if nueva is None:
+        return False
+    _cachear(clave, int(nueva), lineas)
+    return True
+
+
+# ------------------------------------------------------------------------------
+# API
+# ------------------------------------------------------------------------------
+def obtener(clave: Optional[str]) -> Lineas:
+    if not clave:
+        return {}
+    return json.loads(json.dumps(_leer(clave)[1]))  # copia: el llamador puede mutarla
+
+
+def modificar(clave: str, cambio: Callable[[Lineas], Any]) -> Tuple[Lineas, Any]:
+    """Aplica `cambio(lineas)` (muta en sitio) y persiste con una sola escritura.
+    Devuelve (lineas, lo que devolvió cambio). Parte siempre de la versión vigente en la DB."""
+    version, lineas = _leer(clave, validar=True)
+    for _ in range(_REINTENTOS):
+        copia = json.loads(json.dumps(lineas))
+        resultado = cambio(copia)
+        if copia == lineas:
+            return copia, resultado          # sin cambios: no se escribe
+        if _escribir(clave, version, copia):
+            return copia, resultado
+        version, lineas = _leer_db(clave)    # conflicto: releer y reaplicar
+    raise RuntimeError("Carrito modificado concurrentemente; reintenta.")
+
+
+def fusionar(origen: str, destino: str) -> Lineas:
+    """Suma el carrito `origen` (anónimo) en `destino` (usuario) y elimina el origen."""
+    anonimo = obtener(origen)
+    if not anonimo:
+        return obtener(destino)
+
+    def sumar(lineas: Lineas) -> None:
+        for pid, linea in anonimo.items():
+            if pid in lineas:
+                lineas[pid]["cantidad"] = int(lineas[pid].get("cantidad") or 0) + int(linea.get("cantidad") or 0)
+            else:
+                lineas[pid] = linea
+
+    lineas, _ = modificar(destino, sumar)
+    eliminar(origen)
+    return lineas
+
+
+def eliminar(clave: str) -> None:
+    with _motor().begin() as conn:
+        conn.execute(text("DELETE FROM carritos WHERE clave = :c"), {"c": clave})
+    with _lock:
+        _cache.pop(clave, None)
+
+
+def al_iniciar_sesion(sesion) -> None:
+    """Llamar tras guardar user_id en la sesión: mueve el carrito anónimo al del usuario."""
+    sid = sesion.pop("cart_sid", None)
+    if sid and sesion.get("user_id"):
+        fusionar(f"s:{sid}", f"u:{sesion['user_id']}")
+
+
+def purgar() -> int:
+    limite = datetime.now() - timedelta(days=_ANONIMO_DIAS)
+    with _motor().begin() as conn:
+        return conn.execute(
+            text("DELETE FROM carritos WHERE actualizado_en < :limite AND (clave LIKE 's:%' OR lineas = '{}')"),
+            {"limite": limite},
+        ).rowcount
+
+
+_purga = TareaPeriodica("carritos_purga", float(os.getenv("CARRITO_PURGA_SEG", "21600")), purgar, retraso_inicial=120)
+
+
+def iniciar_purga() -> bool:
+    return _purga.iniciar()
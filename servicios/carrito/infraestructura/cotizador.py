@@ -0,0 +1,105 @@
+# servicios/carrito/infraestructura/cotizador.py
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from servicios.servicio_catalogo.infraestructura.indices.catalogo_columnar import obtener_catalogo_columnar
+from servicios.servicio_catalogo.infraestructura.persistencia.pg_repositorio_producto import PGRepositorioProducto
+
+# ==============================================================================
+# PRECIOS DEL CARRITO
+# Nombre, precio, imagen y stock salen del catálogo columnar en memoria (una sola
+# búsqueda para todas las líneas, sin ir a la DB); el cliente solo aporta id y
+# cantidad. Un precio enviado que no coincide con el del catálogo es "viejo".
+# ==============================================================================
+
+_TOLERANCIA = 0.005  # Q: diferencias de redondeo
+
+_repositorio: Optional[PGRepositorioProducto] = None
+
+
+def _catalogo():
+    global _repositorio
+    if _repositorio is None:
+        _repositorio = PGRepositorioProducto()
+    return obtener_catalogo_columnar(_repositorio)
+
+
+def datos_productos(ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    return _catalogo().datos_de(ids)
+
+
+def cotizar(lineas: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Carrito con precios del servidor: items (con subtotal y aviso de stock), total y avisos.
+    Las líneas de productos que ya no están en el catálogo quedan fuera del total."""
+    datos = datos_productos(lineas.keys())
+    items: List[Dict[str, Any]] = []
+    avisos: List[Dict[str, Any]] = []
+    total = 0.0
+    unidades = 0
+    for pid, linea in lineas.items():
+        cantidad = int(linea.get("cantidad") or 0)
+        d = datos.get(str(pid))
+        if d is None:
+            item = {"id": pid, "nombre": linea.get("nombre") or "Producto", "precio": None,
+                    "portada_url": linea.get("portada_url"), "cantidad": cantidad, "subtotal": 0.0,
+                    "stock": 0, "aviso": "no_disponible"}
+        else:
+            subtotal = round(d["precio"] * cantidad, 2)
+            item = dict(d, cantidad=cantidad, subtotal=subtotal)
+            if d["stock"] <= 0:
+                item["aviso"] = "agotado"
+            elif cantidad > d["stock"]:
+                item["aviso"] = "stock_insuficiente"
+            total += subtotal
+            unidades += cantidad
+        if item.get("aviso"):
+            avisos.append({"id": pid, "aviso": item["aviso"], "stock": item["stock"], "cantidad": cantidad})
+        items.append(item)
+    return {"items": items, "total": round(total, 2), "cantidad": unidades, "avisos": avisos}
+
+
+def precio_viejo(pid: str, precio_cliente: Any) -> Optional[float]:
+    """Precio actual si `precio_cliente` no coincide con el del catálogo; None si coincide o no se envió."""
+    if precio_cliente in (None, ""):
+        return None
+    d = datos_productos([pid]).get(str(pid))
+    if d is None:
+        return None
+    return d["precio"] if precio_distinto(precio_cliente, d["precio"]) else None
+
+
+def precio_distinto(precio_cliente: Any, precio_actual: float) -> bool:
+    try:
+        return abs(float(precio_cliente) - precio_actual) > _TOLERANCIA
+    except (TypeError, ValueError):
+        return True
+
+
+def precios_de_catalogo(items: List[Dict[str, Any]], enviados: Optional[List[Any]] = None
+                        ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Any]]:
+    """Líneas de una factura con nombre y precio del catálogo (todas en una búsqueda).
+
+    `enviados`: precio de cada línea tal como lo mandó el cliente (None si no lo mandó); por
+    defecto el `precio` de la línea. Solo un precio enviado que no coincide cuenta como cambio.
+
+    Devuelve (líneas recalculadas, cambios de precio respecto a lo enviado, ids sin producto
+    en el catálogo). Las líneas sin id cuentan como no disponibles: no hay precio que cobrar.
+    """
+    if enviados is None:
+        enviados = [it.get("precio") for it in items]
+    datos = datos_productos(str(it["producto_id"]) for it in items if it.get("producto_id") not in (None, ""))
+    lineas, cambios, no_disponibles = [], [], []
+    for it, enviado in zip(items, enviados):
+        pid = it.get("producto_id")
+        d = datos.get(str(pid)) if pid not in (None, "") else None
+        if d is None:
+            no_disponibles.append(pid)
+            continue
+        if enviado not in (None, "") and precio_distinto(enviado, d["precio"]):
+            cambios.append({"producto_id": pid, "nombre": d["nombre"],
+                            "precio_enviado": enviado, "precio_actual": d["precio"]})
+        cantidad = int(it["cantidad"])
+        lineas.append(dict(it, producto_id=str(pid), nombre=d["nombre"] or it.get("nombre"), precio=d["precio"],
+                           subtotal=round(d["precio"] * cantidad, 2)))
+    return lineas, cambios, no_disponibles
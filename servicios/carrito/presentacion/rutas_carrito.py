@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import os
+
+from flask import Blueprint, request, jsonify, session
+
+from servicios.carrito.infraestructura import almacen_carritos as carritos
+from servicios.carrito.infraestructura import cotizador
+from inicializar_db import resolve_db_uri, get_engine_and_session
+
+
+carrito_bp = Blueprint("carrito_bp", __name__, url_prefix="/api/v1/cart")
+
+_OPS_MAX = int(os.getenv("CARRITO_OPS_MAX", "100"))
+
+
+@carrito_bp.record_once
+def _al_registrar(state) -> None:
+    try:
+        carritos.asegurar_tabla(get_engine_and_session(resolve_db_uri())[0])
+    except Exception as e:
+        print(f"[WARN] No se pudo crear la tabla carritos: {e}")
+
+
+def _clave(crear: bool = False) -> str | None:
+    clave = carritos.clave_de(session, crear=crear or "cart" in session)
+    # Carritos viejos guardados en la cookie: se pasan al servidor una sola vez
+    viejo = session.pop("cart", None)
+    if viejo and clave:
+        def importar(lineas):
+            for pid, linea in viejo.items():
+                lineas.setdefault(pid, {"id": pid, "cantidad": int(linea.get("cantidad") or 1)})
+        carritos.modificar(clave, importar)
+    return clave
+
+
+def _respuesta(lineas: dict, **extra):
+    """Carrito con precios del catálogo. `cart` conserva la forma {id: línea} de siempre."""
+    cot = cotizador.cotizar(lineas)
+    cart = {it["id"]: it for it in cot["items"]}
+    return jsonify({"ok": True, "cart": cart, "total": cot["total"], "avisos": cot["avisos"], **extra}), 200
+
+
+@carrito_bp.get("")
+def cart_get():
+    cot = cotizador.cotizar(carritos.obtener(_clave()))
+    if request.args.get("detalle") in ("1", "true"):
+        return jsonify(cot), 200
+    return jsonify({it["id"]: it for it in cot["items"]}), 200
+
+
+@carrito_bp.post("/add")
+def cart_add():
+    data = request.get_json(force=True, silent=True) or {}
+    pid = str(data.get("id") or "")
+    if not pid:
+        return jsonify({"ok": False, "error": "Falta id"}), 400
+    try:
+        qty = int(data.get("cantidad", 1))
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "Cantidad inválida"}), 400
+    if qty <= 0:
+        return jsonify({"ok": False, "error": "Cantidad inválida"}), 400
+
+    # Nombre, precio e imagen los pone el servidor; el precio enviado solo se compara
+    producto = cotizador.datos_productos([pid]).get(pid)
+    if producto is None:
+        return jsonify({"ok": False, "error": "Producto no disponible"}), 404
+    actual = cotizador.precio_viejo(pid, data.get("precio"))
+    if actual is not None:
+        return jsonify({"ok": False, "error": "El precio cambió.", "id": pid, "precio": actual}), 409
+
+    def agregar(cart):
+        if pid in cart:
+            cart[pid]["cantidad"] = int(cart[pid].get("cantidad") or 0) + qty
+        else:
+            cart[pid] = {"id": pid, "cantidad": qty}
+
+    cart, _ = carritos.modificar(_clave(crear=True), agregar)
+    return _respuesta(cart)
+
+
+@carrito_bp.post("/update")
+def cart_update():
+    data = request.get_json(force=True, silent=True) or {}
+    pid = data.get("id")
+    try:
+        qty = int(data.get("cantidad", 1))
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "Cantidad inválida"}), 400
+    clave = _clave()
+    if not clave:
+        return jsonify({"ok": False, "error": "No existe en carrito"}), 404
+
+    def actualizar(cart):
+        if pid not in cart:
+            return False
+        if qty <= 0:
+            cart.pop(pid)
+        else:
+            cart[pid]["cantidad"] = qty
+        return True
+
+    cart, existe = carritos.modificar(clave, actualizar)
+    if not existe:
+        return jsonify({"ok": False, "error": "No existe en carrito"}), 404
+    return _respuesta(cart)
+
+
+@carrito_bp.post("/remove")
+def cart_remove():
+    data = request.get_json(force=True, silent=True) or {}
+    pid = data.get("id")
+    clave = _clave()
+    if not clave:
+        return _respuesta({})
+    cart, _ = carritos.modificar(clave, lambda c: c.pop(pid, None))
+    return _respuesta(cart)
+
+
+@carrito_bp.post("/clear")
+def cart_clear():
+    clave = _clave()
+    if clave:
+        carritos.modificar(clave, lambda c: c.clear())
+    return _respuesta({})
+
+
+def _validar_ops(ops) -> tuple[list[dict], tuple[dict, int] | None]:
+    """Normaliza las operaciones; ante la primera inválida devuelve (cuerpo, status) y no se aplica ninguna."""
+    if not isinstance(ops, list) or not ops:
+        return [], ({"ok": False, "error": "'ops' es requerido y no puede estar vacío."}, 400)
+    if len(ops) > _OPS_MAX:
+        return [], ({"ok": False, "error": f"Máximo {_OPS_MAX} operaciones por petición."}, 400)
+    normalizadas = []
+    for i, op in enumerate(ops):
+        op = op if isinstance(op, dict) else {}
+        tipo = op.get("op")
+        pid = str(op.get("id") or "")
+        if tipo not in ("add", "update", "remove", "clear"):
+            return [], ({"ok": False, "error": "Operación inválida", "indice": i}, 400)
+        if tipo != "clear" and not pid:
+            return [], ({"ok": False, "error": "Falta id", "indice": i}, 400)
+        try:
+            qty = int(op.get("cantidad", 1 if tipo == "add" else 0))
+        except (TypeError, ValueError):
+            return [], ({"ok": False, "error": "Cantidad inválida", "indice": i}, 400)
+        normalizadas.append({"op": tipo, "id": pid, "cantidad": qty, "precio": op.get("precio")})
+
+    # Productos y precios de todas las operaciones en una sola búsqueda al catálogo
+    nuevos = {o["id"] for o in normalizadas if o["op"] in ("add", "update") and o["cantidad"] > 0}
+    productos = cotizador.datos_productos(nuevos)
+    for i, o in enumerate(normalizadas):
+        if o["id"] not in nuevos or (o["op"] == "add" and o["cantidad"] <= 0):
+            continue
+        d = productos.get(o["id"])
+        if d is None:
+            return [], ({"ok": False, "error": "Producto no disponible", "id": o["id"], "indice": i}, 404)
+        if o["precio"] not in (None, "") and cotizador.precio_distinto(o["precio"], d["precio"]):
+            return [], ({"ok": False, "error": "El precio cambió.", "id": o["id"], "precio": d["precio"], "indice": i}, 409)
+    return normalizadas, None
+
+
+def _aplicar_ops(cart: dict, ops: list[dict]) -> None:
+    for o in ops:
+        pid, qty = o["id"], o["cantidad"]
+        if o["op"] == "clear":
+            cart.clear()
+        elif o["op"] == "remove":
+            cart.pop(pid, None)
+        else:
+            # add suma (acepta negativos para restar); update fija la cantidad. <= 0 quita la línea
+            if o["op"] == "add":
+                qty += int((cart.get(pid) or {}).get("cantidad") or 0)
+            if qty <= 0:
+                cart.pop(pid, None)
+            elif pid in cart:
+                cart[pid]["cantidad"] = qty
+            else:
+                cart[pid] = {"id": pid, "cantidad": qty}
+
+
+@carrito_bp.post("/ops")
+def cart_ops():
+    """Varias operaciones en orden (add/update/remove/clear) con una sola escritura del carrito.
+
+    Se validan todas antes de aplicar: si una falla no se aplica ninguna.
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    ops, err = _validar_ops(data.get("ops"))
+    if err:
+        return jsonify(err[0]), err[1]
+    cart, _ = carritos.modificar(_clave(crear=True), lambda c: _aplicar_ops(c, ops))
+    return _respuesta(cart, aplicadas=len(ops))
@@ -0,0 +1,322 @@
+# servicios/facturacion/infraestructura/archivo_frio.py
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+from sqlalchemy import inspect
+
+from inicializar_db import resolve_db_uri, get_engine_and_session, ArchivoMesORM, FacturaORM, FacturaItemORM
+from servicios.admin.infraestructura.tickets_repo import TicketsRepo
+from servicios.facturacion.infraestructura import rollups_ventas
+from utils import bloqueo
+from utils.tareas import TareaPeriodica
+
+# ==============================================================================
+# ARCHIVO FRÍO
+# Facturas (con sus items) y tickets cerrados más viejos que el horizonte se
+# agregan a archivos mensuales <tipo>/<YYYY-MM>.ndjson.gz (un miembro gzip por
+# lote, así se puede anexar) y se borran de las tablas calientes por lotes.
+# archivo_meses guarda el resumen de cada mes (filas, items, total, rango de ids);
+# los rollups de ventas_diarias no se tocan, así los reportes siguen completos.
+# Una sola corrida a la vez en todo el host (flock) y anexar es idempotente:
+# archivo_meses.bytes es el tamaño confirmado junto con el resumen; lo que haya
+# después en el archivo es de una corrida cuyo commit falló y se descarta antes
+# de volver a anexar.
+# ==============================================================================
+
+_BASE_DIR = Path(__file__).resolve().parents[3]
+ARCHIVO_DIR = Path(os.getenv("ARCHIVO_DIR") or (_BASE_DIR / "data" / "archivo"))
+_HORIZONTE_DIAS = int(os.getenv("ARCHIVO_HORIZONTE_DIAS", "365"))
+_LOTE = int(os.getenv("ARCHIVO_LOTE", "500"))
+_CACHE_MAX = 256
+
+_Session = None
+_tickets = TicketsRepo()
+_lock = threading.Lock()          # además del flock: Windows no tiene fcntl
+_encontradas: Dict[tuple, dict] = {}
+
+
+def _sesion():
+    global _Session
+    if _Session is None:
+        engine, _Session = get_engine_and_session(resolve_db_uri())
+        ArchivoMesORM.__table__.create(engine, checkfirst=True)
+        try:
+            if "bytes" not in {c["name"] for c in inspect(engine).get_columns("archivo_meses")}:
+                with engine.begin() as conn:
+                    conn.exec_driver_sql("ALTER TABLE archivo_meses ADD COLUMN bytes INTEGER")
+        except Exception as e:
+            print(f"[WARN] No se pudo verificar/agregar archivo_meses.bytes: {e}")
+    return _Session()
+
+
+def corte(horizonte_dias: Optional[int] = None) -> datetime:
+    """Primer día del mes de (hoy - horizonte): se archivan meses completos."""
+    limite = datetime.now() - timedelta(days=_HORIZONTE_DIAS if horizonte_dias is None else int(horizonte_dias))
+    return limite.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _ruta(tipo: str, mes: str) -> Path:
+    return ARCHIVO_DIR / tipo / f"{mes}.ndjson.gz"
+
+
+def _mes(fecha) -> str:
+    return fecha.strftime("%Y-%m") if isinstance(fecha, datetime) else str(fecha)[:7]
+
+
+def _fila_mes(s, tipo: str, mes: str) -> ArchivoMesORM:
+    fila = s.get(ArchivoMesORM, (tipo, mes))
+    if fila is None:
+        fila = ArchivoMesORM(tipo=tipo, mes=mes, filas=0, items=0, total=0.0, bytes=0)
+        s.add(fila)
+    return fila
+
+
+def _anexar(fila: ArchivoMesORM, registros: List[Dict[str, Any]]) -> None:
+    """Anexa un miembro gzip y lo sincroniza a disco antes de que el llamador borre las filas.
+    Primero recorta lo que quedó tras el último tamaño confirmado (un anexo sin commit)."""
+    ruta = _ruta(fila.tipo, fila.mes)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    datos = "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":"), default=str) + "\n" for r in registros)
+    with open(ruta, "ab") as f:
+        if fila.bytes is not None and f.tell() > fila.bytes:
+            print(f"[WARN] Archivo {ruta}: se descartan {f.tell() - fila.bytes} bytes de una corrida sin confirmar")
+            f.truncate(fila.bytes)
+        f.write(gzip.compress(datos.encode("utf-8"), compresslevel=6))
+        f.flush()
+        os.fsync(f.fileno())
+        fila.bytes = f.tell()
+
+
+def _ids_archivados(fila: ArchivoMesORM, ids: Iterable[int]) -> Set[int]:
+    """De `ids`, los que ya están en el archivo del mes (solo se lee si caen en su rango)."""
+    if fila.id_min is None or fila.id_max is None:
+        return set()
+    candidatos = {i for i in ids if fila.id_min <= i <= fila.id_max}
+    ruta = _ruta(fila.tipo, fila.mes)
+    if not candidatos or not ruta.exists():
+        return set()
+    encontrados: Set[int] = set()
+    with gzip.open(ruta, "rt", encoding="utf-8") as f:
+        for linea in f:
+            ident = int(linea[6:linea.index(",")])  # líneas '{"id":<n>,...'
+            if ident in candidatos:
+                encontrados.add(ident)
+    return encontrados
+
+
+def _resumir(fila: ArchivoMesORM, regs: List[Dict[str, Any]]) -> None:
+    ids = [int(r["id"]) for r in regs]
+    fila.filas += len(regs)
+    fila.items += sum(len(r.get("items") or []) for r in regs)
+    fila.total = round(float(fila.total or 0) + sum(float(r.get("total") or 0) for r in regs), 2)
+    fila.id_min = min(ids + ([fila.id_min] if fila.id_min is not None else []))
+    fila.id_max = max(ids + ([fila.id_max] if fila.id_max is not None else []))
+    fila.actualizado_en = datetime.now()
+
+
+# ------------------------------------------------------------------------------
+# Facturas
+# ------------------------------------------------------------------------------
+def factura_dict(fac, items: Iterable) -> Dict[str, Any]:
+    """Misma forma que GET /api/v1/facturas/<id>."""
+    return {
+        "id": fac.id,
+        "numero_factura": fac.numero_factura,
+        "user_email": fac.user_email,
+        "nit": fac.nit,
+        "pago_metodo": fac.pago_metodo,
+        "entrega_metodo": fac.entrega_metodo,
+        "envio_nombre": fac.envio_nombre,
+        "envio_telefono": fac.envio_telefono,
+        "envio_direccion": fac.envio_direccion,
+        "origen": fac.origen,
+        "total": fac.total,
+        "fecha": fac.fecha.isoformat() if fac.fecha else None,
+        "items": [
+            {
+                "id": it.id,
+                "producto_id": it.producto_id,
+                "nombre": it.nombre,
+                "precio": it.precio,
+                "cantidad": it.cantidad,
+                "subtotal": it.subtotal,
+            }
+            for it in items
+        ],
+    }
+
+
+def archivar_facturas(antes: datetime, lote: int = _LOTE) -> Dict[str, int]:
+    movidas = lineas = 0
+    while True:
+        with _sesion() as s:
+            ids = [r[0] for r in s.query(FacturaORM.id).filter(FacturaORM.fecha < antes)
+                   .order_by(FacturaORM.id).limit(lote).all()]
+            if not ids:
+                break
+            items_por_factura: Dict[int, list] = {}
+            for it in s.query(FacturaItemORM).filter(FacturaItemORM.id_factura.in_(ids)).order_by(FacturaItemORM.id):
+                items_por_factura.setdefault(it.id_factura, []).append(it)
+            por_mes: Dict[str, List[Dict[str, Any]]] = {}
+            for fac in s.query(FacturaORM).filter(FacturaORM.id.in_(ids)).order_by(FacturaORM.id):
+                por_mes.setdefault(_mes(fac.fecha), []).append(factura_dict(fac, items_por_factura.get(fac.id, [])))
+            # Resumen (con el tamaño del archivo) y borrado van en el mismo commit
+            for mes, regs in por_mes.items():
+                fila = _fila_mes(s, "facturas", mes)
+                _anexar(fila, regs)
+                _resumir(fila, regs)
+            s.query(FacturaItemORM).filter(FacturaItemORM.id_factura.in_(ids)).delete(synchronize_session=False)
+            s.query(FacturaORM).filter(FacturaORM.id.in_(ids)).delete(synchronize_session=False)
+            s.commit()
+            movidas += len(ids)
+            lineas += sum(len(v) for v in items_por_factura.values())
+    return {"facturas": movidas, "items": lineas}
+
+
+def archivar_tickets(antes: datetime, lote: int = _LOTE) -> Dict[str, int]:
+    movidos = 0
+    while True:
+        filas = _tickets.cerrados_antes(antes.strftime("%Y-%m-%d %H:%M:%S"), lote)
+        if not filas:
+            break
+        por_mes: Dict[str, List[Dict[str, Any]]] = {}
+        for t in filas:
+            por_mes.setdefault(_mes(t.get("created_at") or t.get("updated_at")), []).append(t)
+        # Los tickets viven en otra DB: si el DELETE falló tras confirmar el resumen, los ya
+        # archivados vuelven a salir aquí; se omiten al anexar y solo se borran
+        with _sesion() as s:
+            for mes, regs in por_mes.items():
+                fila = _fila_mes(s, "tickets", mes)
+                ya = _ids_archivados(fila, (int(t["id"]) for t in regs))
+                nuevos = [t for t in regs if int(t["id"]) not in ya]
+                if nuevos:
+                    _anexar(fila, nuevos)
+                    _resumir(fila, nuevos)
+            s.commit()
+        movidos += _tickets.eliminar([t["id"] for t in filas])
+    return {"tickets": movidos}
+
+
+def archivar(horizonte_dias: Optional[int] = None, lote: int = _LOTE) -> Dict[str, Any]:
+    """Corrida completa (script, admin o tarea periódica). Devuelve lo movido."""
+    antes = corte(horizonte_dias)
+    if not _lock.acquire(blocking=False):
+        return {"en_curso": True}
+    try:
+        with bloqueo.exclusivo("archivo_frio") as libre:  # otro worker o el script
+            if not libre:
+                return {"en_curso": True}
+            res: Dict[str, Any] = {"antes_de": antes.strftime("%Y-%m-%d")}
+            # Los reportes de los meses archivados salen de los rollups: deben existir antes de borrar
+            rollups_ventas.backfill_si_vacio()
+            res.update(archivar_facturas(antes, lote))
+            try:
+                res.update(archivar_tickets(antes, lote))
+            except Exception as e:  # la DB de tickets es opcional
+                print(f"[WARN] No se pudieron archivar tickets: {e}")
+            _encontradas.clear()
+            return res
+    finally:
+        _lock.release()
+
+
+# ------------------------------------------------------------------------------
+# Lectura
+# ------------------------------------------------------------------------------
+def buscar(tipo: str, ident: int) -> Optional[Dict[str, Any]]:
+    """Registro archivado por id (None si no está). Solo abre los meses cuyo rango de ids lo cubre."""
+    clave = (tipo, int(ident))
+    if clave in _encontradas:
+        return _encontradas[clave]
+    with _sesion() as s:
+        meses = [m for (m,) in s.query(ArchivoMesORM.mes).filter(
+            ArchivoMesORM.tipo == tipo, ArchivoMesORM.id_min <= ident, ArchivoMesORM.id_max >= ident,
+        ).order_by(ArchivoMesORM.mes.desc())]
+    prefijo = f'{{"id":{int(ident)},'
+    for mes in meses:
+        ruta = _ruta(tipo, mes)
+        if not ruta.exists():
+            continue
+        with gzip.open(ruta, "rt", encoding="utf-8") as f:
+            for linea in f:
+                if linea.startswith(prefijo):  # evita parsear el resto de líneas
+                    reg = json.loads(linea)
+                    if len(_encontradas) >= _CACHE_MAX:
+                        _encontradas.clear()
+                    _encontradas[clave] = reg
+                    return reg
+    return None
+
+
+def buscar_factura(fid: int) -> Optional[Dict[str, Any]]:
+    return buscar("facturas", fid)
+
+
+class _Acotado(io.RawIOBase):
+    """Vista de solo lectura de los primeros `limite` bytes de un archivo (lo confirmado)."""
+
+    def __init__(self, f, limite: Optional[int]):
+        self.f, self.resto = f, limite
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if self.resto is None:
+            return self.f.readinto(b)
+        n = self.f.readinto(memoryview(b)[:max(0, self.resto)])
+        self.resto -= n
+        return n
+
+
+def registros(tipo: str, desde: Optional[datetime] = None, hasta: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+    """Registros archivados con fecha en [desde, hasta), mes por mes en orden. Se leen en
+    streaming y solo hasta archivo_meses.bytes (lo de una corrida sin confirmar se ignora)."""
+    with _sesion() as s:
+        q = s.query(ArchivoMesORM.mes, ArchivoMesORM.bytes).filter(ArchivoMesORM.tipo == tipo)
+        if desde:
+            q = q.filter(ArchivoMesORM.mes >= _mes(desde))
+        if hasta:
+            q = q.filter(ArchivoMesORM.mes <= _mes(hasta))
+        meses = q.order_by(ArchivoMesORM.mes).all()
+    for mes, confirmados in meses:
+        ruta = _ruta(tipo, mes)
+        if not ruta.exists():
+            continue
+        with open(ruta, "rb") as crudo, gzip.open(_Acotado(crudo, confirmados), "rt", encoding="utf-8") as f:
+            for linea in f:
+                reg = json.loads(linea)
+                fecha = datetime.fromisoformat(reg["fecha"]) if reg.get("fecha") else None
+                if (desde and (fecha is None or fecha < desde)) or (hasta and (fecha is None or fecha >= hasta)):
+                    continue
+                yield reg
+
+
+def resumen_meses(tipo: Optional[str] = None) -> List[Dict[str, Any]]:
+    with _sesion() as s:
+        q = s.query(ArchivoMesORM)
+        if tipo:
+            q = q.filter(ArchivoMesORM.tipo == tipo)
+        return [
+            {"tipo": m.tipo, "mes": m.mes, "filas": m.filas, "items": m.items, "total": round(float(m.total or 0), 2),
+             "id_min": m.id_min, "id_max": m.id_max, "archivo": str(_ruta(m.tipo, m.mes))}
+            for m in q.order_by(ArchivoMesORM.tipo, ArchivoMesORM.mes)
+        ]
+
+
+_tarea = TareaPeriodica("archivo_frio", float(os.getenv("ARCHIVO_INTERVALO", "0")), archivar,
+                        retraso_inicial=300, lider="archivo_frio")
+
+
+def iniciar_archivo() -> bool:
+    """Tarea diaria opcional (ARCHIVO_INTERVALO en segundos; 0 = solo script/admin).
+    Corre en un solo worker del host (el líder)."""
+    return _tarea.iniciar()
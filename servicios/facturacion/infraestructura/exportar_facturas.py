@@ -0,0 +1,156 @@
+# servicios/facturacion/infraestructura/exportar_facturas.py
+from __future__ import annotations
+
+import csv
+import io
+import json
+import zlib
+from collections import namedtuple
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import select
+
+from inicializar_db import resolve_db_uri, get_engine_and_session, FacturaORM, FacturaItemORM
+from servicios.facturacion.infraestructura import archivo_frio
+
+# ==============================================================================
+# EXPORTACIÓN DE FACTURAS (contabilidad)
+# Un solo SELECT facturas LEFT JOIN factura_items ordenado por factura, leído con
+# cursor del lado del servidor (stream_results/yield_per): la memoria no depende
+# del rango. Los meses ya movidos al archivo frío se leen antes, en streaming
+# desde sus .ndjson.gz, con la misma forma de fila (todo es anterior al corte).
+# Las filas se serializan y (opcional) comprimen por bloques.
+# ==============================================================================
+
+FORMATOS = ("csv", "ndjson")
+_YIELD_PER = 1000
+_BLOQUE = 64 * 1024
+
+COLUMNAS_CSV = (
+    "factura_id", "numero_factura", "fecha", "user_email", "nit", "origen", "pago_metodo",
+    "entrega_metodo", "total", "item_id", "producto_id", "nombre", "precio", "cantidad", "subtotal",
+)
+
+# Misma forma que las filas del SELECT, para las facturas del archivo frío
+_FilaArchivo = namedtuple("_FilaArchivo", (
+    "id", "numero_factura", "fecha", "user_email", "nit", "origen", "pago_metodo", "entrega_metodo", "total",
+    "item_id", "producto_id", "nombre", "precio", "cantidad", "subtotal",
+))
+
+_engine = None
+
+
+def _motor():
+    global _engine
+    if _engine is None:
+        _engine, _ = get_engine_and_session(resolve_db_uri())
+    return _engine
+
+
+def _consulta(desde: Optional[datetime], hasta: Optional[datetime]):
+    f, i = FacturaORM, FacturaItemORM
+    q = (
+        select(
+            f.id, f.numero_factura, f.fecha, f.user_email, f.nit, f.origen, f.pago_metodo, f.entrega_metodo, f.total,
+            i.id.label("item_id"), i.producto_id, i.nombre, i.precio, i.cantidad, i.subtotal,
+        )
+        .select_from(f)
+        .outerjoin(i, i.id_factura == f.id)
+        .order_by(f.fecha, f.id, i.id)
+    )
+    if desde:
+        q = q.where(f.fecha >= desde)
+    if hasta:
+        q = q.where(f.fecha < hasta)
+    return q
+
+
+def _filas_archivo(desde: Optional[datetime], hasta: Optional[datetime]):
+    for fac in archivo_frio.registros("facturas", desde, hasta):
+        cabecera = (fac["id"], fac.get("numero_factura"), datetime.fromisoformat(fac["fecha"]) if fac.get("fecha") else None,
+                    fac.get("user_email"), fac.get("nit"), fac.get("origen"), fac.get("pago_metodo"),
+                    fac.get("entrega_metodo"), fac.get("total"))
+        for it in fac.get("items") or [None]:
+            if it is None:
+                yield _FilaArchivo(*cabecera, None, None, None, None, None, None)
+            else:
+                yield _FilaArchivo(*cabecera, it.get("id"), it.get("producto_id"), it.get("nombre"),
+                                   it.get("precio"), it.get("cantidad"), it.get("subtotal"))
+
+
+def _filas(desde: Optional[datetime], hasta: Optional[datetime]):
+    yield from _filas_archivo(desde, hasta)
+    with _motor().connect() as conn:
+        res = conn.execution_options(stream_results=True, yield_per=_YIELD_PER).execute(_consulta(desde, hasta))
+        for fila in res:
+            yield fila
+
+
+def _fecha(v) -> Optional[str]:
+    return v.isoformat() if v else None
+
+
+def _csv(desde, hasta) -> Iterator[str]:
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    buf.write("\ufeff")  # BOM: Excel abre el UTF-8 con tildes correctamente
+    w.writerow(COLUMNAS_CSV)
+    for r in _filas(desde, hasta):
+        w.writerow((r.id, r.numero_factura, _fecha(r.fecha), r.user_email, r.nit, r.origen, r.pago_metodo,
+                    r.entrega_metodo, r.total, r.item_id, r.producto_id, r.nombre, r.precio, r.cantidad, r.subtotal))
+        if buf.tell() >= _BLOQUE:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def _ndjson(desde, hasta) -> Iterator[str]:
+    """Una línea por factura con sus items (las filas llegan agrupadas por el ORDER BY)."""
+    partes = []
+    tam = 0
+    actual = None
+
+    def linea(fac) -> str:
+        return json.dumps(fac, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+    for r in _filas(desde, hasta):
+        if actual is None or actual["id"] != r.id:
+            if actual is not None:
+                s = linea(actual)
+                partes.append(s)
+                tam += len(s)
+                if tam >= _BLOQUE:
+                    yield "".join(partes)
+                    partes, tam = [], 0
+            actual = {
+                "id": r.id, "numero_factura": r.numero_factura, "fecha": _fecha(r.fecha), "user_email": r.user_email,
+                "nit": r.nit, "origen": r.origen, "pago_metodo": r.pago_metodo, "entrega_metodo": r.entrega_metodo,
+                "total": r.total, "items": [],
+            }
+        if r.item_id is not None:
+            actual["items"].append({
+                "id": r.item_id, "producto_id": r.producto_id, "nombre": r.nombre,
+                "precio": r.precio, "cantidad": r.cantidad, "subtotal": r.subtotal,
+            })
+    if actual is not None:
+        partes.append(linea(actual))
+    yield "".join(partes)
+
+
+def exportar(formato: str, desde: Optional[datetime] = None, hasta: Optional[datetime] = None,
+             comprimir: bool = False) -> Iterator[bytes]:
+    """Genera el archivo por bloques de bytes; `hasta` es exclusivo. Con comprimir=True, gzip al vuelo."""
+    fuente = _csv(desde, hasta) if formato == "csv" else _ndjson(desde, hasta)
+    if not comprimir:
+        for bloque in fuente:
+            if bloque:
+                yield bloque.encode("utf-8")
+        return
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 → formato gzip
+    for bloque in fuente:
+        datos = z.compress(bloque.encode("utf-8"))
+        if datos:
+            yield datos
+    yield z.flush()
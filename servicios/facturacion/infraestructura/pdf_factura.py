@@ -0,0 +1,281 @@
+# servicios/facturacion/infraestructura/pdf_factura.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from inicializar_db import resolve_db_uri, get_engine_and_session, FacturaORM, FacturaItemORM
+from servicios.facturacion.infraestructura import archivo_frio
+from servicios.notificaciones.infraestructura import outbox
+
+# ==============================================================================
+# PDF DE FACTURAS
+# Se genera en el servidor (sin dependencias: PDF 1.4 con Helvetica estándar) en
+# un hilo de fondo y se guarda en disco como <id>-<huella>.pdf, donde la huella
+# es un SHA-256 del contenido de la factura. Descargas y correos reutilizan el
+# archivo; si la factura cambia, cambia la huella y se vuelve a generar.
+# ==============================================================================
+
+_BASE_DIR = Path(__file__).resolve().parents[3]
+PDF_DIR = Path(os.getenv("FACTURAS_PDF_DIR") or (_BASE_DIR / "data" / "facturas_pdf"))
+_WORKERS = max(1, int(os.getenv("FACTURAS_PDF_WORKERS", "1")))
+_ESPERA_SEG = float(os.getenv("FACTURAS_PDF_ESPERA", "20"))
+_VERSION_RENDER = "1"  # subir si cambia el diseño: invalida la caché completa
+
+_Session = None
+_executor = ThreadPoolExecutor(max_workers=_WORKERS, thread_name_prefix="facturas_pdf")
+_en_curso: Dict[str, Future] = {}
+_lock = threading.Lock()
+
+
+def _sesion():
+    global _Session
+    if _Session is None:
+        _, _Session = get_engine_and_session(resolve_db_uri())
+    return _Session()
+
+
+# ------------------------------------------------------------------------------
+# Datos y huella
+# ------------------------------------------------------------------------------
+def datos_factura(fid: int) -> Optional[Dict[str, Any]]:
+    with _sesion() as s:
+        fac = s.query(FacturaORM).filter_by(id=fid).first()
+        if not fac:
+            return _datos_archivados(fid)
+        items = s.query(FacturaItemORM).filter_by(id_factura=fid).order_by(FacturaItemORM.id).all()
+        return {
+            "id": fac.id,
+            "numero_factura": fac.numero_factura,
+            "fecha": fac.fecha.strftime("%Y-%m-%d %H:%M") if fac.fecha else "",
+            "nit": fac.nit or "C/F",
+            "pago_metodo": fac.pago_metodo or "-",
+            "entrega_metodo": fac.entrega_metodo or "-",
+            "envio_nombre": fac.envio_nombre or "",
+            "envio_telefono": fac.envio_telefono or "",
+            "envio_direccion": fac.envio_direccion or "",
+            "total": float(fac.total or 0),
+            "items": [
+                [it.nombre or "Producto", float(it.precio or 0), int(it.cantidad or 1), float(it.subtotal or 0)]
+                for it in items
+            ],
+        }
+
+
+def _datos_archivados(fid: int) -> Optional[Dict[str, Any]]:
+    a = archivo_frio.buscar_factura(fid)
+    if a is None:
+        return None
+    fecha = datetime.fromisoformat(a["fecha"]) if a.get("fecha") else None
+    return {
+        "id": a["id"],
+        "numero_factura": a["numero_factura"],
+        "fecha": fecha.strftime("%Y-%m-%d %H:%M") if fecha else "",
+        "nit": a.get("nit") or "C/F",
+        "pago_metodo": a.get("pago_metodo") or "-",
+        "entrega_metodo": a.get("entrega_metodo") or "-",
+        "envio_nombre": a.get("envio_nombre") or "",
+        "envio_telefono": a.get("envio_telefono") or "",
+        "envio_direccion": a.get("envio_direccion") or "",
+        "total": float(a.get("total") or 0),
+        "items": [
+            [it.get("nombre") or "Producto", float(it.get("precio") or 0), int(it.get("cantidad") or 1),
+             float(it.get("subtotal") or 0)]
+            for it in a.get("items") or []
+        ],
+    }
+
+
+def huella(datos: Dict[str, Any]) -> str:
+    crudo = json.dumps([_VERSION_RENDER, datos], sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(crudo.encode("utf-8")).hexdigest()
+
+
+# ------------------------------------------------------------------------------
+# Render (PDF mínimo, A4, fuentes estándar con WinAnsiEncoding)
+# ------------------------------------------------------------------------------
+_ANCHO, _ALTO = 595, 842
+_MARGEN = 50
+_FILAS_POR_PAGINA = 36
+# Anchos Helvetica (1/1000 em) de los caracteres de importes, para alinear a la derecha
+_ANCHOS = {**{d: 556 for d in "0123456789"}, "Q": 778, ".": 278, ",": 278, "-": 333, " ": 278}
+
+
+def _texto(s: str) -> str:
+    b = str(s).encode("cp1252", "replace").decode("latin-1")
+    return b.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _ancho(s: str, tam: float) -> float:
+    return sum(_ANCHOS.get(ch, 556) for ch in s) * tam / 1000.0
+
+
+def _recortar(s: str, n: int) -> str:
+    return s if len(s) <= n else s[: n - 1] + "…"
+
+
+class _Lienzo:
+    def __init__(self) -> None:
+        self.ops: List[str] = []
+
+    def texto(self, x: float, y: float, s: str, tam: float = 10, negrita: bool = False) -> None:
+        self.ops.append(f"BT /{'F2' if negrita else 'F1'} {tam} Tf {x:.2f} {y:.2f} Td ({_texto(s)}) Tj ET")
+
+    def derecha(self, x: float, y: float, s: str, tam: float = 10, negrita: bool = False) -> None:
+        self.texto(x - _ancho(s, tam), y, s, tam, negrita)
+
+    def linea(self, x1: float, y1: float, x2: float, y2: float) -> None:
+        self.ops.append(f"{x1:.2f} {y1:.2f} m {x2:.2f} {y2:.2f} l S")
+
+    def contenido(self) -> bytes:
+        return ("0.5 w\n" + "\n".join(self.ops)).encode("latin-1")
+
+
+def _paginas(datos: Dict[str, Any]) -> List[bytes]:
+    items = datos["items"]
+    bloques = [items[i:i + _FILAS_POR_PAGINA] for i in range(0, len(items), _FILAS_POR_PAGINA)] or [[]]
+    x_precio, x_cant, x_sub = _ANCHO - _MARGEN - 190, _ANCHO - _MARGEN - 120, _ANCHO - _MARGEN
+    paginas = []
+    for n, bloque in enumerate(bloques, start=1):
+        c = _Lienzo()
+        y = _ALTO - _MARGEN
+        c.texto(_MARGEN, y, f"Factura {datos['numero_factura']}", 16, negrita=True)
+        c.derecha(_ANCHO - _MARGEN, y, f"Página {n}/{len(bloques)}", 9)
+        y -= 18
+        c.texto(_MARGEN, y, f"Fecha: {datos['fecha']}", 9)
+        c.texto(_MARGEN + 180, y, f"NIT: {datos['nit']}", 9)
+        c.texto(_MARGEN + 330, y, f"Pago: {datos['pago_metodo']}  |  Entrega: {datos['entrega_metodo']}", 9)
+        if n == 1 and datos["entrega_metodo"] == "domicilio":
+            for linea in (datos["envio_nombre"], datos["envio_telefono"], datos["envio_direccion"]):
+                y -= 12
+                c.texto(_MARGEN, y, _recortar(linea, 95), 9)
+        y -= 24
+        c.texto(_MARGEN, y, "Producto", 10, negrita=True)
+        c.derecha(x_precio, y, "Precio", 10, negrita=True)
+        c.derecha(x_cant, y, "Cant.", 10, negrita=True)
+        c.derecha(x_sub, y, "Subtotal", 10, negrita=True)
+        y -= 6
+        c.linea(_MARGEN, y, _ANCHO - _MARGEN, y)
+        for nombre, precio, cantidad, subtotal in bloque:
+            y -= 16
+            c.texto(_MARGEN, y, _recortar(nombre, 55), 10)
+            c.derecha(x_precio, y, f"Q{precio:,.2f}", 10)
+            c.derecha(x_cant, y, str(cantidad), 10)
+            c.derecha(x_sub, y, f"Q{subtotal:,.2f}", 10)
+        if n == len(bloques):
+            y -= 8
+            c.linea(_MARGEN, y, _ANCHO - _MARGEN, y)
+            y -= 18
+            c.derecha(x_cant, y, "Total", 12, negrita=True)
+            c.derecha(x_sub, y, f"Q{datos['total']:,.2f}", 12, negrita=True)
+        paginas.append(c.contenido())
+    return paginas
+
+
+def renderizar_pdf(datos: Dict[str, Any]) -> bytes:
+    contenidos = _paginas(datos)
+    objetos: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # Pages: se completa abajo
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+    ]
+    kids = []
+    for contenido in contenidos:
+        objetos.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(contenido), contenido))
+        objetos.append((
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {_ANCHO} {_ALTO}] "
+            f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {len(objetos)} 0 R >>"
+        ).encode("ascii"))
+        kids.append(f"{len(objetos)} 0 R")
+    objetos[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode("ascii")
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for i, obj in enumerate(objetos, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (i, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, xref)
+    return bytes(out)
+
+
+# ------------------------------------------------------------------------------
+# Caché en disco + hilo de render
+# ------------------------------------------------------------------------------
+def _ruta(fid: int, h: str) -> Path:
+    return PDF_DIR / f"{int(fid)}-{h[:16]}.pdf"
+
+
+def _generar(fid: int, datos: Dict[str, Any], h: str) -> bytes:
+    ruta = _ruta(fid, h)
+    if ruta.exists():
+        return ruta.read_bytes()
+    pdf = renderizar_pdf(datos)
+    PDF_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = ruta.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(pdf)
+    os.replace(tmp, ruta)
+    # Versiones anteriores de la misma factura
+    for viejo in PDF_DIR.glob(f"{int(fid)}-*.pdf"):
+        if viejo != ruta:
+            try:
+                viejo.unlink()
+            except OSError:
+                pass
+    return pdf
+
+
+def _encargar(fid: int, datos: Dict[str, Any], h: str) -> Future:
+    clave = f"{fid}-{h}"
+    with _lock:
+        fut = _en_curso.get(clave)
+        if fut is None:
+            fut = _executor.submit(_generar, fid, datos, h)
+            _en_curso[clave] = fut
+            fut.add_done_callback(lambda _f: _en_curso.pop(clave, None))
+        return fut
+
+
+def pdf_de(datos: Dict[str, Any]) -> Tuple[bytes, str]:
+    """(pdf, huella) desde la caché; si falta, lo genera el hilo de fondo y se espera."""
+    h = huella(datos)
+    ruta = _ruta(datos["id"], h)
+    if ruta.exists():
+        return ruta.read_bytes(), h
+    return _encargar(datos["id"], datos, h).result(timeout=_ESPERA_SEG), h
+
+
+def _precalentar(fid: int) -> None:
+    try:
+        datos = datos_factura(fid)
+        if datos is not None:
+            _generar(fid, datos, huella(datos))
+    except Exception as e:
+        print(f"[WARN] No se pudo generar PDF de factura {fid}: {e}")
+
+
+def precalentar(fid: int) -> None:
+    """Genera el PDF en el hilo de render (tras crear la factura) sin bloquear la petición."""
+    _executor.submit(_precalentar, fid)
+
+
+def adjuntos_factura(ident: str) -> List[Tuple[str, bytes, str]]:
+    """Proveedor de adjuntos del outbox para referencias 'factura:<id>'."""
+    datos = datos_factura(int(ident))
+    if datos is None:
+        return []
+    pdf, _ = pdf_de(datos)
+    return [(f"{datos['numero_factura']}.pdf", pdf, "application/pdf")]
+
+
+if (os.getenv("FACTURAS_PDF_ADJUNTO") or "true").lower() == "true":
+    outbox.registrar_adjuntos("factura", adjuntos_factura)
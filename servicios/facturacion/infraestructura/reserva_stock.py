@@ -0,0 +1,133 @@
+# servicios/facturacion/infraestructura/reserva_stock.py
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import bindparam, text
+
+from utils.tareas import TareaPeriodica
+
+# ==============================================================================
+# RESERVA DE STOCK AL FACTURAR
+# Todas las líneas de la factura se descuentan con UN solo UPDATE ... FROM (VALUES)
+# condicionado a stock >= cantidad, dentro de la transacción de la factura. Si
+# alguna fila no se actualizó, la factura se rechaza (rollback) con la lista de
+# faltantes. En Postgres las filas se bloquean en orden de id_producto antes del
+# UPDATE, así dos checkouts con los mismos productos no pueden cruzarse (deadlock).
+# ==============================================================================
+
+_REFRESCO_SEG = float(os.getenv("STOCK_REFRESCO_SEG", "2"))
+# Cada cuánto, como mucho, las ventas suben la versión del catálogo (recarga en otros workers y snapshot)
+_PUBLICAR_SEG = float(os.getenv("STOCK_PUBLICAR_SEG", "300"))
+
+
+def agrupar_lineas(items: Iterable[Dict[str, Any]]) -> "OrderedDict[str, int]":
+    """{producto_id: cantidad total}, ordenado por id; ignora líneas sin producto_id (ítems libres)."""
+    cantidades: Dict[str, int] = {}
+    for it in items:
+        pid = it.get("producto_id")
+        if pid in (None, ""):
+            continue
+        cantidades[str(pid)] = cantidades.get(str(pid), 0) + int(it.get("cantidad") or 0)
+    return OrderedDict(sorted(cantidades.items()))
+
+
+def _sentencia(n: int, dialecto: str):
+    valores = ", ".join(f"(CAST(:p{i} AS VARCHAR), CAST(:c{i} AS INTEGER))" for i in range(n))
+    if dialecto == "postgresql":
+        return text(
+            f"WITH v(id_producto, cantidad) AS (VALUES {valores}), "
+            "bloqueo AS (SELECT p.id_producto FROM productos p JOIN v ON v.id_producto = p.id_producto "
+            "            ORDER BY p.id_producto FOR UPDATE OF p) "
+            "UPDATE productos AS p SET stock = p.stock - v.cantidad "
+            "FROM v JOIN bloqueo b ON b.id_producto = v.id_producto "
+            "WHERE p.id_producto = v.id_producto AND p.stock >= v.cantidad "
+            "RETURNING p.id_producto, p.stock"
+        )
+    # SQLite (>= 3.35 por RETURNING): el UPDATE toma el bloqueo de escritura de toda la DB.
+    # Debe empezar por UPDATE (no WITH): pysqlite solo abre la transacción implícita ante DML,
+    # con un CTE delante la sentencia se autoconfirmaría y el rollback no la desharía.
+    return text(
+        f"UPDATE productos SET stock = productos.stock - v.column2 "
+        f"FROM (VALUES {valores}) AS v "
+        "WHERE productos.id_producto = v.column1 AND productos.stock >= v.column2 "
+        "RETURNING productos.id_producto, productos.stock"
+    )
+
+
+def reservar(session, items: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Descuenta el stock de todas las líneas. Devuelve [] si todo alcanzó; si no, los faltantes
+    (producto_id, nombre, solicitado, disponible) y el llamador debe hacer rollback."""
+    cantidades = agrupar_lineas(items)
+    if not cantidades:
+        return []
+    params: Dict[str, Any] = {}
+    for i, (pid, cant) in enumerate(cantidades.items()):
+        params[f"p{i}"] = pid
+        params[f"c{i}"] = cant
+    dialecto = session.get_bind().dialect.name
+    reservados = {r[0] for r in session.execute(_sentencia(len(cantidades), dialecto), params)}
+    if len(reservados) == len(cantidades):
+        return []
+    # Faltantes: las filas no actualizadas conservan su stock (o no existen)
+    pendientes = [pid for pid in cantidades if pid not in reservados]
+    filas = session.execute(
+        text("SELECT id_producto, nombre, stock FROM productos WHERE id_producto IN :ids")
+        .bindparams(bindparam("ids", expanding=True)),
+        {"ids": pendientes},
+    ).all()
+    actuales = {r[0]: r for r in filas}
+    return [
+        {
+            "producto_id": pid,
+            "nombre": actuales[pid][1] if pid in actuales else None,
+            "solicitado": cantidades[pid],
+            "disponible": int(actuales[pid][2] or 0) if pid in actuales else None,
+        }
+        for pid in pendientes
+    ]
+
+
+# ------------------------------------------------------------------------------
+# Documentos del catálogo (documento_json lleva el stock): se regeneran por lotes.
+# El catálogo en memoria de este worker se parchea en sitio (sin invalidarlo); la
+# versión del catálogo, que hace recargar a los demás workers y reconstruir el
+# snapshot, sube como mucho cada STOCK_PUBLICAR_SEG.
+# ------------------------------------------------------------------------------
+_pendientes: set = set()
+_lock = threading.Lock()
+_sin_publicar = False
+_publicado_en = time.monotonic()
+
+
+def _refrescar() -> None:
+    global _sin_publicar, _publicado_en
+    with _lock:
+        ids = list(_pendientes)
+        _pendientes.clear()
+    if not ids and not _sin_publicar:
+        return
+    from servicios.servicio_catalogo.infraestructura.indices.catalogo_columnar import parchear_stock
+    from servicios.servicio_catalogo.infraestructura.persistencia.pg_repositorio_producto import PGRepositorioProducto
+    repo = PGRepositorioProducto()
+    if ids:
+        parchear_stock(repo.refrescar_stock(ids))
+        _sin_publicar = True
+    if _sin_publicar and time.monotonic() - _publicado_en >= _PUBLICAR_SEG:
+        repo.publicar_version()
+        _sin_publicar, _publicado_en = False, time.monotonic()
+
+
+_tarea = TareaPeriodica("stock_documentos", _REFRESCO_SEG, _refrescar)
+
+
+def stock_cambiado(ids: Iterable[str]) -> None:
+    """Tras el commit: agenda la regeneración de documento_json de esos productos."""
+    with _lock:
+        _pendientes.update(str(i) for i in ids)
+    if not _tarea.iniciar() and _tarea.intervalo <= 0:
+        _tarea.ejecutar_ahora()
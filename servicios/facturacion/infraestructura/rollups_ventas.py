@@ -0,0 +1,226 @@
+# servicios/facturacion/infraestructura/rollups_ventas.py
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import String, cast, func, text
+
+from inicializar_db import (
+    resolve_db_uri, get_engine_and_session, ArchivoMesORM,
+    FacturaORM, FacturaItemORM, VentaDiariaORM, VentaProductoDiariaORM,
+)
+
+# ==============================================================================
+# ROLLUPS DE VENTAS
+# Cada factura suma (UPSERT) a ventas_diarias y ventas_productos_diarias dentro de
+# su propia transacción; el resumen para cualquier rango de fechas agrega como
+# mucho (días × dimensiones) filas en lugar de recorrer facturas/factura_items.
+# reconstruir() recalcula un rango desde las tablas base (backfill/reparación).
+# ==============================================================================
+
+DIMENSIONES = ("origen", "pago_metodo", "entrega_metodo")
+
+_UPSERT_DIA = text(
+    "INSERT INTO ventas_diarias (dia, dimension, valor, facturas, total) "
+    "VALUES (:dia, :dimension, :valor, :facturas, :total) "
+    "ON CONFLICT (dia, dimension, valor) DO UPDATE SET "
+    "facturas = ventas_diarias.facturas + excluded.facturas, "
+    "total = ventas_diarias.total + excluded.total"
+)
+_UPSERT_PRODUCTO = text(
+    "INSERT INTO ventas_productos_diarias (dia, producto_id, nombre, unidades, ingresos) "
+    "VALUES (:dia, :producto_id, :nombre, :unidades, :ingresos) "
+    "ON CONFLICT (dia, producto_id) DO UPDATE SET "
+    "nombre = excluded.nombre, "
+    "unidades = ventas_productos_diarias.unidades + excluded.unidades, "
+    "ingresos = ventas_productos_diarias.ingresos + excluded.ingresos"
+)
+
+_Session = None
+
+
+def _sesion():
+    global _Session
+    if _Session is None:
+        _, _Session = get_engine_and_session(resolve_db_uri())
+    return _Session()
+
+
+def asegurar_tablas(engine) -> None:
+    VentaDiariaORM.__table__.create(engine, checkfirst=True)
+    VentaProductoDiariaORM.__table__.create(engine, checkfirst=True)
+    ArchivoMesORM.__table__.create(engine, checkfirst=True)
+
+
+def _dia(fecha) -> str:
+    if isinstance(fecha, (datetime, date)):
+        return fecha.strftime("%Y-%m-%d")
+    return str(fecha)[:10]
+
+
+def _valor(v: Optional[str]) -> str:
+    return (v or "").strip() or "-"
+
+
+# ------------------------------------------------------------------------------
+# Incremental (en la transacción de crear_factura)
+# ------------------------------------------------------------------------------
+def acumular_factura(session, *, fecha, total: float, origen: Optional[str], pago_metodo: Optional[str],
+                     entrega_metodo: Optional[str], items: Iterable[Dict[str, Any]]) -> None:
+    dia = _dia(fecha)
+    session.execute(_UPSERT_DIA, [
+        {"dia": dia, "dimension": "total", "valor": "*", "facturas": 1, "total": float(total)},
+        {"dia": dia, "dimension": "origen", "valor": _valor(origen), "facturas": 1, "total": float(total)},
+        {"dia": dia, "dimension": "pago_metodo", "valor": _valor(pago_metodo), "facturas": 1, "total": float(total)},
+        {"dia": dia, "dimension": "entrega_metodo", "valor": _valor(entrega_metodo), "facturas": 1, "total": float(total)},
+    ])
+    # Una fila por producto (la misma factura puede repetir un producto en varias líneas)
+    productos: Dict[str, Dict[str, Any]] = {}
+    for it in items:
+        pid = str(it.get("producto_id") or "")
+        p = productos.setdefault(pid, {"dia": dia, "producto_id": pid, "nombre": it.get("nombre") or "Producto",
+                                       "unidades": 0, "ingresos": 0.0})
+        p["unidades"] += int(it.get("cantidad") or 0)
+        p["ingresos"] += float(it.get("subtotal") or 0)
+    if productos:
+        session.execute(_UPSERT_PRODUCTO, list(productos.values()))
+
+
+# ------------------------------------------------------------------------------
+# Backfill / reparación desde las tablas base
+# ------------------------------------------------------------------------------
+def reconstruir(session, desde: Optional[str] = None, hasta: Optional[str] = None) -> Dict[str, int]:
+    """Recalcula los rollups de [desde, hasta] (días 'YYYY-MM-DD', inclusivos; None = sin límite).
+    No hace commit: el llamador decide la transacción. Los meses ya movidos al archivo
+    frío no se recalculan (sus facturas ya no están en las tablas base)."""
+    inicio = _primer_dia_caliente(session)
+    if inicio and (not desde or desde < inicio):
+        desde = inicio
+    dia_expr = cast(func.date(FacturaORM.fecha), String)
+
+    def rango(q, col):
+        if desde:
+            q = q.filter(col >= desde)
+        if hasta:
+            q = q.filter(col <= hasta)
+        return q
+
+    rango(session.query(VentaDiariaORM), VentaDiariaORM.dia).delete(synchronize_session=False)
+    rango(session.query(VentaProductoDiariaORM), VentaProductoDiariaORM.dia).delete(synchronize_session=False)
+
+    filas_dia: List[Dict[str, Any]] = []
+    dims = [("total", None)] + [(d, getattr(FacturaORM, d)) for d in DIMENSIONES]
+    for dimension, col in dims:
+        agrupar = [dia_expr] + ([col] if col is not None else [])
+        q = session.query(*agrupar, func.count(FacturaORM.id), func.coalesce(func.sum(FacturaORM.total), 0))
+        q = rango(q, dia_expr).group_by(*agrupar)
+        # Varios valores crudos (None, '', ' web') pueden normalizar al mismo: sumar en Python
+        acumulado: Dict[tuple, List[float]] = defaultdict(lambda: [0, 0.0])
+        for fila in q.all():
+            dia, n, total = fila[0], fila[-2], fila[-1]
+            clave = (_dia(dia), _valor(fila[1]) if col is not None else "*")
+            acumulado[clave][0] += int(n)
+            acumulado[clave][1] += float(total or 0)
+        filas_dia += [
+            {"dia": d, "dimension": dimension, "valor": v, "facturas": n, "total": round(t, 2)}
+            for (d, v), (n, t) in acumulado.items()
+        ]
+
+    q = (
+        session.query(dia_expr.label("dia"), func.coalesce(FacturaItemORM.producto_id, "").label("pid"),
+                      func.max(FacturaItemORM.nombre), func.sum(FacturaItemORM.cantidad), func.sum(FacturaItemORM.subtotal))
+        .join(FacturaORM, FacturaORM.id == FacturaItemORM.id_factura)
+    )
+    q = rango(q, dia_expr).group_by(dia_expr, func.coalesce(FacturaItemORM.producto_id, ""))
+    filas_prod = [
+        {"dia": _dia(dia), "producto_id": str(pid), "nombre": nombre or "Producto",
+         "unidades": int(unidades or 0), "ingresos": round(float(ingresos or 0), 2)}
+        for dia, pid, nombre, unidades, ingresos in q.all()
+    ]
+    if filas_dia:
+        session.execute(VentaDiariaORM.__table__.insert(), filas_dia)
+    if filas_prod:
+        session.execute(VentaProductoDiariaORM.__table__.insert(), filas_prod)
+    return {"ventas_diarias": len(filas_dia), "ventas_productos_diarias": len(filas_prod)}
+
+
+def _primer_dia_caliente(session) -> Optional[str]:
+    """Día siguiente al último mes de facturas archivado ('YYYY-MM-DD'), o None."""
+    mes = session.query(func.max(ArchivoMesORM.mes)).filter(ArchivoMesORM.tipo == "facturas").scalar()
+    if not mes:
+        return None
+    anio, m = int(mes[:4]), int(mes[5:7])
+    return f"{anio + m // 12:04d}-{m % 12 + 1:02d}-01"
+
+
+def recalcular(desde: Optional[str] = None, hasta: Optional[str] = None) -> Dict[str, int]:
+    with _sesion() as s:
+        res = reconstruir(s, desde=desde, hasta=hasta)
+        s.commit()
+    return res
+
+
+def backfill_si_vacio() -> None:
+    """Rollups vacíos con facturas existentes (primer arranque tras la migración): reconstruye todo."""
+    with _sesion() as s:
+        if s.query(VentaDiariaORM.dia).first() is not None:
+            return
+        if s.query(FacturaORM.id).first() is None:
+            return
+        res = reconstruir(s)
+        s.commit()
+        print(f"[INFO] Rollups de ventas reconstruidos: {res}")
+
+
+# ------------------------------------------------------------------------------
+# Lectura
+# ------------------------------------------------------------------------------
+def resumen(desde: Optional[str] = None, hasta: Optional[str] = None, top: int = 10) -> Dict[str, Any]:
+    with _sesion() as s:
+        q = s.query(VentaDiariaORM.dimension, VentaDiariaORM.valor,
+                    func.sum(VentaDiariaORM.facturas), func.sum(VentaDiariaORM.total))
+        if desde:
+            q = q.filter(VentaDiariaORM.dia >= desde)
+        if hasta:
+            q = q.filter(VentaDiariaORM.dia <= hasta)
+        por_dim: Dict[str, List[Dict[str, Any]]] = {d: [] for d in ("total",) + DIMENSIONES}
+        for dimension, valor, n, total in q.group_by(VentaDiariaORM.dimension, VentaDiariaORM.valor).all():
+            por_dim.setdefault(dimension, []).append(
+                {"valor": valor, "facturas": int(n or 0), "total": round(float(total or 0), 2)})
+        for lista in por_dim.values():
+            lista.sort(key=lambda r: -r["total"])
+
+        qd = s.query(VentaDiariaORM.dia, VentaDiariaORM.facturas, VentaDiariaORM.total).filter(
+            VentaDiariaORM.dimension == "total")
+        if desde:
+            qd = qd.filter(VentaDiariaORM.dia >= desde)
+        if hasta:
+            qd = qd.filter(VentaDiariaORM.dia <= hasta)
+        por_dia = [{"dia": d, "facturas": int(n), "total": round(float(t), 2)} for d, n, t in qd.order_by(VentaDiariaORM.dia).all()]
+
+        qp = s.query(VentaProductoDiariaORM.producto_id, func.max(VentaProductoDiariaORM.nombre),
+                     func.sum(VentaProductoDiariaORM.unidades), func.sum(VentaProductoDiariaORM.ingresos))
+        if desde:
+            qp = qp.filter(VentaProductoDiariaORM.dia >= desde)
+        if hasta:
+            qp = qp.filter(VentaProductoDiariaORM.dia <= hasta)
+        productos = [
+            {"producto_id": pid or None, "nombre": nombre, "unidades": int(u or 0), "ingresos": round(float(i or 0), 2)}
+            for pid, nombre, u, i in qp.group_by(VentaProductoDiariaORM.producto_id)
+            .order_by(func.sum(VentaProductoDiariaORM.ingresos).desc()).limit(top).all()
+        ]
+
+    tot = por_dim.get("total") or []
+    return {
+        "desde": desde,
+        "hasta": hasta,
+        "facturas": tot[0]["facturas"] if tot else 0,
+        "total": tot[0]["total"] if tot else 0.0,
+        "por_origen": por_dim["origen"],
+        "por_pago_metodo": por_dim["pago_metodo"],
+        "por_entrega_metodo": por_dim["entrega_metodo"],
+        "por_dia": por_dia,
+        "top_productos": productos,
+    }
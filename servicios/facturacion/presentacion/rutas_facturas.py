@@ -1,24 +1,88 @@
 from __future__ import annotations
 
-from flask import Blueprint, request, jsonify, render_template, session as flask_session
+from flask import Blueprint, Response, current_app, request, jsonify, render_template, session as flask_session
+import base64
+import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from sqlalchemy import text
+from sqlalchemy import DateTime, String, insert, literal, text, tuple_, type_coerce
 
-from inicializar_db import resolve_db_uri, get_engine_and_session, FacturaORM, FacturaItemORM
-from servicios.servicio_autenticacion.infraestructura.clientes_externos.google_smtp_cliente import GoogleSMTPCliente
+from decorators import es_admin_peticion, idempotente
+from inicializar_db import resolve_db_uri, get_engine_and_session, FacturaORM, FacturaItemORM, FacturaSecuenciaORM, NotificacionORM
+from servicios.carrito.infraestructura import cotizador
+from servicios.facturacion.infraestructura import archivo_frio, pdf_factura, reserva_stock, rollups_ventas
+from servicios.notificaciones.infraestructura import outbox
+from utils.campos import parsear_campos
 
 
 facturas_bp = Blueprint("facturas_bp", __name__, url_prefix="/api/v1")
 
+_engine = None
+_SessionLocal = None
+
+
+def _db():
+    """Engine/sesiones compartidos por el módulo (antes se creaban en cada request)."""
+    global _engine, _SessionLocal
+    if _SessionLocal is None:
+        _engine, _SessionLocal = get_engine_and_session(resolve_db_uri())
+    return _engine, _SessionLocal
+
+
+@facturas_bp.record_once
+def _al_registrar(state) -> None:
+    # Migración defensiva una sola vez al arrancar (no en cada request)
+    _ensure_factura_columns(_db()[0])
+    try:
+        rollups_ventas.backfill_si_vacio()
+    except Exception as e:
+        print(f"[WARN] No se pudieron reconstruir rollups de ventas: {e}")
+
+# Descontar productos.stock al facturar (FACTURAS_RESERVAR_STOCK=false lo desactiva)
+_RESERVAR_STOCK = (os.getenv("FACTURAS_RESERVAR_STOCK") or "true").lower() == "true"
+# Facturas de clientes (no admin): precios siempre del catálogo; con FACTURAS_VALIDAR_PRECIOS=true
+# además se rechaza (409) un carrito con precios viejos en lugar de cobrar el precio nuevo sin avisar
+_VALIDAR_PRECIOS = (os.getenv("FACTURAS_VALIDAR_PRECIOS") or "true").lower() == "true"
+
+# Campos del listado (?fields=). print_url se deriva del id.
+_CAMPOS_LISTADO = (
+    "id", "numero_factura", "user_email", "nit", "pago_metodo", "entrega_metodo",
+    "total", "fecha", "origen", "print_url",
+)
+
 
 def _generar_numero_factura(session) -> str:
-    hoy = datetime.now()
-    base = f"FCT-{hoy.strftime('%Y%m%d')}"
-    prefix = f"{base}-"
-    # Cuenta existentes con el mismo prefijo y suma 1
-    existentes = session.query(FacturaORM).filter(FacturaORM.numero_factura.like(f"{prefix}%")).count()
-    sec = existentes + 1
-    return f"{prefix}{sec:04d}"
+    """Siguiente número del día desde factura_secuencias (O(1), sin carreras).
+
+    El UPDATE toma el bloqueo de la fila del día (Postgres) o el de escritura de la DB
+    (SQLite) hasta el commit de la factura: dos checkouts concurrentes no pueden obtener
+    el mismo número y un rollback devuelve el número (sin huecos).
+    """
+    return _reservar_numeros(session, datetime.now(), 1)[0]
+
+
+def _reservar_numeros(session, fecha: datetime, n: int) -> list[str]:
+    """Reserva `n` números consecutivos del día de `fecha` con un solo UPDATE (lotes del POS)."""
+    dia = fecha.strftime('%Y%m%d')
+    prefix = f"FCT-{dia}-"
+    ultimo = session.execute(
+        text("UPDATE factura_secuencias SET ultimo = ultimo + :n WHERE dia = :dia RETURNING ultimo"),
+        {"dia": dia, "n": n},
+    ).scalar()
+    if ultimo is None:
+        # Primera factura del día: arrancar después de las ya emitidas (facturas previas al contador)
+        existentes = session.query(FacturaORM).filter(FacturaORM.numero_factura.like(f"{prefix}%")).count()
+        ultimo = session.execute(
+            text(
+                "INSERT INTO factura_secuencias (dia, ultimo) VALUES (:dia, :inicial) "
+                "ON CONFLICT (dia) DO UPDATE SET ultimo = factura_secuencias.ultimo + :n RETURNING ultimo"
+            ),
+            {"dia": dia, "inicial": existentes + n, "n": n},
+        ).scalar()
+    ultimo = int(ultimo)
+    return [f"{prefix}{sec:04d}" for sec in range(ultimo - n + 1, ultimo + 1)]
 
 
 def _normalize_nit(raw: str | None) -> str | None:
@@ -45,7 +109,19 @@ def _normalize_nit(raw: str | None) -> str | None:
 
 
 def _ensure_factura_columns(engine) -> None:
-    """Agrega columnas extra si no existen (SQLite). Idempotente."""
+    """Agrega columnas extra si no existen (SQLite) y las tablas de secuencias y outbox. Idempotente."""
+    try:
+        FacturaSecuenciaORM.__table__.create(engine, checkfirst=True)
+        NotificacionORM.__table__.create(engine, checkfirst=True)
+        rollups_ventas.asegurar_tablas(engine)
+    except Exception:
+        pass
+    try:
+        # Índices compuestos del listado (user_email, fecha, id) y (fecha, id)
+        for ix in FacturaORM.__table__.indexes:
+            ix.create(engine, checkfirst=True)
+    except Exception as e:
+        print(f"[WARN] No se pudieron crear índices de facturas: {e}")
     try:
         with engine.connect() as conn:
             res = conn.exec_driver_sql("PRAGMA table_info('facturas')")
@@ -64,30 +140,33 @@ def _ensure_factura_columns(engine) -> None:
         pass
 
 
-@facturas_bp.post("/facturas")
-def crear_factura():
-    data = request.get_json(silent=True) or {}
+def _validar_factura(data: dict) -> tuple[dict | None, str | None]:
+    """Cuerpo de una factura -> (datos normalizados, None) o (None, mensaje de error)."""
     items = data.get("items") or []
-    email = data.get("email")
     nit = _normalize_nit(data.get("nit"))
     if nit is None:
-        return jsonify({"error": "NIT inválido. Usa solo números (y guiones) o 'C/F'."}), 400
+        return None, "NIT inválido. Usa solo números (y guiones) o 'C/F'."
     # Extras de checkout
     pago = (data.get("pago") or {})
-    pago_metodo = (pago.get("metodo") or data.get("pago_metodo") or "").strip() or None
     entrega = (data.get("entrega") or {})
-    entrega_metodo = (entrega.get("metodo") or data.get("entrega_metodo") or "").strip() or None
-    envio_nombre = (entrega.get("nombre") or data.get("envio_nombre") or None)
-    envio_telefono = (entrega.get("telefono") or data.get("envio_telefono") or None)
-    envio_direccion = (entrega.get("direccion") or data.get("envio_direccion") or None)
-    origen = (data.get("origen") or "web").strip() or "web"
+    datos = {
+        "email": data.get("email"),
+        "nit": nit,
+        "pago_metodo": (pago.get("metodo") or data.get("pago_metodo") or "").strip() or None,
+        "entrega_metodo": (entrega.get("metodo") or data.get("entrega_metodo") or "").strip() or None,
+        "envio_nombre": (entrega.get("nombre") or data.get("envio_nombre") or None),
+        "envio_telefono": (entrega.get("telefono") or data.get("envio_telefono") or None),
+        "envio_direccion": (entrega.get("direccion") or data.get("envio_direccion") or None),
+        "origen": (data.get("origen") or "web").strip() or "web",
+    }
 
     if not isinstance(items, list) or not items:
-        return jsonify({"error": "'items' es requerido y no puede estar vacío."}), 400
+        return None, "'items' es requerido y no puede estar vacío."
 
     # Calcular totales
     total = 0.0
     normalized = []
+    enviados = []  # precio tal como llegó (None si no se envió): el catálogo lo compara
     for it in items:
         try:
             nombre = str(it.get("nombre") or "Producto")
@@ -98,6 +177,7 @@ def crear_factura():
                 raise ValueError()
             subtotal = round(precio * cantidad, 2)
             total += subtotal
+            enviados.append(it.get("precio"))
             normalized.append({
                 "producto_id": pid,
                 "nombre": nombre,
@@ -106,41 +186,90 @@ def crear_factura():
                 "subtotal": subtotal,
             })
         except Exception:
-            return jsonify({"error": "Item inválido en 'items'."}), 400
+            return None, "Item inválido en 'items'."
+    datos["items"] = normalized
+    datos["precios_enviados"] = enviados
+    datos["total"] = round(total, 2)
+    return datos, None
+
+
+def _encolar_email_factura(session, fac, datos: dict) -> None:
+    """Email de factura (opcional): se encola en la misma transacción, lo envía el despachador."""
+    asunto, html, texto = _factura_email(numero=fac.numero_factura, total=fac.total, nit=datos["nit"],
+                                         items=datos["items"], pago_metodo=datos["pago_metodo"],
+                                         entrega_metodo=datos["entrega_metodo"], envio_nombre=datos["envio_nombre"],
+                                         envio_telefono=datos["envio_telefono"], envio_direccion=datos["envio_direccion"])
+    outbox.encolar_email(datos["email"], asunto, html, texto, referencia=f"factura:{fac.id}", session=session)
 
-    db_uri = resolve_db_uri()
-    engine, SessionLocal = get_engine_and_session(db_uri)
-    _ensure_factura_columns(engine)
+
+@facturas_bp.post("/facturas")
+@idempotente
+def crear_factura():
+    datos, err = _validar_factura(request.get_json(silent=True) or {})
+    if err:
+        return jsonify({"error": err}), 400
+
+    # Solo un admin (POS) fija precios y origen; cualquier otro cliente paga los del catálogo
+    if not es_admin_peticion():
+        datos["origen"] = "web"
+        try:
+            lineas, cambios, no_disponibles = cotizador.precios_de_catalogo(datos["items"], datos["precios_enviados"])
+        except Exception as e:
+            print(f"[WARN] No se pudieron obtener precios del catálogo: {e}")
+            return jsonify({"error": "No se pudieron verificar los precios; intenta de nuevo."}), 503
+        if no_disponibles:
+            return jsonify({"error": "Producto no disponible.", "no_disponibles": no_disponibles}), 400
+        if cambios and _VALIDAR_PRECIOS:
+            return jsonify({"error": "El precio de algunos productos cambió.", "cambios": cambios}), 409
+        datos["items"] = lineas
+        datos["total"] = round(sum(it["subtotal"] for it in lineas), 2)
+
+    normalized = datos["items"]
+    email, nit, origen = datos["email"], datos["nit"], datos["origen"]
+    pago_metodo, entrega_metodo = datos["pago_metodo"], datos["entrega_metodo"]
+    envio_nombre, envio_telefono, envio_direccion = datos["envio_nombre"], datos["envio_telefono"], datos["envio_direccion"]
+
+    _, SessionLocal = _db()
     session = SessionLocal()
     try:
+        # Primero el stock (un solo UPDATE para todas las líneas): si falta, se rechaza antes de numerar
+        if _RESERVAR_STOCK:
+            faltantes = reserva_stock.reservar(session, normalized)
+            if faltantes:
+                session.rollback()
+                return jsonify({"error": "Stock insuficiente.", "faltantes": faltantes}), 409
         numero = _generar_numero_factura(session)
-        fac = FacturaORM(
-            numero_factura=numero,
-            user_email=email,
-            nit=nit,
-            pago_metodo=pago_metodo,
-            entrega_metodo=entrega_metodo,
-            envio_nombre=envio_nombre,
-            envio_telefono=envio_telefono,
-            envio_direccion=envio_direccion,
-            total=round(total, 2),
-            origen=origen,
-        )
-        session.add(fac)
-        session.flush()  # para obtener fac.id
-
-        for it in normalized:
-            session.add(FacturaItemORM(id_factura=fac.id, **it))
+        # Cabecera con INSERT ... RETURNING y líneas en un solo executemany (misma transacción)
+        fac = session.execute(
+            insert(FacturaORM)
+            .values(
+                numero_factura=numero,
+                user_email=email,
+                nit=nit,
+                pago_metodo=pago_metodo,
+                entrega_metodo=entrega_metodo,
+                envio_nombre=envio_nombre,
+                envio_telefono=envio_telefono,
+                envio_direccion=envio_direccion,
+                total=datos["total"],
+                origen=origen,
+            )
+            .returning(FacturaORM.id, FacturaORM.numero_factura, FacturaORM.total, FacturaORM.fecha)
+        ).one()
+        session.execute(insert(FacturaItemORM), [dict(it, id_factura=fac.id) for it in normalized])
+        rollups_ventas.acumular_factura(session, fecha=fac.fecha, total=fac.total, origen=origen,
+                                        pago_metodo=pago_metodo, entrega_metodo=entrega_metodo, items=normalized)
+        if email:
+            _encolar_email_factura(session, fac, datos)
 
         session.commit()
-        # Email de factura (opcional)
+        _vaciar_totales()
+        if _RESERVAR_STOCK:
+            reserva_stock.stock_cambiado(reserva_stock.agrupar_lineas(normalized))
+        # PDF en el hilo de render: listo para la descarga y el adjunto del correo
+        pdf_factura.precalentar(fac.id)
         if email:
-            try:
-                _enviar_factura_email(email=email, numero=fac.numero_factura, total=fac.total, nit=nit,
-                                      items=normalized, pago_metodo=pago_metodo, entrega_metodo=entrega_metodo,
-                                      envio_nombre=envio_nombre, envio_telefono=envio_telefono, envio_direccion=envio_direccion)
-            except Exception:
-                pass
+            outbox.despertar()
         return jsonify({
             "id": fac.id,
             "numero_factura": fac.numero_factura,
@@ -151,7 +280,7 @@ def crear_factura():
             "envio_telefono": envio_telefono,
             "envio_direccion": envio_direccion,
             "origen": origen,
-            "total": fac.total,
+            "total": float(fac.total),
             "fecha": fac.fecha.isoformat() if fac.fecha else None,
         }), 201
     except Exception:
@@ -161,16 +290,159 @@ def crear_factura():
         session.close()
 
 
+_BATCH_MAX = int(os.getenv("FACTURAS_BATCH_MAX", "500"))
+
+
+def _fecha_offline(raw) -> tuple[datetime | None, str | None]:
+    """`fecha` opcional de una venta hecha sin conexión (ISO 8601, no futura)."""
+    if raw in (None, ""):
+        return None, None
+    try:
+        fecha = datetime.fromisoformat(str(raw).replace("Z", "+00:00"))
+    except ValueError:
+        return None, "'fecha' inválida (ISO 8601)."
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone().replace(tzinfo=None)
+    if fecha > datetime.now():
+        return None, "'fecha' no puede ser futura."
+    return fecha, None
+
+
+@facturas_bp.post("/facturas/batch")
+@idempotente
+def crear_facturas_lote():
+    """Lote de facturas del POS (ventas sin conexión) en una sola petición y transacción.
+
+    Cada factura reserva su stock en un SAVEPOINT: si no alcanza, solo esa se rechaza.
+    Luego se numeran todas las aceptadas de un día con un UPDATE, se insertan las
+    cabeceras con un INSERT ... RETURNING y todas las líneas con un executemany.
+    Con "atomico": true cualquier rechazo deshace el lote completo.
+    Solo admin: el POS fija precios y origen de cada venta.
+    """
+    if not es_admin_peticion():
+        return jsonify({"error": "No autorizado"}), 403
+    data = request.get_json(silent=True) or {}
+    facturas = data.get("facturas")
+    atomico = bool(data.get("atomico"))
+    if not isinstance(facturas, list) or not facturas:
+        return jsonify({"error": "'facturas' es requerido y no puede estar vacío."}), 400
+    if len(facturas) > _BATCH_MAX:
+        return jsonify({"error": f"Máximo {_BATCH_MAX} facturas por lote."}), 400
+
+    resultados: list[dict] = [{"indice": i} for i in range(len(facturas))]
+    validas: list[tuple[int, dict]] = []
+    for i, cuerpo in enumerate(facturas):
+        datos, err = _validar_factura(cuerpo if isinstance(cuerpo, dict) else {})
+        if not err:
+            datos["fecha"], err = _fecha_offline(cuerpo.get("fecha"))
+        if err:
+            resultados[i].update(status=400, error=err)
+        else:
+            validas.append((i, datos))
+    if atomico and len(validas) < len(facturas):
+        return jsonify({"creadas": 0, "rechazadas": len(facturas), "resultados": resultados}), 400
+
+    _, SessionLocal = _db()
+    session = SessionLocal()
+    try:
+        if session.get_bind().dialect.name == "sqlite":
+            # pysqlite solo abre la transacción ante DML: sin un BEGIN explícito el primer
+            # SAVEPOINT haría de BEGIN y su RELEASE confirmaría (el rollback del lote no lo desharía)
+            session.connection().exec_driver_sql("BEGIN")
+        aceptadas: list[tuple[int, dict]] = []
+        for i, datos in validas:
+            if _RESERVAR_STOCK:
+                sp = session.begin_nested()
+                faltantes = reserva_stock.reservar(session, datos["items"])
+                if faltantes:
+                    sp.rollback()
+                    resultados[i].update(status=409, error="Stock insuficiente.", faltantes=faltantes)
+                    continue
+                sp.commit()
+            aceptadas.append((i, datos))
+        if atomico and len(aceptadas) < len(validas):
+            session.rollback()
+            return jsonify({"creadas": 0, "rechazadas": len(facturas), "resultados": resultados}), 409
+
+        # Números: un UPDATE por día (las ventas sin conexión traen su fecha)
+        ahora = datetime.now()
+        por_dia: dict[str, list[tuple[int, dict]]] = {}
+        for i, datos in aceptadas:
+            por_dia.setdefault((datos["fecha"] or ahora).strftime('%Y%m%d'), []).append((i, datos))
+        for grupo in por_dia.values():
+            numeros = _reservar_numeros(session, grupo[0][1]["fecha"] or ahora, len(grupo))
+            for (i, datos), numero in zip(grupo, numeros):
+                datos["numero_factura"] = numero
+
+        # Cabeceras: las que traen fecha la fijan; el resto usa el default del servidor
+        columnas = ("numero_factura", "email", "nit", "pago_metodo", "entrega_metodo", "envio_nombre",
+                    "envio_telefono", "envio_direccion", "total", "origen")
+        creadas: dict[int, object] = {}
+        for con_fecha in (False, True):
+            lote = [(i, d) for i, d in aceptadas if (d["fecha"] is not None) == con_fecha]
+            if not lote:
+                continue
+            filas = []
+            for _, d in lote:
+                fila = {("user_email" if c == "email" else c): d[c] for c in columnas}
+                if con_fecha:
+                    fila["fecha"] = d["fecha"]
+                filas.append(fila)
+            res = session.execute(
+                insert(FacturaORM).returning(FacturaORM.id, FacturaORM.numero_factura, FacturaORM.total,
+                                             FacturaORM.fecha, sort_by_parameter_order=True),
+                filas,
+            ).all()
+            for (i, _), fac in zip(lote, res):
+                creadas[i] = fac
+
+        lineas = [dict(it, id_factura=creadas[i].id) for i, d in aceptadas for it in d["items"]]
+        if lineas:
+            session.execute(insert(FacturaItemORM), lineas)
+        con_email = False
+        for i, d in aceptadas:
+            fac = creadas[i]
+            rollups_ventas.acumular_factura(session, fecha=fac.fecha, total=fac.total, origen=d["origen"],
+                                            pago_metodo=d["pago_metodo"], entrega_metodo=d["entrega_metodo"],
+                                            items=d["items"])
+            if d["email"]:
+                _encolar_email_factura(session, fac, d)
+                con_email = True
+
+        session.commit()
+    except Exception:
+        session.rollback()
+        current_app.logger.exception("lote de facturas fallo")
+        return jsonify({"error": "Error al crear facturas."}), 500
+    finally:
+        session.close()
+
+    _vaciar_totales()
+    if _RESERVAR_STOCK and aceptadas:
+        reserva_stock.stock_cambiado(reserva_stock.agrupar_lineas(it for _, d in aceptadas for it in d["items"]))
+    for i, fac in creadas.items():
+        pdf_factura.precalentar(fac.id)
+        resultados[i].update(
+            status=201, id=fac.id, numero_factura=fac.numero_factura, total=float(fac.total),
+            fecha=fac.fecha.isoformat() if isinstance(fac.fecha, datetime) else fac.fecha,
+        )
+    if con_email:
+        outbox.despertar()
+    return jsonify({"creadas": len(creadas), "rechazadas": len(facturas) - len(creadas), "resultados": resultados}), 200
+
+
 @facturas_bp.get("/facturas/<int:fid>")
 def obtener_factura(fid: int):
-    db_uri = resolve_db_uri()
-    engine, SessionLocal = get_engine_and_session(db_uri)
-    _ensure_factura_columns(engine)
+    _, SessionLocal = _db()
     session = SessionLocal()
     try:
         fac = session.query(FacturaORM).filter_by(id=fid).first()
         if not fac:
-            return jsonify({"error": "Factura no encontrada."}), 404
+            # Facturas viejas: ya no están en las tablas calientes, se leen del archivo frío
+            archivada = archivo_frio.buscar_factura(fid)
+            if archivada is None:
+                return jsonify({"error": "Factura no encontrada."}), 404
+            return jsonify(dict(archivada, archivada=True)), 200
         items = session.query(FacturaItemORM).filter_by(id_factura=fid).all()
         return jsonify({
             "id": fac.id,
@@ -203,11 +475,11 @@ def obtener_factura(fid: int):
         session.close()
 
 
-def _enviar_factura_email(*, email: str, numero: str, total: float, nit: str | None,
-                          items: list[dict], pago_metodo: str | None,
-                          entrega_metodo: str | None, envio_nombre: str | None,
-                          envio_telefono: str | None, envio_direccion: str | None) -> None:
-    cliente = GoogleSMTPCliente()
+def _factura_email(*, numero: str, total: float, nit: str | None,
+                   items: list[dict], pago_metodo: str | None,
+                   entrega_metodo: str | None, envio_nombre: str | None,
+                   envio_telefono: str | None, envio_direccion: str | None) -> tuple[str, str, str]:
+    """Arma (asunto, html, texto_plano) del correo de factura."""
     filas = ''.join(
         f"<tr><td>{(it.get('nombre') or 'Producto')}</td><td style='text-align:right'>Q{float(it.get('precio') or 0):.2f}</td><td style='text-align:center'>{int(it.get('cantidad') or 1)}</td><td style='text-align:right'>Q{float(it.get('subtotal') or 0):.2f}</td></tr>"
         for it in items
@@ -225,20 +497,22 @@ def _enviar_factura_email(*, email: str, numero: str, total: float, nit: str | N
     </table>
     <p style='text-align:right;font-size:1.1rem'><strong>Total: Q{float(total):.2f}</strong></p>
     """
-    cliente.enviar_email(para=email, asunto=f"Factura {numero}", html=html, texto_plano=f"Factura {numero} Total Q{float(total):.2f}")
+    return f"Factura {numero}", html, f"Factura {numero} Total Q{float(total):.2f}"
 
 
 @facturas_bp.get("/facturas/print/<int:fid>")
 def imprimir_factura(fid: int):
     """Vista HTML imprimible para guardar como PDF desde el navegador."""
-    db_uri = resolve_db_uri()
-    engine, SessionLocal = get_engine_and_session(db_uri)
-    _ensure_factura_columns(engine)
+    _, SessionLocal = _db()
     session = SessionLocal()
     try:
         fac = session.query(FacturaORM).filter_by(id=fid).first()
         if not fac:
-            return "Factura no encontrada", 404
+            archivada = archivo_frio.buscar_factura(fid)
+            if archivada is None:
+                return "Factura no encontrada", 404
+            fecha = datetime.fromisoformat(archivada["fecha"]) if archivada.get("fecha") else None
+            return render_template("factura_print.html", fac=dict(archivada, fecha=fecha), items=archivada["items"])
         items = session.query(FacturaItemORM).filter_by(id_factura=fid).all()
         return render_template("factura_print.html", fac=fac, items=items)
     except Exception:
@@ -247,29 +521,72 @@ def imprimir_factura(fid: int):
         session.close()
 
 
+@facturas_bp.get("/facturas/<int:fid>/pdf")
+def descargar_factura_pdf(fid: int):
+    """PDF generado en el servidor, cacheado en disco por (id, huella del contenido).
+    La huella es el ETag: If-None-Match coincidente responde 304 sin leer el archivo."""
+    try:
+        datos = pdf_factura.datos_factura(fid)
+        if datos is None:
+            return jsonify({"error": "Factura no encontrada."}), 404
+        etag = pdf_factura.huella(datos)
+        if etag in request.if_none_match:
+            resp = Response(status=304)
+        else:
+            pdf, _ = pdf_factura.pdf_de(datos)
+            resp = Response(pdf, mimetype="application/pdf")
+            nombre = "inline" if request.args.get("descargar") in (None, "", "0") else "attachment"
+            resp.headers["Content-Disposition"] = f'{nombre}; filename="{datos["numero_factura"]}.pdf"'
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "private, no-cache"
+        return resp
+    except Exception:
+        return jsonify({"error": "Error al generar PDF de factura."}), 500
+
+
 @facturas_bp.get("/facturas")
 def listar_facturas():
     """Lista facturas por email (querystring) o por sesión de usuario, con filtro por fecha.
 
+    Orden: fecha DESC, id DESC (cubierto por los índices (user_email, fecha, id) y (fecha, id)).
+
     Query params:
       - email (opcional)
       - from (YYYY-MM-DD opcional)
       - to   (YYYY-MM-DD opcional, inclusivo)
-      - page (1..n)  por defecto 1
+      - cursor (opcional) valor de `next_cursor` de la respuesta anterior; costo constante sin importar la profundidad
+      - page (1..n)  por defecto 1 (OFFSET; se ignora si viene cursor)
       - limit (1..50) por defecto 10
+      - total ('cache' por defecto | 'exacto' | 'no') → conteo cacheado FACTURAS_TOTAL_TTL s, recalculado o omitido
+      - fields (opcional) p.ej. id,numero_factura,total,fecha → limita columnas del SELECT y del JSON
     """
     email = (request.args.get("email") or (flask_session.get("user_email") if flask_session else None))
     page = max(1, int(request.args.get("page", 1) or 1))
     limit = max(1, min(int(request.args.get("limit", 10) or 10), 50))
     from_q = (request.args.get("from") or request.args.get("desde") or "").strip()
     to_q = (request.args.get("to") or request.args.get("hasta") or "").strip()
+    modo_total = (request.args.get("total") or "cache").strip().lower()
+    if modo_total not in ("cache", "exacto", "no"):
+        return jsonify({"error": "total debe ser 'cache', 'exacto' o 'no'."}), 400
+    cursor = None
+    if request.args.get("cursor"):
+        cursor = _leer_cursor(request.args["cursor"])
+        if cursor is None:
+            return jsonify({"error": "cursor inválido."}), 400
+    campos, err = parsear_campos(request.args.get("fields"), _CAMPOS_LISTADO)
+    if err:
+        return jsonify({"error": err}), 400
+    campos = campos or list(_CAMPOS_LISTADO)
+    # Columnas a leer: las pedidas (print_url y el cursor necesitan id)
+    columnas = [c for c in campos if c != "print_url"]
+    if "id" not in columnas:
+        columnas.append("id")
 
-    db_uri = resolve_db_uri()
-    engine, SessionLocal = get_engine_and_session(db_uri)
-    _ensure_factura_columns(engine)
+    engine, SessionLocal = _db()
     session = SessionLocal()
     try:
-        q = session.query(FacturaORM)
+        q = session.query(FacturaORM).with_entities(
+            *[getattr(FacturaORM, c) for c in columnas], _fecha_orden(engine).label("fecha_orden"))
         if email:
             q = q.filter(FacturaORM.user_email == email)
         # Filtro por rango de fechas (opcional)
@@ -288,27 +605,120 @@ def listar_facturas():
             q = q.filter(FacturaORM.fecha >= from_dt)
         if to_dt:
             q = q.filter(FacturaORM.fecha <= to_dt)
-        total = q.count()
-        rows = q.order_by(FacturaORM.id.desc()).offset((page - 1) * limit).limit(limit).all()
+
+        total = None
+        total_cacheado = False
+        if modo_total != "no":
+            clave = (email, from_dt, to_dt)
+            if modo_total == "cache":
+                total = _total_cacheado(clave)
+                total_cacheado = total is not None
+            if total is None:
+                total = q.order_by(None).count()
+                _guardar_total(clave, total)
+
+        q = q.order_by(FacturaORM.fecha.desc(), FacturaORM.id.desc())
+        if cursor is not None:
+            fecha_c, id_c = cursor
+            q = q.filter(tuple_(FacturaORM.fecha, FacturaORM.id) < tuple_(_valor_fecha(fecha_c, engine), literal(id_c)))
+        else:
+            q = q.offset((page - 1) * limit)
+        rows = q.limit(limit + 1).all()
+        hay_mas = len(rows) > limit
+        rows = rows[:limit]
         out = []
-        for fac in rows:
-            out.append({
-                "id": fac.id,
-                "numero_factura": fac.numero_factura,
-                "user_email": fac.user_email,
-                "nit": fac.nit,
-                "pago_metodo": fac.pago_metodo,
-                "entrega_metodo": fac.entrega_metodo,
-                "total": fac.total,
-                "fecha": fac.fecha.isoformat() if fac.fecha else None,
-                "origen": fac.origen,
-                "print_url": f"/api/v1/facturas/print/{fac.id}",
-            })
-        return jsonify({"items": out, "total": total, "page": page, "limit": limit}), 200
+        for row in rows:
+            fac = row._mapping
+            item = {}
+            for c in campos:
+                if c == "print_url":
+                    item[c] = f"/api/v1/facturas/print/{fac['id']}"
+                elif c == "fecha":
+                    item[c] = fac["fecha"].isoformat() if fac["fecha"] else None
+                else:
+                    item[c] = fac[c]
+            out.append(item)
+        siguiente = _crear_cursor(rows[-1]._mapping["fecha_orden"], rows[-1]._mapping["id"]) if (hay_mas and rows) else None
+        resp = {"items": out, "limit": limit, "next_cursor": siguiente}
+        if cursor is None:
+            resp["page"] = page
+        if modo_total != "no":
+            resp["total"] = total
+            resp["total_cacheado"] = total_cacheado
+        return jsonify(resp), 200
     except Exception:
         return jsonify({"error": "Error al listar facturas."}), 500
     finally:
         session.close()
 
 
+# ---------------- Paginación por cursor (keyset) -----------------
+
+_TOTAL_TTL = float(os.getenv("FACTURAS_TOTAL_TTL", "30"))
+_TOTAL_MAX = int(os.getenv("FACTURAS_TOTAL_MAX", "512"))
+# (email, desde, hasta) -> (monotonic, total). LRU acotado; en los demás workers el TTL
+# limita cuánto tarda en verse una factura nueva (en este se vacía al crearla)
+_totales: "OrderedDict[tuple, tuple[float, int]]" = OrderedDict()
+_totales_lock = threading.Lock()
+
+
+def _total_cacheado(clave) -> int | None:
+    with _totales_lock:
+        hit = _totales.get(clave)
+        if hit is None:
+            return None
+        if time.monotonic() - hit[0] >= _TOTAL_TTL:
+            del _totales[clave]
+            return None
+        _totales.move_to_end(clave)
+        return hit[1]
+
+
+def _guardar_total(clave, total: int) -> None:
+    with _totales_lock:
+        _totales[clave] = (time.monotonic(), total)
+        _totales.move_to_end(clave)
+        while len(_totales) > _TOTAL_MAX:
+            _totales.popitem(last=False)
+
+
+def _vaciar_totales() -> None:
+    with _totales_lock:
+        _totales.clear()
+
+
+def _fecha_orden(engine):
+    """`fecha` tal como se compara en el cursor.
+
+    SQLite guarda DateTime como texto ('YYYY-MM-DD HH:MM:SS' vía CURRENT_TIMESTAMP o con
+    '.ffffff' si lo escribe SQLAlchemy): se lee el texto crudo para que la igualdad del
+    desempate por id sea exacta y el WHERE siga usando el índice.
+    """
+    if engine.dialect.name == "sqlite":
+        return type_coerce(FacturaORM.fecha, String())
+    return FacturaORM.fecha
+
+
+def _valor_fecha(fecha: str, engine):
+    if engine.dialect.name == "sqlite":
+        return literal(fecha, String())
+    return literal(datetime.fromisoformat(fecha), DateTime())
+
+
+def _crear_cursor(fecha, fid: int) -> str:
+    texto = fecha if isinstance(fecha, str) else fecha.isoformat()
+    crudo = f"{texto}|{int(fid)}".encode("utf-8")
+    return base64.urlsafe_b64encode(crudo).decode("ascii").rstrip("=")
+
+
+def _leer_cursor(token: str) -> tuple[str, int] | None:
+    try:
+        crudo = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("utf-8")
+        fecha, fid = crudo.rsplit("|", 1)
+        datetime.fromisoformat(fecha)
+        return fecha, int(fid)
+    except Exception:
+        return None
+
+
     
@@ -2,11 +2,13 @@ from __future__ import annotations
 
 from flask import Blueprint, request, jsonify, session, current_app
 import os
+import time
 import unicodedata
 
 from servicios.ia.chat_service import generar_respuesta_catalogo
 from servicios.servicio_catalogo.infraestructura.persistencia.pg_repositorio_producto import PGRepositorioProducto
 from servicios.admin.infraestructura.tickets_repo import TicketsRepo
+from servicios.servicio_catalogo.infraestructura.analitica import registro_busquedas
 from servicios.servicio_catalogo.infraestructura.persistencia.sqlite_repositorio_producto import (
     SQLiteRepositorioProducto,
 )
@@ -26,7 +28,9 @@ def ia_chat():
         return jsonify({"ok": False, "error": "message requerido"}), 400
 
     # (Opcional) obtén contexto del catálogo: top N productos o por palabra clave
-    catalog_items = _catalog_context(user_msg, limit=8)
+    inicio = time.perf_counter()
+    catalog_items, encontrados = _catalog_context(user_msg, limit=8)
+    registro_busquedas.registrar('ia', user_msg, encontrados, (time.perf_counter() - inicio) * 1000)
     contexto = catalog_items or None
 
     try:
@@ -73,10 +77,11 @@ def _is_greeting(text: str) -> bool:
 
 
 
-def _catalog_context(query: str, limit: int = 8) -> list[dict]:
+def _catalog_context(query: str, limit: int = 8) -> tuple[list[dict], int]:
     """Obtiene contexto del catálogo para el prompt.
     - Si el usuario pide algo genérico ("todos", "productos", "catálogo"), traer lista completa.
     - Si la búsqueda no devuelve resultados, hacer fallback a lista completa.
+    Devuelve (items, encontrados): `encontrados` es lo que halló la búsqueda antes del fallback.
     """
     try:
         q = (query or "").strip()
@@ -89,6 +94,7 @@ def _catalog_context(query: str, limit: int = 8) -> list[dict]:
         wants_all = (not q) or any(tok in nt for tok in generic_intents)
 
         items = _catalog_repo.obtener_todos() if wants_all else _catalog_repo.buscar_productos(q)
+        encontrados = len(items)
         # Fallback si búsqueda literal no encuentra nada
         if not items:
             items = _catalog_repo.obtener_todos()
@@ -104,9 +110,9 @@ def _catalog_context(query: str, limit: int = 8) -> list[dict]:
                     "precio": getattr(p, "precio", 0),
                     "tipo": p.__class__.__name__,
                 })
-        return data
+        return data, encontrados
     except Exception:
-        return []
+        return [], 0
 # --- Pruebas rápidas ---
 # IA:
 # curl -s -X POST "$APP_BASE_URL/api/v1/ia/chat" \
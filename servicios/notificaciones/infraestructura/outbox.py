@@ -0,0 +1,307 @@
+# servicios/notificaciones/infraestructura/outbox.py
+from __future__ import annotations
+
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+from sqlalchemy import create_engine, func, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from configuracion import Config
+from inicializar_db import NotificacionORM
+from servicios.servicio_autenticacion.infraestructura.clientes_externos.google_smtp_cliente import GoogleSMTPCliente
+from utils.tareas import TareaPeriodica
+
+# ==============================================================================
+# OUTBOX DE NOTIFICACIONES
+# Las rutas solo insertan una fila (idealmente en su misma transacción); el
+# despachador toma lotes, envía todos los correos del lote por UNA conexión SMTP,
+# y reintenta con backoff exponencial hasta OUTBOX_MAX_INTENTOS.
+# El lease se renueva antes de cada envío y el resultado se confirma por mensaje:
+# un lote lento (adjuntos PDF) no caduca a medias ni se reenvía desde otro worker.
+# ==============================================================================
+
+_INTERVALO = float(os.getenv("OUTBOX_INTERVALO", "5"))
+_LOTE = int(os.getenv("OUTBOX_LOTE", "50"))
+_MAX_INTENTOS = int(os.getenv("OUTBOX_MAX_INTENTOS", "6"))
+_BACKOFF_BASE = 30          # segundos: 30, 60, 120, ... (tope 1 h)
+_BACKOFF_MAX = 3600
+_LEASE = timedelta(minutes=5)  # si un worker muere con el lote tomado, se libera tras este plazo
+
+ESTADOS = ("pendiente", "enviando", "enviado", "fallido")
+
+Adjunto = Tuple[str, bytes, str]  # (nombre_archivo, contenido, mimetype)
+# Prefijo de `referencia` -> función(id) que devuelve adjuntos (p.ej. 'factura' -> PDF)
+_proveedores_adjuntos: Dict[str, Callable[[str], List[Adjunto]]] = {}
+
+_engine = None
+_Session = None
+
+
+def _sesion():
+    global _engine, _Session
+    if _Session is None:
+        _engine = create_engine(Config.SQLALCHEMY_DATABASE_URI, future=True)
+        _Session = sessionmaker(bind=_engine, autoflush=False, autocommit=False, future=True)
+        try:
+            NotificacionORM.__table__.create(_engine, checkfirst=True)
+        except Exception as e:
+            print(f"[WARN] No se pudo verificar/crear tabla notificaciones_outbox: {e}")
+    return _Session()
+
+
+# ------------------------------------------------------------------------------
+# Encolar
+# ------------------------------------------------------------------------------
+def encolar(canal: str, *, destinatario: Optional[str] = None, asunto: Optional[str] = None,
+            cuerpo_html: Optional[str] = None, texto_plano: Optional[str] = None,
+            referencia: Optional[str] = None, session=None) -> None:
+    """Inserta una notificación pendiente.
+
+    Con `session` se escribe en la transacción del llamador (se envía solo si hace commit);
+    sin ella se usa una transacción propia. Tras el commit conviene llamar a despertar().
+    """
+    valores = {
+        'canal': canal,
+        'destinatario': destinatario,
+        'asunto': asunto,
+        'cuerpo_html': cuerpo_html,
+        'texto_plano': texto_plano,
+        'referencia': referencia,
+        'estado': 'pendiente',
+        'intentos': 0,
+        'proximo_intento': datetime.now(),
+        'creado_en': datetime.now(),
+    }
+    if session is not None:
+        session.execute(insert(NotificacionORM).values(**valores))
+        return
+    with _sesion() as s:
+        s.execute(insert(NotificacionORM).values(**valores))
+        s.commit()
+    despertar()
+
+
+def encolar_email(destinatario: str, asunto: str, cuerpo_html: str, texto_plano: Optional[str] = None,
+                  referencia: Optional[str] = None, session=None) -> None:
+    encolar('email', destinatario=destinatario, asunto=asunto, cuerpo_html=cuerpo_html,
+            texto_plano=texto_plano, referencia=referencia, session=session)
+
+
+def encolar_slack(texto: str, referencia: Optional[str] = None, session=None) -> None:
+    if os.getenv('SLACK_WEBHOOK_URL'):
+        encolar('slack', texto_plano=texto, referencia=referencia, session=session)
+
+
+def registrar_adjuntos(prefijo: str, proveedor: Callable[[str], List[Adjunto]]) -> None:
+    """Los correos con referencia '<prefijo>:<id>' se envían con proveedor(id) adjunto."""
+    _proveedores_adjuntos[prefijo] = proveedor
+
+
+def _adjuntos(referencia: Optional[str]) -> List[Adjunto]:
+    prefijo, _, ident = (referencia or '').partition(':')
+    proveedor = _proveedores_adjuntos.get(prefijo)
+    if not proveedor or not ident:
+        return []
+    try:
+        return proveedor(ident) or []
+    except Exception as e:
+        # El correo sale igual, sin adjunto
+        print(f"[WARN] No se pudo generar adjunto para {referencia}: {e}")
+        return []
+
+
+# ------------------------------------------------------------------------------
+# Despacho
+# ------------------------------------------------------------------------------
+def _reclamar_lote(s) -> Tuple[str, List[NotificacionORM]]:
+    """Marca hasta _LOTE filas vencidas como 'enviando' con un token propio (seguro entre workers)."""
+    ahora = datetime.now()
+    token = uuid.uuid4().hex
+    s.execute(text(
+        """
+        UPDATE notificaciones_outbox
+           SET estado = 'enviando', reclamado_por = :token, proximo_intento = :lease
+         WHERE id IN (
+                 SELECT id FROM notificaciones_outbox
+                  WHERE estado IN ('pendiente', 'enviando') AND proximo_intento <= :ahora
+                  ORDER BY id
+                  LIMIT :lote)
+           AND estado IN ('pendiente', 'enviando') AND proximo_intento <= :ahora
+        """
+    ), {'token': token, 'lease': ahora + _LEASE, 'ahora': ahora, 'lote': _LOTE})
+    s.commit()
+    return token, s.query(NotificacionORM).filter(NotificacionORM.reclamado_por == token).order_by(NotificacionORM.id).all()
+
+
+def _tomar(s, n: NotificacionORM, token: str) -> bool:
+    """Renueva el lease de `n` justo antes de enviarla; False si otro worker la reclamó."""
+    r = s.execute(text(
+        "UPDATE notificaciones_outbox SET proximo_intento = :lease "
+        "WHERE id = :id AND reclamado_por = :token AND estado = 'enviando'"
+    ), {'lease': datetime.now() + _LEASE, 'id': n.id, 'token': token})
+    s.commit()
+    return r.rowcount == 1
+
+
+def _liberar(s, n: NotificacionORM) -> None:
+    """Confirma el resultado de `n` (enviado / pendiente / fallido) sin esperar al resto del lote."""
+    n.reclamado_por = None
+    s.commit()
+
+
+def _marcar_error(n: NotificacionORM, error: str) -> None:
+    n.intentos = (n.intentos or 0) + 1
+    n.ultimo_error = (error or '')[:1000]
+    if n.intentos >= _MAX_INTENTOS:
+        n.estado = 'fallido'
+    else:
+        n.estado = 'pendiente'
+        n.proximo_intento = datetime.now() + timedelta(seconds=min(_BACKOFF_BASE * 2 ** (n.intentos - 1), _BACKOFF_MAX))
+
+
+def _marcar_enviado(n: NotificacionORM) -> None:
+    n.intentos = (n.intentos or 0) + 1
+    n.estado = 'enviado'
+    n.enviado_en = datetime.now()
+    n.ultimo_error = None
+
+
+def _despachar_emails(s, token: str, pendientes: List[NotificacionORM]) -> None:
+    cliente = GoogleSMTPCliente()
+    if cliente.suppress_send:
+        for n in pendientes:
+            print(f"[SMTP SUPPRESS] To:{n.destinatario} Subject:{n.asunto}")
+            _marcar_enviado(n)
+            _liberar(s, n)
+        return
+    if not cliente.configurado:
+        for n in pendientes:
+            _marcar_error(n, 'SMTP sin credenciales (SMTP_USER/SMTP_PASSWORD)')
+            _liberar(s, n)
+        return
+    server = None
+    try:
+        for n in pendientes:
+            if not _tomar(s, n, token):
+                continue
+            try:
+                if server is None:
+                    server = cliente.conectar()
+                cliente.enviar_por_conexion(server, n.destinatario, n.asunto or '', n.cuerpo_html or '', n.texto_plano,
+                                            adjuntos=_adjuntos(n.referencia))
+                _marcar_enviado(n)
+            except Exception as e:
+                _marcar_error(n, str(e))
+                # Conexión posiblemente rota: reabrir para el siguiente
+                try:
+                    if server is not None:
+                        server.close()
+                except Exception:
+                    pass
+                server = None
+            _liberar(s, n)
+    finally:
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                pass
+
+
+def _despachar_slack(s, token: str, pendientes: List[NotificacionORM]) -> None:
+    webhook = os.getenv('SLACK_WEBHOOK_URL')
+    if not webhook:
+        for n in pendientes:
+            _marcar_error(n, 'SLACK_WEBHOOK_URL no configurado')
+            _liberar(s, n)
+        return
+    with requests.Session() as http:
+        for n in pendientes:
+            if not _tomar(s, n, token):
+                continue
+            try:
+                r = http.post(webhook, json={"text": n.texto_plano or ''}, timeout=5)
+                r.raise_for_status()
+                _marcar_enviado(n)
+            except Exception as e:
+                _marcar_error(n, str(e))
+            _liberar(s, n)
+
+
+def despachar() -> int:
+    """Procesa lotes hasta vaciar lo vencido. Devuelve notificaciones procesadas."""
+    total = 0
+    while True:
+        with _sesion() as s:
+            token, lote = _reclamar_lote(s)
+            if not lote:
+                return total
+            _despachar_emails(s, token, [n for n in lote if n.canal == 'email'])
+            _despachar_slack(s, token, [n for n in lote if n.canal == 'slack'])
+            for n in lote:
+                if n.canal not in ('email', 'slack'):
+                    n.estado = 'fallido'
+                    n.ultimo_error = f"canal desconocido: {n.canal}"
+                    _liberar(s, n)
+            total += len(lote)
+
+
+# ------------------------------------------------------------------------------
+# Estado (admin)
+# ------------------------------------------------------------------------------
+def _a_dict(n: NotificacionORM) -> Dict[str, Any]:
+    return {
+        'id': n.id,
+        'canal': n.canal,
+        'destinatario': n.destinatario,
+        'asunto': n.asunto,
+        'referencia': n.referencia,
+        'estado': n.estado,
+        'intentos': n.intentos,
+        'proximo_intento': n.proximo_intento.isoformat() if n.proximo_intento else None,
+        'ultimo_error': n.ultimo_error,
+        'creado_en': n.creado_en.isoformat() if n.creado_en else None,
+        'enviado_en': n.enviado_en.isoformat() if n.enviado_en else None,
+    }
+
+
+def estado_outbox(estado: Optional[str] = None, referencia: Optional[str] = None, limite: int = 50) -> Dict[str, Any]:
+    with _sesion() as s:
+        conteos = dict(s.query(NotificacionORM.estado, func.count()).group_by(NotificacionORM.estado).all())
+        q = s.query(NotificacionORM)
+        if estado:
+            q = q.filter(NotificacionORM.estado == estado)
+        if referencia:
+            q = q.filter(NotificacionORM.referencia == referencia)
+        items = [_a_dict(n) for n in q.order_by(NotificacionORM.id.desc()).limit(limite).all()]
+    return {'conteos': {e: int(conteos.get(e, 0)) for e in ESTADOS}, 'items': items}
+
+
+def reintentar(notificacion_id: int) -> bool:
+    """Devuelve una notificación fallida (o pendiente) a la cola para envío inmediato."""
+    with _sesion() as s:
+        n = s.get(NotificacionORM, int(notificacion_id))
+        if n is None or n.estado == 'enviado':
+            return False
+        n.estado = 'pendiente'
+        n.intentos = 0
+        n.proximo_intento = datetime.now()
+        s.commit()
+    despertar()
+    return True
+
+
+_tarea = TareaPeriodica('notificaciones_outbox', _INTERVALO, despachar, retraso_inicial=1)
+
+
+def despertar() -> None:
+    _tarea.despertar()
+
+
+def iniciar_despachador() -> TareaPeriodica:
+    _tarea.iniciar()
+    return _tarea
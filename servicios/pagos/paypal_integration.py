@@ -27,7 +27,7 @@ def _obtener_token(timeout: int = 10) -> str:
     return token
 
 
-def crear_orden(total: float, currency: str = "GTQ", timeout: int = 10) -> Dict:
+def crear_orden(total: float, currency: str = "GTQ", timeout: int = 10, clave_idempotencia: str | None = None) -> Dict:
     if not isinstance(total, (int, float)) or total <= 0:
         raise ValueError("Total inválido.")
     token = _obtener_token(timeout=timeout)
@@ -44,6 +44,9 @@ def crear_orden(total: float, currency: str = "GTQ", timeout: int = 10) -> Dict:
         ],
     }
     headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    if clave_idempotencia:
+        # PayPal deduplica por PayPal-Request-Id: un reintento devuelve la misma orden
+        headers["PayPal-Request-Id"] = clave_idempotencia
     resp = requests.post(url, json=payload, headers=headers, timeout=timeout)
     resp.raise_for_status()
     data = resp.json() or {}
@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
 
+from decorators import clave_idempotencia, idempotente
+
 from servicios.pagos.stripe_integration import crear_payment_intent
 from servicios.pagos.paypal_integration import crear_orden
 
@@ -8,6 +10,7 @@ payments_bp = Blueprint("payments_bp", __name__, url_prefix="/api/v1/payments")
 
 
 @payments_bp.post("/stripe/create-payment-intent")
+@idempotente
 def api_stripe_create_payment_intent():
     data = request.get_json(silent=True) or {}
     total = data.get("total")
@@ -21,7 +24,7 @@ def api_stripe_create_payment_intent():
 
     centavos = int(round(total * 100))
     try:
-        client_secret = crear_payment_intent(centavos, moneda="gtq")
+        client_secret = crear_payment_intent(centavos, moneda="gtq", clave_idempotencia=clave_idempotencia())
         return jsonify({"clientSecret": client_secret}), 200
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -32,6 +35,7 @@ def api_stripe_create_payment_intent():
 
 
 @payments_bp.post("/paypal/create-order")
+@idempotente
 def api_paypal_create_order():
     data = request.get_json(silent=True) or {}
     total = data.get("total")
@@ -45,7 +49,7 @@ def api_paypal_create_order():
         return jsonify({"error": "El total debe ser mayor a 0."}), 400
 
     try:
-        order = crear_orden(total=total, currency=currency)
+        order = crear_orden(total=total, currency=currency, clave_idempotencia=clave_idempotencia())
         approve_url = None
         for link in order.get("links", []) or []:
             if link.get("rel") == "approve":
@@ -2,9 +2,11 @@ import os
 from typing import Optional
 
 
-def crear_payment_intent(total_en_centavos: int, moneda: str = "gtq", timeout: int = 10) -> str:
+def crear_payment_intent(total_en_centavos: int, moneda: str = "gtq", timeout: int = 10,
+                         clave_idempotencia: Optional[str] = None) -> str:
     """
     Crea un PaymentIntent en Stripe y devuelve client_secret.
+    Con clave_idempotencia, Stripe devuelve el mismo PaymentIntent ante reintentos.
     Lanza ValueError si falta clave o monto inválido.
     """
     if not isinstance(total_en_centavos, int) or total_en_centavos <= 0:
@@ -26,6 +28,7 @@ def crear_payment_intent(total_en_centavos: int, moneda: str = "gtq", timeout: i
         amount=total_en_centavos,
         currency=(moneda or "gtq").lower(),
         automatic_payment_methods={"enabled": True},
+        idempotency_key=clave_idempotencia,
     )
     return intent.get("client_secret") or intent.client_secret
 
@@ -44,11 +44,12 @@ class EnviarVerificacionCorreo:
             pass
         return link
 
-    def ejecutar(self, id_usuario: str, email: Optional[str] = None, *_args, **_kwargs) -> str:
+    def ejecutar(self, id_usuario: str, email: Optional[str] = None, *_args, session=None, **_kwargs) -> str:
         """
         Genera token, lo guarda y envía el correo. Devuelve el token.
         - id_usuario: id del usuario (string)
         - email: si se pasa, se usará como destino; si no, se intenta obtener del repositorio.
+        - session: si se pasa, el token se guarda en esa transacción (el llamador hace commit).
         """
         if email is None:
             if hasattr(self.repositorio, "obtener_por_id"):
@@ -62,11 +63,14 @@ class EnviarVerificacionCorreo:
         token = self._generar_token()
 
         if hasattr(self.repositorio, "guardar_token_verificacion"):
-            self.repositorio.guardar_token_verificacion(id_usuario=id_usuario, token=token)
+            if session is not None:
+                self.repositorio.guardar_token_verificacion(id_usuario=id_usuario, token=token, session=session)
+            else:
+                self.repositorio.guardar_token_verificacion(id_usuario=id_usuario, token=token)
         else:
             raise RuntimeError("El repositorio no implementa guardar_token_verificacion")
 
-        link = self._construir_link_verificacion(id_usuario=id_usuario, email=email, token=token)
+        link = self._construir_link_verificacion(id_usuario=id_usuario, email=email, _token_legacy=token)
         asunto = "Verifica tu cuenta - Librería Jehová Jiréh"
         html = f"""
         <html>
@@ -40,6 +40,16 @@ class IniciarSesion:
         if not self.hasher.verify(password, usuario.password_hash):
             raise ValueError("Credenciales inválidas. Verifique su email y contraseña.")
 
-        # 3. Retornar el objeto Usuario
+        # 3. Rehash transparente si cambió el costo configurado (rondas)
+        # El hasher puede no soportarlo (p. ej. passlib directo); no debe impedir el login
+        necesita_rehash = getattr(self.hasher, "necesita_rehash", None)
+        if necesita_rehash and necesita_rehash(usuario.password_hash):
+            try:
+                usuario.password_hash = self.hasher.hash(password)
+                self.repositorio.actualizar_password_hash(usuario.id_usuario, usuario.password_hash)
+            except Exception as e:
+                print(f"[WARN] No se pudo actualizar el hash de contraseña: {e}")
+
+        # 4. Retornar el objeto Usuario
         # El controlador de Flask puede usar este objeto para generar un token de sesion
         return usuario
\ No newline at end of file
@@ -25,17 +25,17 @@ class RegistrarUsuario:
         self.repositorio = repositorio
         self.hasher = hasher
 
-    def ejecutar(self, nombre: str, email: str, password: str, es_admin: bool = False) -> Usuario:
+    def ejecutar(self, nombre: str, email: str, password: str, es_admin: bool = False, session=None) -> Usuario:
         """
         Ejecuta la logica de registro.
+        Con `session` el INSERT queda en la transaccion del llamador (que hace el commit).
 
-        :raises ValueError: Si el email ya existe.
+        :raises ValueError: Si el email ya existe (violacion de la restriccion unica).
         :returns: La entidad Usuario recien creada.
         """
-        # 1. Validacion de Reglas de Negocio
-        if self.repositorio.email_existe(email):
-            raise ValueError(f"El email '{email}' ya se encuentra registrado.")
-        
+        # 1. Email unico: lo garantiza la restriccion de la BD al insertar (paso 4),
+        # sin una consulta previa que ademas podria perder una carrera entre dos registros
+
         # 2. Hashing de la Contraseña (Seguridad)
         # El hasher es inyectado desde la capa de Presentacion/Infraestructura (rutas.py)
         password_hash = self.hasher.hash(password)
@@ -54,6 +54,7 @@ class RegistrarUsuario:
         )
 
         # 4. Persistencia (Usando la Interfaz, no la implementacion SQLite directa)
-        self.repositorio.guardar_usuario(nuevo_usuario)
+        # crear_usuario lanza ValueError si el email ya existe
+        self.repositorio.crear_usuario(nuevo_usuario, session=session)
 
         return nuevo_usuario
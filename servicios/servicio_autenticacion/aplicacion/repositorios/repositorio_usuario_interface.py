@@ -23,7 +23,14 @@ class IRepositorioUsuario(ABC):
 
     @abstractmethod
     def obtener_por_email(self, email: str) -> Optional[Usuario]:
-        """Busca un usuario por su correo electronico (usado en login y registro)."""
+        """Busca un usuario por su correo electronico (usado en login y registro).
+        Devuelve el registro completo (incluye verificado y es_admin) en una sola consulta."""
+        pass
+
+    @abstractmethod
+    def crear_usuario(self, usuario: Usuario, session=None) -> None:
+        """Inserta un usuario nuevo. :raises ValueError: si el email ya existe (restriccion unica).
+        Con `session` escribe en la transaccion del llamador sin hacer commit."""
         pass
 
     @abstractmethod
@@ -31,6 +38,11 @@ class IRepositorioUsuario(ABC):
         """Guarda un nuevo usuario o actualiza uno existente."""
         pass
 
+    @abstractmethod
+    def actualizar_password_hash(self, id_usuario: str, password_hash: str) -> None:
+        """Reemplaza el hash de contraseña (rehash al cambiar el costo del hasher)."""
+        pass
+
     @abstractmethod
     def email_existe(self, email: str) -> bool:
         """Verifica si un correo electronico ya esta registrado."""
@@ -38,8 +50,8 @@ class IRepositorioUsuario(ABC):
 
     # ---- Extensiones para verificación de cuenta por correo ----
     @abstractmethod
-    def guardar_token_verificacion(self, id_usuario: str, token: str) -> None:
-        """Guarda el token de verificación para un usuario."""
+    def guardar_token_verificacion(self, id_usuario: str, token: str, session=None) -> None:
+        """Guarda el token de verificación para un usuario (en `session` si se pasa)."""
         pass
 
     @abstractmethod
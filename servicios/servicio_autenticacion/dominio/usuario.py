@@ -27,6 +27,7 @@ class Usuario:
     # Roles y estados
     es_admin: bool = False
     activo: bool = True
+    verificado: bool = False
     
     @classmethod
     def crear_nuevo(cls, nombre: str, email: str, password_hash: str):
@@ -9,6 +9,7 @@ Cliente SMTP básico para envío de correos de verificación.
 import os
 import smtplib
 import ssl
+from email.mime.application import MIMEApplication
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from dotenv import load_dotenv, find_dotenv
@@ -56,38 +57,62 @@ class GoogleSMTPCliente(IServicioCorreo):
             print(f"[SMTP SUPPRESS] To:{destinatario} Subject:{asunto}")
             return
 
-        msg = MIMEMultipart("alternative")
-        msg["From"] = f"{self.smtp_from_name} <{self.smtp_user}>"
-        msg["To"] = destinatario
-        msg["Subject"] = asunto
-
-        texto_plano = texto_plano or "Para ver este mensaje, habilita contenido HTML."
-        part_text = MIMEText(texto_plano, "plain", "utf-8")
-        part_html = MIMEText(cuerpo_html, "html", "utf-8")
-        msg.attach(part_text)
-        msg.attach(part_html)
-
-        if self.smtp_use_ssl:
-            try:
-                context = ssl.create_default_context()
-                with smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, timeout=self.smtp_timeout, context=context) as server:
-                    server.login(self.smtp_user, self.smtp_password)
-                    server.sendmail(self.smtp_user, destinatario, msg.as_string())
-                print(f"Correo enviado a: {destinatario}")
-                return
-            except Exception as e:
-                print(f"Error al enviar correo SMTP (SSL) a {destinatario}: {e}")
-                raise
-
+        msg = self._construir_mensaje(destinatario, asunto, cuerpo_html, texto_plano)
         try:
-            with smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.smtp_timeout) as server:
-                server.ehlo()
-                if self.smtp_use_tls:
-                    server.starttls(context=ssl.create_default_context())
-                    server.ehlo()
-                server.login(self.smtp_user, self.smtp_password)
+            with self.conectar() as server:
                 server.sendmail(self.smtp_user, destinatario, msg.as_string())
             print(f"Correo enviado a: {destinatario}")
         except Exception as e:
-            print(f"Error al enviar correo SMTP a {destinatario}: {e}")
+            print(f"Error al enviar correo SMTP{' (SSL)' if self.smtp_use_ssl else ''} a {destinatario}: {e}")
             raise
+
+    # ------------------------------------------------------------------
+    # Conexión reutilizable (despachador del outbox: varios correos por conexión)
+    # ------------------------------------------------------------------
+    @property
+    def configurado(self) -> bool:
+        return bool(self.smtp_user and self.smtp_password)
+
+    def conectar(self) -> smtplib.SMTP:
+        """Abre una conexión autenticada (SSL directo o STARTTLS). Usar con `with` o cerrar con quit()."""
+        if self.smtp_use_ssl:
+            context = ssl.create_default_context()
+            server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, timeout=self.smtp_timeout, context=context)
+        else:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.smtp_timeout)
+            server.ehlo()
+            if self.smtp_use_tls:
+                server.starttls(context=ssl.create_default_context())
+                server.ehlo()
+        server.login(self.smtp_user, self.smtp_password)
+        return server
+
+    def enviar_por_conexion(self, server: smtplib.SMTP, destinatario: str, asunto: str,
+                            cuerpo_html: str, texto_plano: str | None = None,
+                            adjuntos: list[tuple[str, bytes, str]] | None = None) -> None:
+        """adjuntos: [(nombre_archivo, contenido, mimetype)], p.ej. el PDF de una factura."""
+        msg = self._construir_mensaje(destinatario, asunto, cuerpo_html, texto_plano, adjuntos)
+        server.sendmail(self.smtp_user, destinatario, msg.as_string())
+
+    def _construir_mensaje(self, destinatario: str, asunto: str, cuerpo_html: str, texto_plano: str | None,
+                           adjuntos: list[tuple[str, bytes, str]] | None = None) -> MIMEMultipart:
+        cuerpo = MIMEMultipart("alternative")
+        texto_plano = texto_plano or "Para ver este mensaje, habilita contenido HTML."
+        part_text = MIMEText(texto_plano, "plain", "utf-8")
+        part_html = MIMEText(cuerpo_html, "html", "utf-8")
+        cuerpo.attach(part_text)
+        cuerpo.attach(part_html)
+
+        if adjuntos:
+            msg = MIMEMultipart("mixed")
+            msg.attach(cuerpo)
+            for nombre, contenido, mimetype in adjuntos:
+                parte = MIMEApplication(contenido, _subtype=(mimetype.split("/", 1)[-1] or "octet-stream"))
+                parte.add_header("Content-Disposition", "attachment", filename=nombre)
+                msg.attach(parte)
+        else:
+            msg = cuerpo
+        msg["From"] = f"{self.smtp_from_name} <{self.smtp_user}>"
+        msg["To"] = destinatario
+        msg["Subject"] = asunto
+        return msg
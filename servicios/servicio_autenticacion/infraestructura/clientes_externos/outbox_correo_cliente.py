@@ -0,0 +1,22 @@
+from servicios.servicio_autenticacion.aplicacion.servicios.servicio_correo_interface import IServicioCorreo
+from servicios.notificaciones.infraestructura import outbox
+
+
+class ServicioCorreoOutbox(IServicioCorreo):
+    """
+    Implementación de IServicioCorreo que no envía en la petición: encola el correo
+    en notificaciones_outbox y lo entrega el despachador en segundo plano.
+    Con `session` la fila entra en la transacción del llamador (p.ej. la del alta del
+    usuario): el correo solo existe si esa transacción hace commit.
+    """
+
+    def __init__(self, referencia: str | None = None, session=None):
+        self.referencia = referencia
+        self.session = session
+
+    def enviar_email(self, para: str, asunto: str, html: str, texto_plano: str | None = None) -> None:
+        return self.enviar_correo(destinatario=para, asunto=asunto, cuerpo_html=html, texto_plano=texto_plano)
+
+    def enviar_correo(self, destinatario: str, asunto: str, cuerpo_html: str, texto_plano: str | None = None) -> None:
+        outbox.encolar_email(destinatario, asunto, cuerpo_html, texto_plano, referencia=self.referencia,
+                            session=self.session)
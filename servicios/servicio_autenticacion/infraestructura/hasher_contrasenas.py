@@ -0,0 +1,118 @@
+# servicios/servicio_autenticacion/infraestructura/hasher_contrasenas.py
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturoTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from passlib.hash import pbkdf2_sha256
+
+# ==============================================================================
+# HASHER DE CONTRASEÑAS EN UN POOL DE PROCESOS
+# pbkdf2 es CPU pura y retiene el GIL: calculado en el hilo de la petición, una
+# ráfaga de logins frena todos los hilos del worker. Aquí se calcula en un pool
+# de procesos acotado; si ya hay PASSWORD_COLA_MAX cálculos en curso o en cola,
+# se rechaza enseguida (HasherSaturado -> 503) en vez de encolar sin límite.
+# Las rondas salen de PASSWORD_PBKDF2_ROUNDS; un hash con otras rondas se
+# recalcula al iniciar sesión (necesita_rehash).
+# Este módulo se importa en los procesos hijos: no debe importar Flask ni la DB.
+# ==============================================================================
+
+_ROUNDS = int(os.getenv("PASSWORD_PBKDF2_ROUNDS", str(pbkdf2_sha256.default_rounds)))
+_PROCESOS = int(os.getenv("PASSWORD_POOL_PROCESOS", str(min(2, os.cpu_count() or 1))))  # 0 = en el hilo
+_COLA_MAX = int(os.getenv("PASSWORD_COLA_MAX", str(max(1, _PROCESOS) * 4)))
+_ESPERA_SEG = float(os.getenv("PASSWORD_ESPERA_SEG", "0"))     # espera por un hueco antes del 503
+_TIMEOUT_SEG = float(os.getenv("PASSWORD_TIMEOUT_SEG", "10"))
+
+
+class HasherSaturado(RuntimeError):
+    """Demasiados cálculos de hash pendientes; el cliente debe reintentar."""
+
+
+def _hash(password: str, rounds: int) -> str:
+    return pbkdf2_sha256.using(rounds=rounds).hash(password)
+
+
+def _verify(password: str, password_hash: str) -> bool:
+    return pbkdf2_sha256.verify(password, password_hash)
+
+
+class HasherPBKDF2:
+    """Misma interfaz que passlib (hash/verify) para inyectar en los casos de uso."""
+
+    def __init__(self, rounds: int = _ROUNDS, procesos: int = _PROCESOS, cola_max: int = _COLA_MAX):
+        self.rounds = rounds
+        self.procesos = procesos
+        self._contexto = pbkdf2_sha256.using(rounds=rounds)
+        self._cupos = threading.BoundedSemaphore(max(1, cola_max))
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        if self.procesos <= 0:
+            return None
+        with self._lock:
+            if self._pool is None:
+                try:
+                    # spawn: no se heredan hilos ni conexiones del worker de gunicorn
+                    self._pool = ProcessPoolExecutor(self.procesos, mp_context=multiprocessing.get_context("spawn"))
+                except Exception as e:
+                    print(f"[WARN] Pool de hashing no disponible, se calcula en el hilo: {e}")
+                    self.procesos = 0
+            return self._pool
+
+    def _reiniciar(self, pool) -> None:
+        """Un hijo murió (BrokenProcessPool): se descarta el pool y se recrea en la próxima llamada."""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        print("[WARN] Pool de hashing roto; se recrea")
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _ejecutar(self, funcion, *args):
+        libre = self._cupos.acquire(timeout=_ESPERA_SEG) if _ESPERA_SEG > 0 else self._cupos.acquire(blocking=False)
+        if not libre:
+            raise HasherSaturado("Servidor ocupado, intenta de nuevo en unos segundos.")
+        pool = None
+        try:
+            pool = self._executor()
+            if pool is None:
+                try:
+                    return funcion(*args)
+                finally:
+                    self._cupos.release()
+            futuro = pool.submit(funcion, *args)
+        except BrokenProcessPool:
+            self._cupos.release()
+            self._reiniciar(pool)
+            raise HasherSaturado("Servidor ocupado, intenta de nuevo en unos segundos.")
+        except BaseException:
+            self._cupos.release()
+            raise
+        # El cupo se libera cuando el cálculo termina, no cuando se deja de esperarlo: tras un
+        # timeout el hijo sigue ocupado y no debe entrar otro cálculo en su lugar
+        futuro.add_done_callback(lambda _: self._cupos.release())
+        try:
+            return futuro.result(timeout=_TIMEOUT_SEG)
+        except BrokenProcessPool:
+            self._reiniciar(pool)
+            raise HasherSaturado("Servidor ocupado, intenta de nuevo en unos segundos.")
+        except FuturoTimeout:
+            raise HasherSaturado("Servidor ocupado, intenta de nuevo en unos segundos.")
+
+    def hash(self, password: str) -> str:
+        return self._ejecutar(_hash, password, self.rounds)
+
+    def verify(self, password: str, password_hash: str) -> bool:
+        return bool(self._ejecutar(_verify, password, password_hash))
+
+    def necesita_rehash(self, password_hash: str) -> bool:
+        """True si el hash se generó con otras rondas (o esquema) que las configuradas."""
+        try:
+            return self._contexto.needs_update(password_hash)
+        except Exception:
+            return False
+
+
+hasher = HasherPBKDF2()
@@ -66,7 +66,8 @@ class SQLiteRepositorioUsuario(IRepositorioUsuario):
             email=orm_usuario.email,
             password_hash=orm_usuario.password_hash,
             es_admin=bool(getattr(orm_usuario, 'is_admin', False)),
-            activo=orm_usuario.activo
+            activo=orm_usuario.activo,
+            verificado=bool(orm_usuario.verificado)
         )
 
     def _map_to_orm(self, domain_usuario: Usuario) -> UsuarioORM:
@@ -77,10 +78,16 @@ class SQLiteRepositorioUsuario(IRepositorioUsuario):
             email=domain_usuario.email,
             password_hash=domain_usuario.password_hash,
             activo=domain_usuario.activo,
-            is_admin=bool(getattr(domain_usuario, 'es_admin', False))
-            # verificado y token_verificacion quedan con sus defaults
+            is_admin=bool(getattr(domain_usuario, 'es_admin', False)),
+            verificado=bool(getattr(domain_usuario, 'verificado', False))
+            # token_verificacion queda con su default
         )
 
+    @staticmethod
+    def _email_duplicado(e: IntegrityError) -> bool:
+        msg = str(getattr(e, 'orig', e))
+        return 'duplicate key value' in msg or 'UNIQUE constraint failed' in msg or 'usuarios_email_key' in msg
+
     # --------------------------------------------------------------------------
     # Implementación del Contrato IRepositorioUsuario
     # --------------------------------------------------------------------------
@@ -110,6 +117,38 @@ class SQLiteRepositorioUsuario(IRepositorioUsuario):
         finally:
             session.close()
 
+    def crear_usuario(self, usuario: Usuario, session=None) -> None:
+        """INSERT directo: el duplicado lo detecta la restricción única de email (sin consulta previa).
+
+        Con `session` se inserta en la transacción del llamador (flush, sin commit).
+        """
+        if session is not None:
+            try:
+                session.add(self._map_to_orm(usuario))
+                session.flush()
+            except IntegrityError as e:
+                session.rollback()
+                if self._email_duplicado(e):
+                    raise ValueError(f"El email '{usuario.email}' ya se encuentra registrado.")
+                raise
+            return
+        session = Session()
+        try:
+            session.add(self._map_to_orm(usuario))
+            session.commit()
+        except IntegrityError as e:
+            session.rollback()
+            if self._email_duplicado(e):
+                raise ValueError(f"El email '{usuario.email}' ya se encuentra registrado.")
+            print(f"Error de integridad al crear usuario: {getattr(e, 'orig', e)}")
+            raise
+        except SQLAlchemyError as e:
+            session.rollback()
+            print(f"Error al crear usuario: {e}")
+            raise
+        finally:
+            session.close()
+
     def guardar_usuario(self, usuario: Usuario) -> None:
         """Guarda un nuevo usuario o actualiza uno existente (UPSERT)."""
         session = Session()
@@ -139,7 +178,7 @@ class SQLiteRepositorioUsuario(IRepositorioUsuario):
             session.rollback()
             msg = str(getattr(e, 'orig', e))
             # Manejar duplicado de email de manera amable
-            if 'duplicate key value' in msg or 'UNIQUE constraint failed' in msg or 'usuarios_email_key' in msg:
+            if self._email_duplicado(e):
                 raise ValueError("El email ya se encuentra registrado.")
             print(f"Error de integridad al guardar usuario: {msg}")
             raise
@@ -150,6 +189,21 @@ class SQLiteRepositorioUsuario(IRepositorioUsuario):
         finally:
             session.close()
 
+    def actualizar_password_hash(self, id_usuario: str, password_hash: str) -> None:
+        """Actualiza solo el hash con un UPDATE directo (sin cargar el usuario)."""
+        session = Session()
+        try:
+            session.query(UsuarioORM).filter_by(id_usuario=id_usuario).update(
+                {UsuarioORM.password_hash: password_hash}, synchronize_session=False
+            )
+            session.commit()
+        except SQLAlchemyError as e:
+            session.rollback()
+            print(f"Error al actualizar hash de contraseña: {e}")
+            raise
+        finally:
+            session.close()
+
     def email_existe(self, email: str) -> bool:
         """Verifica si un correo electrónico ya está registrado."""
         session = Session()
@@ -162,8 +216,18 @@ class SQLiteRepositorioUsuario(IRepositorioUsuario):
     # --------------------------------------------------------------------------
     # Extensiones para verificación por correo (usadas por EnviarVerificacionCorreo y /verify)
     # --------------------------------------------------------------------------
-    def guardar_token_verificacion(self, id_usuario: str, token: str) -> None:
-        """Guarda (o reemplaza) el token de verificación en el usuario."""
+    def guardar_token_verificacion(self, id_usuario: str, token: str, session=None) -> None:
+        """Guarda (o reemplaza) el token de verificación en el usuario.
+
+        Con `session` se escribe en la transacción del llamador (sin commit).
+        """
+        if session is not None:
+            n = session.query(UsuarioORM).filter_by(id_usuario=id_usuario).update(
+                {UsuarioORM.token_verificacion: token}, synchronize_session=False
+            )
+            if not n:
+                raise ValueError("Usuario no encontrado para guardar token de verificación.")
+            return
         session = Session()
         try:
             orm_usuario = (
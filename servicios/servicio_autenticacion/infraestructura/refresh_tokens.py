@@ -0,0 +1,149 @@
+# servicios/servicio_autenticacion/infraestructura/refresh_tokens.py
+
+import hashlib
+import hmac
+import os
+import secrets
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from configuracion import Config
+from inicializar_db import resolve_db_uri, get_engine_and_session, RefreshFamiliaORM
+from utils.jwt import create_jwt, decode_jwt, JWTError
+from utils.tareas import TareaPeriodica
+
+# ==============================================================================
+# REFRESH TOKENS ROTATIVOS
+# Token HS256 de larga duración que solo identifica al usuario (sub), firmado
+# con una clave derivada de SECRET_KEY (un access token nunca sirve como refresh
+# ni al revés). Renovar es verificar la firma, releer al usuario por su PK (una
+# cuenta desactivada o un admin degradado no conserva privilegios durante los
+# 30 días del token) y rotar el jti. Del lado del servidor hay UNA fila por
+# sesión (refresh_familias) con el jti vigente: rotar es un UPDATE condicionado
+# a ese jti, así que un token ya rotado que se reutiliza (posible robo) no
+# coincide y revoca la familia entera. La fila vive hasta la exp del token vigente.
+# ==============================================================================
+
+REFRESH_TTL_SEG = int(os.getenv("REFRESH_TTL_SEG", str(30 * 86400)))
+
+_engine = None
+_tabla_lista = False
+
+
+def _motor():
+    global _engine, _tabla_lista
+    if _engine is None:
+        _engine, _ = get_engine_and_session(resolve_db_uri())
+    if not _tabla_lista:
+        try:
+            RefreshFamiliaORM.__table__.create(_engine, checkfirst=True)
+        except Exception as e:
+            print(f"[WARN] No se pudo crear refresh_familias: {e}")
+        _tabla_lista = True
+        _purga.iniciar()
+    return _engine
+
+
+def _secreto() -> str:
+    base = getattr(Config, "SECRET_KEY", "") or ""
+    return hmac.new(base.encode("utf-8"), b"refresh-token-v1", hashlib.sha256).hexdigest()
+
+
+def _firmar(sub: str, jti: str, familia: str) -> Tuple[str, datetime]:
+    """(token, caducidad) con los datos mínimos del refresh token."""
+    exp = int(time.time()) + REFRESH_TTL_SEG
+    cuerpo = {"sub": sub, "typ": "refresh", "jti": jti, "fam": familia, "exp": exp}
+    return create_jwt(cuerpo, secret=_secreto()), datetime.fromtimestamp(exp)
+
+
+def emitir(claims: Dict[str, Any]) -> str:
+    """Refresh token de una sesión nueva (login) para el usuario `claims['sub']`."""
+    familia, jti = secrets.token_urlsafe(9), secrets.token_urlsafe(12)
+    token, expira = _firmar(claims.get("sub"), jti, familia)
+    with _motor().begin() as conn:
+        conn.execute(
+            text("INSERT INTO refresh_familias (familia, jti, revocada, expira_en) VALUES (:f, :j, :no, :exp)"),
+            {"f": familia, "j": jti, "no": False, "exp": expira},
+        )
+    return token
+
+
+def _leer(token: str) -> Dict[str, Any]:
+    payload = decode_jwt(token or "", _secreto())
+    if payload.get("typ") != "refresh" or not payload.get("sub") or not payload.get("jti") or not payload.get("fam"):
+        raise JWTError("Refresh token inválido")
+    return payload
+
+
+def _claims_usuario(conn, sub: str) -> Optional[Dict[str, Any]]:
+    """Claims actuales del usuario (una búsqueda por PK); None si no existe o está inactivo."""
+    fila = conn.execute(
+        text("SELECT email, nombre, is_admin, activo, verificado FROM usuarios WHERE id_usuario = :id"),
+        {"id": sub},
+    ).first()
+    if fila is None or not fila.activo:
+        return None
+    admin_list = set((getattr(Config, "ADMIN_EMAILS", []) or []))
+    return {
+        "sub": sub,
+        "email": fila.email,
+        "nombre": fila.nombre,
+        "is_admin": bool(fila.is_admin) or str(fila.email).lower() in admin_list,
+        "verificado": bool(fila.verificado),
+    }
+
+
+def rotar(token: str) -> Tuple[Dict[str, Any], str]:
+    """Consume el refresh token y devuelve (claims actuales para el access token, nuevo refresh token).
+
+    :raises JWTError: firma/exp inválidos, familia revocada o desconocida, token ya
+        usado (en ese caso se revoca toda su familia: el token legítimo y el reutilizado
+        dejan de servir), o usuario inexistente/desactivado (también se revoca la familia).
+    """
+    payload = _leer(token)
+    nuevo_jti = secrets.token_urlsafe(12)
+    nuevo, expira = _firmar(payload["sub"], nuevo_jti, payload["fam"])
+    with _motor().begin() as conn:
+        claims = _claims_usuario(conn, payload["sub"])
+        rotado = False
+        if claims is not None:
+            # Solo el jti vigente rota; uno anterior (ya usado) no coincide
+            rotado = conn.execute(
+                text("UPDATE refresh_familias SET jti = :nuevo, expira_en = :exp "
+                     "WHERE familia = :f AND jti = :jti AND revocada = :no"),
+                {"nuevo": nuevo_jti, "exp": expira, "f": payload["fam"], "jti": payload["jti"], "no": False},
+            ).rowcount == 1
+        if not rotado:
+            _revocar_familia(conn, payload["fam"])
+    if claims is None:
+        raise JWTError("Cuenta no disponible")
+    if not rotado:
+        raise JWTError("Refresh token revocado o ya utilizado")
+    return claims, nuevo
+
+
+def _revocar_familia(conn, familia: str) -> None:
+    conn.execute(text("UPDATE refresh_familias SET revocada = :si WHERE familia = :f"), {"si": True, "f": familia})
+
+
+def revocar(token: str) -> bool:
+    """Logout: revoca la familia del token (todas sus rotaciones). False si el token no es válido."""
+    try:
+        payload = _leer(token)
+    except JWTError:
+        return False
+    with _motor().begin() as conn:
+        _revocar_familia(conn, payload["fam"])
+    return True
+
+
+def purgar() -> int:
+    with _motor().begin() as conn:
+        return conn.execute(text("DELETE FROM refresh_familias WHERE expira_en <= :ahora"),
+                            {"ahora": datetime.now()}).rowcount
+
+
+_purga = TareaPeriodica("refresh_purga", float(os.getenv("REFRESH_PURGA_SEG", "21600")), purgar, retraso_inicial=90)
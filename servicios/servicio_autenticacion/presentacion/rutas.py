@@ -11,10 +11,13 @@ from servicios.servicio_autenticacion.aplicacion.casos_uso.enviar_verificacion_c
 
 # Importamos la implementacion del Repositorio
 from servicios.servicio_autenticacion.infraestructura.persistencia.sqlite_repositorio_usuario import SQLiteRepositorioUsuario, Session
-from servicios.servicio_autenticacion.infraestructura.clientes_externos.google_smtp_cliente import GoogleSMTPCliente
+from servicios.servicio_autenticacion.infraestructura.clientes_externos.outbox_correo_cliente import ServicioCorreoOutbox
+from servicios.servicio_autenticacion.infraestructura import refresh_tokens
+from servicios.notificaciones.infraestructura import outbox
+from servicios.carrito.infraestructura import almacen_carritos as carritos
 from configuracion import Config
-from utils.jwt import create_jwt
-from passlib.hash import pbkdf2_sha256 as pwd_context
+from utils.jwt import create_jwt, JWTError
+from servicios.servicio_autenticacion.infraestructura.hasher_contrasenas import hasher as pwd_context, HasherSaturado
 
 # Enterprise helper (opcional)
 from servicios.servicio_autenticacion.presentacion.recaptcha_enterprise import verify_enterprise
@@ -49,6 +52,21 @@ iniciar_sesion_uc = IniciarSesion(
 # RUTAS DE AUTENTICACION
 # ----------------------------------------------------------------------
 
+ACCESS_TTL_SEG = 3600
+
+
+def _emitir_tokens(claims, refresh_token=None):
+    """Access token (corto) + refresh token rotativo con los mismos datos del usuario."""
+    access = create_jwt(dict(claims), secret=getattr(Config, 'SECRET_KEY', ''), expires_in=ACCESS_TTL_SEG)
+    return {
+        "access_token": access,
+        "token_type": "Bearer",
+        "expires_in": ACCESS_TTL_SEG,
+        "refresh_token": refresh_token or refresh_tokens.emitir(claims),
+        "refresh_expires_in": refresh_tokens.REFRESH_TTL_SEG,
+    }
+
+
 def _enterprise_enabled():
     try:
         flag = os.getenv('RECAPTCHA_ENTERPRISE') or getattr(Config, 'RECAPTCHA_ENTERPRISE', None)
@@ -108,19 +126,25 @@ def _registrar_impl():
                 return jsonify({"error": "No se pudo verificar reCAPTCHA."}), 502
 
     try:
-        # 1) Crear usuario (marcar admin si su email está en ADMIN_EMAILS)
-        admin_list = set((getattr(Config, 'ADMIN_EMAILS', []) or []))
-        es_admin_flag = str(email or '').strip().lower() in admin_list
-        usuario = registrar_usuario_uc.ejecutar(nombre=nombre, email=email, password=password, es_admin=es_admin_flag)
-
-        # 2) Enviar verificación por correo (no bloquea el registro si falla)
-        try:
-            servicio_correo = GoogleSMTPCliente()
-            enviar_verif_uc = EnviarVerificacionCorreo(repositorio_usuario, servicio_correo)
-            enviar_verif_uc.ejecutar(usuario.id_usuario, usuario.email, usuario.nombre)
-        except Exception:
-            # Log ya se imprime dentro; continuamos
-            pass
+        # Alta y correo de verificación en UNA transacción: la fila del outbox solo
+        # existe si el usuario se creó, y el usuario no queda creado sin su correo
+        # por una caída entre dos commits.
+        with Session() as s:
+            # 1) Crear usuario (marcar admin si su email está en ADMIN_EMAILS)
+            admin_list = set((getattr(Config, 'ADMIN_EMAILS', []) or []))
+            es_admin_flag = str(email or '').strip().lower() in admin_list
+            usuario = registrar_usuario_uc.ejecutar(nombre=nombre, email=email, password=password,
+                                                    es_admin=es_admin_flag, session=s)
+
+            # 2) Encolar verificación por correo (un fallo al armar el correo no bloquea el registro)
+            try:
+                servicio_correo = ServicioCorreoOutbox(referencia=f"verificacion:{usuario.id_usuario}", session=s)
+                enviar_verif_uc = EnviarVerificacionCorreo(repositorio_usuario, servicio_correo)
+                enviar_verif_uc.ejecutar(usuario.id_usuario, usuario.email, usuario.nombre, session=s)
+            except Exception as e:
+                print(f"[WARN] No se pudo encolar la verificación de {usuario.email}: {e}")
+            s.commit()
+        outbox.despertar()
 
         return jsonify({
             "mensaje": "Usuario registrado exitosamente.",
@@ -129,6 +153,10 @@ def _registrar_impl():
             "is_admin": bool(getattr(usuario, 'es_admin', False))
         }), 201
 
+    except HasherSaturado as e:
+        # Pool de hashing lleno: rechazo rápido para que el cliente reintente
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "2"}
+
     except ValueError as e:
         # Manejo de errores de validación (ej: email ya existe)
         return jsonify({"error": str(e)}), 409  # Conflicto
@@ -199,28 +227,30 @@ def login():
         # 1) Verificar credenciales
         usuario = iniciar_sesion_uc.ejecutar(email=email, password=password)
 
-        # 2) Comprobar verificación de correo
-        if not repositorio_usuario.email_verificado(usuario.email):
+        # 2) Comprobar verificación de correo (viene en el mismo registro, sin otra consulta)
+        if not usuario.verificado:
             return jsonify({"error": "Debes verificar tu correo antes de iniciar sesión."}), 403
 
-        # 3) Guardar sesión simple (no JWT)
+        # 3) Guardar sesión simple (no JWT); /me lee de aquí sin ir a la DB
         session['user_id'] = usuario.id_usuario
         session['user_email'] = usuario.email
         session['user_nombre'] = usuario.nombre
+        session['user_verificado'] = True
+        try:
+            carritos.al_iniciar_sesion(session)
+        except Exception as e:
+            print(f"[WARN] No se pudo fusionar el carrito: {e}")
 
         # 4) Crear token tipo JWT (HS256) incluyendo is_admin
         admin_list = set((getattr(Config, 'ADMIN_EMAILS', []) or []))
         is_admin = bool(getattr(usuario, 'es_admin', False)) or (str(usuario.email).lower() in admin_list)
-        token = create_jwt(
-            {
-                "sub": usuario.id_usuario,
-                "email": usuario.email,
-                "nombre": usuario.nombre,
-                "is_admin": bool(is_admin),
-            },
-            secret=getattr(Config, 'SECRET_KEY', ''),
-            expires_in=3600,
-        )
+        tokens = _emitir_tokens({
+            "sub": usuario.id_usuario,
+            "email": usuario.email,
+            "nombre": usuario.nombre,
+            "is_admin": bool(is_admin),
+            "verificado": True,
+        })
 
         return jsonify({
             "mensaje": "Inicio de sesion exitoso.",
@@ -230,11 +260,12 @@ def login():
                 "nombre": usuario.nombre,
                 "is_admin": bool(is_admin),
             },
-            "access_token": token,
-            "token_type": "Bearer",
-            "expires_in": 3600
+            **tokens,
         }), 200
 
+    except HasherSaturado as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "2"}
+
     except ValueError as e:
         # Manejo de errores de credenciales (ej: email o password incorrectos)
         return jsonify({"error": str(e)}), 401  # No autorizado
@@ -249,6 +280,24 @@ def login():
         return jsonify({"error": "Error interno del servidor al iniciar sesion."}), 500
 
 
+@auth_bp.route('/refresh', methods=['POST'])
+def refresh():
+    """Renueva el access token con un refresh token (sin contraseña ni reCAPTCHA).
+    El refresh token usado queda revocado y se devuelve uno nuevo."""
+    data = request.get_json(silent=True) or {}
+    token = (data.get('refresh_token') or '').strip()
+    if not token:
+        return jsonify({"error": "Falta refresh_token."}), 400
+    try:
+        claims, nuevo = refresh_tokens.rotar(token)
+    except JWTError as e:
+        return jsonify({"error": str(e)}), 401
+    except Exception:
+        current_app.logger.exception('[refresh] error al renovar')
+        return jsonify({"error": "Error interno al renovar la sesión."}), 500
+    return jsonify(_emitir_tokens(claims, refresh_token=nuevo)), 200
+
+
 @auth_bp.route('/verify', methods=['GET'])
 def verify_email_query():
     token = (request.args.get('token') or '').strip()
@@ -268,6 +317,8 @@ def verify_email_query():
             user.verificado = True
             s.commit()
             current_app.logger.info(f'[verify] usuario verificado uid={uid}')
+        if session.get('user_id') == uid:
+            session['user_verificado'] = True
         return redirect(url_for('auth_bp.verificacion_exitosa'))
     except Exception:
         s.rollback()
@@ -292,6 +343,8 @@ def verify_email_token(token):
             user.verificado = True
             s.commit()
             current_app.logger.info(f'[verify] usuario verificado uid={uid}')
+        if session.get('user_id') == uid:
+            session['user_verificado'] = True
         return redirect(url_for('auth_bp.verificacion_exitosa'))
     except Exception:
         s.rollback()
@@ -314,7 +367,11 @@ def me():
         return jsonify({"authenticated": False}), 200
     email = session.get('user_email')
     nombre = session.get('user_nombre')
-    verificado = repositorio_usuario.email_verificado(email) if email else False
+    verificado = session.get('user_verificado')
+    if verificado is None:
+        # Sesiones iniciadas antes de guardar el flag: se consulta una vez y se recuerda
+        verificado = repositorio_usuario.email_verificado(email) if email else False
+        session['user_verificado'] = bool(verificado)
     return jsonify({
         "authenticated": True,
         "user": {
@@ -331,6 +388,14 @@ def logout():
     session.pop('user_id', None)
     session.pop('user_email', None)
     session.pop('user_nombre', None)
+    session.pop('user_verificado', None)
+    # Clientes con tokens: el refresh token (y sus rotaciones) deja de servir
+    token = ((request.get_json(silent=True) or {}).get('refresh_token') or '').strip()
+    if token:
+        try:
+            refresh_tokens.revocar(token)
+        except Exception as e:
+            print(f"[WARN] No se pudo revocar el refresh token: {e}")
     return jsonify({"ok": True}), 200
 
 
@@ -348,18 +413,20 @@ def resend_verification():
         if not usuario:
             return jsonify({"error": "Usuario no encontrado para ese email."}), 404
         # Si ya está verificado, informar y salir
-        if repositorio_usuario.email_verificado(email):
+        if usuario.verificado:
             return jsonify({"ok": True, "mensaje": "La cuenta ya está verificada."}), 200
 
-        # Enviar correo de verificación
-        servicio_correo = GoogleSMTPCliente()
+        # Enviar correo de verificación: token nuevo y fila del outbox en la misma transacción
         try:
-            from servicios.servicio_autenticacion.aplicacion.casos_uso.enviar_verificacion_correo import EnviarVerificacionCorreo
-            enviar_verif_uc = EnviarVerificacionCorreo(repositorio_usuario, servicio_correo)
-            enviar_verif_uc.ejecutar(usuario.id_usuario, email=email)
+            with Session() as s:
+                servicio_correo = ServicioCorreoOutbox(referencia=f"verificacion:{usuario.id_usuario}", session=s)
+                enviar_verif_uc = EnviarVerificacionCorreo(repositorio_usuario, servicio_correo)
+                enviar_verif_uc.ejecutar(usuario.id_usuario, email=email, session=s)
+                s.commit()
         except Exception as e:
             # Error controlado al enviar
             return jsonify({"error": f"No se pudo enviar verificación: {str(e)}"}), 502
+        outbox.despertar()
 
         return jsonify({"ok": True, "mensaje": "Correo de verificación reenviado (revisa SPAM)."}), 200
     except Exception:
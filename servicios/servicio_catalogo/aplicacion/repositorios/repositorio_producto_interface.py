@@ -27,6 +27,10 @@ class IRepositorioProducto(ABC):
         """Listado completo (puede tener implementación por defecto y ser opcional)."""
         return []
 
+    def listar_catalogo(self) -> List[Producto]:
+        """Catálogo completo sin límite (para índices en memoria)."""
+        return self.obtener_todos()
+
     # Alias que tu caso de uso invoca:
     def buscar_por_consulta(self, consulta: str) -> List[Producto]:
         return self.buscar_productos(consulta)
@@ -0,0 +1,70 @@
+# servicios/servicio_catalogo/dominio/categorias.py
+import unicodedata
+
+# ==============================================================================
+# CATEGORÍAS CANÓNICAS DEL CATÁLOGO
+# Reglas de negocio para agrupar productos en las 4 categorías de la tienda.
+# ==============================================================================
+CANON_CATS = [
+    'libros y textos',
+    'insumos de oficina',
+    'arte, manualidades, escritura y colorear',
+    'escolar',
+]
+
+
+def normalizar_texto(s: str) -> str:
+    """Minúsculas y sin acentos (para comparar búsquedas y categorías)."""
+    try:
+        nf = unicodedata.normalize('NFD', str(s or ''))
+        return ''.join(ch for ch in nf if unicodedata.category(ch) != 'Mn').lower().strip()
+    except Exception:
+        return (str(s or '')).lower().strip()
+
+
+def texto_busqueda(p) -> str:
+    """Texto normalizado en el que se buscan las palabras de ?q= (nombre, autor, categoría, material, ISBN)."""
+    return ' '.join(filter(None, [
+        normalizar_texto(getattr(p, 'nombre', '') or ''),
+        normalizar_texto(getattr(p, 'autor', '') or ''),
+        normalizar_texto(getattr(p, 'categoria', '') or ''),
+        normalizar_texto(getattr(p, 'material', '') or ''),
+        normalizar_texto(getattr(p, 'isbn', '') or ''),
+    ]))
+
+
+# Consultas que nombran un tipo completo: ?q=utiles trae todos los útiles, ?q=libros todos los libros
+ALIAS_TIPO = {
+    'util': 'UtilEscolar', 'utiles': 'UtilEscolar', 'utiles escolares': 'UtilEscolar',
+    'libro': 'Libro', 'libros': 'Libro',
+}
+
+
+def tipo_por_alias(consulta: str):
+    """'UtilEscolar' / 'Libro' si la consulta completa es un alias de tipo; si no, None."""
+    return ALIAS_TIPO.get(' '.join(normalizar_texto(consulta).split()))
+
+
+def bucket_categoria(p) -> str:
+    """Devuelve la categoría canónica de un producto de dominio."""
+    # Libros siempre a "libros y textos"
+    if p.__class__.__name__ == 'Libro':
+        return 'libros y textos'
+    txt = ' '.join([
+        str(getattr(p, 'nombre', '') or ''),
+        str(getattr(p, 'categoria', '') or ''),
+        str(getattr(p, 'material', '') or ''),
+    ])
+    nt = normalizar_texto(txt)
+    # Palabras clave por bucket
+    office = {'pluma', 'boligrafo', 'boligrafos', 'folder', 'clip', 'clips', 'folders', 'oficina', 'marcador', 'marcadores', 'resaltador'}
+    art = {'arte', 'manualidad', 'manualidades', 'pegamento', 'silicon', 'silicona', 'pincel', 'pintura', 'tempera', 'temperas', 'acrilico', 'acrilicos', 'papel crepe', 'crepe', 'cartulina', 'colores', 'crayola', 'crayolas'}
+    school = {'cuaderno', 'cuadernos', 'lapiz', 'lapices', 'lápiz', 'borrador', 'goma', 'sacapuntas', 'regla', 'tijera', 'tijeras', 'hoja', 'hojas', 'libreta'}
+    if any(k in nt for k in office):
+        return 'insumos de oficina'
+    if any(k in nt for k in art):
+        return 'arte, manualidades, escritura y colorear'
+    if any(k in nt for k in school):
+        return 'escolar'
+    # Por defecto, si es util, caer en 'escolar'
+    return 'escolar'
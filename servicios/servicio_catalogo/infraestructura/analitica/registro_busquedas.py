@@ -0,0 +1,134 @@
+# servicios/servicio_catalogo/infraestructura/analitica/registro_busquedas.py
+from __future__ import annotations
+
+import atexit
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import create_engine, func, insert
+from sqlalchemy.orm import sessionmaker
+
+from configuracion import Config
+from inicializar_db import BusquedaLogORM
+from servicios.servicio_catalogo.dominio.categorias import normalizar_texto
+from utils.tareas import TareaPeriodica
+
+# ==============================================================================
+# ANALÍTICA DE BÚSQUEDAS (catálogo e IA)
+# registrar() solo hace deque.append (atómico bajo el GIL, sin locks); un hilo
+# vacía el buffer cada BUSQUEDAS_FLUSH_SEG segundos con un INSERT por lote.
+# Si el buffer se llena antes del volcado se descartan las entradas más viejas.
+# Si el INSERT falla, el lote vuelve al frente del buffer para el próximo volcado.
+# ==============================================================================
+
+_CAPACIDAD = int(os.getenv("BUSQUEDAS_BUFFER", "10000"))
+_INTERVALO = float(os.getenv("BUSQUEDAS_FLUSH_SEG", "5"))
+_MAX_CONSULTA = 200
+
+_buffer: deque = deque(maxlen=_CAPACIDAD)
+_engine = None
+_Session = None
+
+
+def registrar(fuente: str, consulta: str, resultados: int, latencia_ms: float) -> None:
+    """Encola una búsqueda ('catalogo' | 'ia'). La normalización se hace al volcar."""
+    if consulta:
+        _buffer.append((fuente, consulta, int(resultados), float(latencia_ms), time.time()))
+
+
+def _sesion():
+    global _engine, _Session
+    if _Session is None:
+        _engine = create_engine(Config.SQLALCHEMY_DATABASE_URI, future=True)
+        _Session = sessionmaker(bind=_engine, autoflush=False, autocommit=False, future=True)
+        try:
+            BusquedaLogORM.__table__.create(_engine, checkfirst=True)
+        except Exception as e:
+            print(f"[WARN] No se pudo verificar/crear tabla busquedas_log: {e}")
+    return _Session()
+
+
+def volcar() -> int:
+    """Vacía el buffer a busquedas_log en un solo INSERT. Devuelve filas escritas."""
+    crudos: List[tuple] = []
+    lote: List[Dict[str, Any]] = []
+    while True:
+        try:
+            entrada = _buffer.popleft()
+        except IndexError:
+            break
+        crudos.append(entrada)
+        fuente, consulta, resultados, latencia_ms, ts = entrada
+        texto = ' '.join(normalizar_texto(consulta).split())[:_MAX_CONSULTA]
+        if texto:
+            lote.append({
+                'fuente': fuente,
+                'consulta': texto,
+                'resultados': resultados,
+                'latencia_ms': round(latencia_ms, 2),
+                'creado_en': datetime.fromtimestamp(ts),
+            })
+    if not lote:
+        return 0
+    try:
+        with _sesion() as s:
+            s.execute(insert(BusquedaLogORM), lote)
+            s.commit()
+    except Exception:
+        _devolver(crudos)
+        raise
+    return len(lote)
+
+
+def _devolver(crudos: List[tuple]) -> None:
+    """Reencola un lote no escrito delante de lo que llegó mientras tanto. Si no cabe todo,
+    se descartan sus entradas más viejas (la misma política que con el buffer lleno)."""
+    libres = _CAPACIDAD - len(_buffer)
+    if libres > 0:
+        _buffer.extendleft(reversed(crudos[-libres:]))
+
+
+def resumen(dias: int = 7, limite: int = 20, fuente: Optional[str] = None) -> Dict[str, Any]:
+    """Top consultas y top consultas sin resultados en los últimos `dias`."""
+    desde = datetime.now() - timedelta(days=max(1, dias))
+    with _sesion() as s:
+        base = s.query(
+            BusquedaLogORM.consulta,
+            func.count().label('veces'),
+            func.avg(BusquedaLogORM.resultados).label('resultados_prom'),
+            func.avg(BusquedaLogORM.latencia_ms).label('latencia_prom_ms'),
+        ).filter(BusquedaLogORM.creado_en >= desde)
+        if fuente:
+            base = base.filter(BusquedaLogORM.fuente == fuente)
+
+        def top(q):
+            rows = q.group_by(BusquedaLogORM.consulta).order_by(func.count().desc()).limit(limite).all()
+            return [
+                {
+                    'consulta': r.consulta,
+                    'veces': int(r.veces),
+                    'resultados_prom': round(float(r.resultados_prom or 0), 2),
+                    'latencia_prom_ms': round(float(r.latencia_prom_ms or 0), 2),
+                }
+                for r in rows
+            ]
+
+        return {
+            'desde': desde.isoformat(timespec='seconds'),
+            'top': top(base),
+            'sin_resultados': top(base.filter(BusquedaLogORM.resultados == 0)),
+            'pendientes': len(_buffer),
+        }
+
+
+_tarea = TareaPeriodica('busquedas_log', _INTERVALO, volcar)
+
+
+def iniciar_registro_busquedas() -> TareaPeriodica:
+    """Arranca el hilo de volcado (una vez por proceso) y vuelca lo pendiente al salir."""
+    if _tarea.iniciar():
+        atexit.register(_tarea.ejecutar_ahora)
+    return _tarea
@@ -0,0 +1,383 @@
+# servicios/servicio_catalogo/infraestructura/indices/catalogo_columnar.py
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from servicios.servicio_catalogo.dominio.producto import Producto
+from servicios.servicio_catalogo.dominio.categorias import (
+    CANON_CATS, normalizar_texto, bucket_categoria, texto_busqueda, tipo_por_alias,
+)
+from servicios.servicio_catalogo.infraestructura.indices.snapshot_catalogo import (
+    SNAPSHOT_HABILITADO,
+    SnapshotCatalogo,
+    abrir_snapshot,
+)
+
+# ==============================================================================
+# CATÁLOGO COLUMNAR (NumPy)
+# Representación en memoria del catálogo por columnas para filtrar, ordenar y
+# contar facetas con operaciones vectorizadas en lugar de bucles sobre objetos.
+# ==============================================================================
+
+TIPOS = ['Libro', 'UtilEscolar']
+
+# Bordes de las bandas de precio (Q). La última banda es abierta: [200, ∞)
+BANDAS_PRECIO = [0.0, 25.0, 50.0, 100.0, 200.0]
+
+# Campos admitidos en ?fields= (claves de Producto.to_dict() + bucket)
+CAMPOS_PRODUCTO = (
+    'id', 'nombre', 'precio', 'stock', 'tipo', 'portada_url', 'imagen_url', 'bucket',
+    'isbn', 'autor', 'descripcion', 'paginas', 'editor', 'sku', 'categoria', 'marca',
+)
+
+ORDENES = ('reciente', 'precio_asc', 'precio_desc', 'nombre', 'nombre_desc', 'stock_desc')
+
+
+def _etiqueta_banda(i: int) -> Dict[str, Any]:
+    lo = BANDAS_PRECIO[i]
+    hi = BANDAS_PRECIO[i + 1] if i + 1 < len(BANDAS_PRECIO) else None
+    etiqueta = f"{lo:g}-{hi:g}" if hi is not None else f"{lo:g}+"
+    return {'banda': etiqueta, 'min': lo, 'max': hi}
+
+
+def serializar_documento(p: Producto) -> str:
+    """JSON compacto del producto tal como lo devuelve la API (+ bucket canónico)."""
+    data = p.to_dict()
+    data['bucket'] = bucket_categoria(p)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def proyectar_documento(data: Dict[str, Any], campos: Sequence[str]) -> Dict[str, Any]:
+    """Solo los campos pedidos (los que no aplican al tipo de producto se omiten)."""
+    return {k: data[k] for k in campos if k in data}
+
+
+def _codificar(valores: Sequence[str]) -> tuple[np.ndarray, List[str], Dict[str, int]]:
+    """Codificación por diccionario: devuelve (códigos int32, vocabulario, índice)."""
+    vocab: List[str] = []
+    indice: Dict[str, int] = {}
+    codigos = np.empty(len(valores), dtype=np.int32)
+    for i, v in enumerate(valores):
+        c = indice.get(v)
+        if c is None:
+            c = len(vocab)
+            indice[v] = c
+            vocab.append(v)
+        codigos[i] = c
+    return codigos, vocab, indice
+
+
+class CatalogoColumnar:
+    """Columnas NumPy alineadas con la lista de productos (orden: id desc).
+
+    Sin snapshot se construye desde los Producto. Con snapshot solo se cargan las columnas
+    numéricas y los ids ya calculados en el archivo: no hay objetos Producto, texto de
+    búsqueda ni documentos en el worker (productos es None).
+    """
+
+    def __init__(self, productos: Optional[List[Producto]] = None, snapshot: Optional[SnapshotCatalogo] = None):
+        self.snapshot = snapshot
+        # Documentos parcheados tras una venta (posición -> JSON); con snapshot el archivo es de solo lectura
+        self._parches: Dict[int, str] = {}
+        self._dicts: Optional[List[Dict[str, Any]]] = None
+        if snapshot is not None:
+            self.productos: Optional[List[Producto]] = None
+            self._desde_snapshot(snapshot)
+        else:
+            self.productos = list(productos or [])
+            self._desde_productos(self.productos)
+        self.posicion = {pid: i for i, pid in enumerate(self.ids)}
+        n = len(self.ids)
+        self.banda = (np.digitize(self.precio, BANDAS_PRECIO[1:]) if n else np.empty(0, dtype=np.int64)).astype(np.int8)
+
+    def _desde_productos(self, productos: List[Producto]) -> None:
+        n = len(productos)
+        self.ids = [str(p.id) for p in productos]
+        self.precio = np.fromiter((float(p.precio or 0) for p in productos), dtype=np.float64, count=n)
+        self.stock = np.fromiter((int(p.stock or 0) for p in productos), dtype=np.int64, count=n)
+        self.tipo = np.fromiter(
+            (TIPOS.index(p.__class__.__name__) if p.__class__.__name__ in TIPOS else 1 for p in productos),
+            dtype=np.int8, count=n,
+        )
+        self.bucket = np.fromiter((CANON_CATS.index(bucket_categoria(p)) for p in productos), dtype=np.int8, count=n)
+
+        # Cadenas codificadas por diccionario (categoría libre y autor/marca normalizados)
+        self.categoria, self.categorias_vocab, self._categoria_idx = _codificar(
+            [normalizar_texto(getattr(p, 'categoria', '') or '') for p in productos]
+        )
+        self.autor, self.autores_vocab, self._autor_idx = _codificar(
+            [normalizar_texto(getattr(p, 'autor', None) or getattr(p, 'marca', None) or '') for p in productos]
+        )
+
+        # Texto de búsqueda normalizado y rango por nombre (para ordenar sin comparar cadenas)
+        self.texto = np.array([texto_busqueda(p) for p in productos], dtype=np.str_) if n else np.empty(0, dtype=np.str_)
+        # Documentos JSON pre-renderizados (bytes) para responder sin to_dict por fila
+        self.documentos = [
+            (getattr(p, 'documento_json', None) or serializar_documento(p)).encode('utf-8')
+            for p in productos
+        ]
+
+        orden_nombre = sorted(range(n), key=lambda i: normalizar_texto(productos[i].nombre))
+        self.rango_nombre = np.empty(n, dtype=np.int64)
+        self.rango_nombre[orden_nombre] = np.arange(n)
+
+    def _desde_snapshot(self, snapshot: SnapshotCatalogo) -> None:
+        filas = snapshot.columnas()
+        n = len(filas)
+        self.ids = [f[0] for f in filas]
+        self.tipo = np.fromiter((TIPOS.index(f[1]) if f[1] in TIPOS else 1 for f in filas), dtype=np.int8, count=n)
+        self.precio = np.fromiter((f[2] for f in filas), dtype=np.float64, count=n)
+        self.stock = np.fromiter((f[3] for f in filas), dtype=np.int64, count=n)
+        self.bucket = np.fromiter((f[4] for f in filas), dtype=np.int8, count=n)
+        self.categoria, self.categorias_vocab, self._categoria_idx = _codificar([f[5] for f in filas])
+        self.autor, self.autores_vocab, self._autor_idx = _codificar([f[6] for f in filas])
+        self.rango_nombre = np.fromiter((f[7] for f in filas), dtype=np.int64, count=n)
+        self.texto = None       # ?q= se resuelve en el archivo (posiciones_con)
+        self.documentos = None  # se leen del archivo compartido y no se copian al worker
+
+    def filas_sugerencias(self) -> List[tuple]:
+        """(id, nombre, autor, categoria, bucket) de cada producto, para el autocompletado."""
+        if self.snapshot is not None:
+            return [(pid, nombre, autor, categoria, CANON_CATS[b])
+                    for pid, nombre, autor, categoria, b in self.snapshot.filas_sugerencias()]
+        return [(str(p.id), p.nombre, getattr(p, 'autor', None), getattr(p, 'categoria', None), bucket_categoria(p))
+                for p in self.productos]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # ------------------------------------------------------------------
+    # Filtros
+    # ------------------------------------------------------------------
+    def mascara(self,
+                tipo: Optional[str] = None,
+                categoria: Optional[str] = None,
+                precio_min: Optional[float] = None,
+                precio_max: Optional[float] = None,
+                en_stock: bool = False,
+                q: Optional[str] = None,
+                autor: Optional[str] = None) -> np.ndarray:
+        m = np.ones(len(self), dtype=bool)
+        t_norm = normalizar_texto(tipo)
+        if t_norm:
+            codigos = [i for i, t in enumerate(TIPOS) if normalizar_texto(t) == t_norm]
+            m &= (self.tipo == codigos[0]) if codigos else False
+        c_norm = normalizar_texto(categoria)
+        if c_norm:
+            canon = [normalizar_texto(c) for c in CANON_CATS]
+            if c_norm in canon:
+                m &= self.bucket == canon.index(c_norm)
+            else:
+                code = self._categoria_idx.get(c_norm)
+                m &= (self.categoria == code) if code is not None else False
+        a_norm = normalizar_texto(autor)
+        if a_norm:
+            code = self._autor_idx.get(a_norm)
+            m &= (self.autor == code) if code is not None else False
+        if precio_min is not None:
+            m &= self.precio >= float(precio_min)
+        if precio_max is not None:
+            m &= self.precio <= float(precio_max)
+        if en_stock:
+            m &= self.stock > 0
+        tokens = normalizar_texto(q).split()
+        if tokens:
+            if self.texto is None:
+                con_texto = np.zeros(len(self), dtype=bool)
+                con_texto[self.snapshot.posiciones_con(tokens)] = True
+            else:
+                con_texto = np.ones(len(self), dtype=bool)
+                for token in tokens:
+                    con_texto &= np.char.find(self.texto, token) >= 0
+            # ?q=utiles / ?q=libros también traen todo el tipo
+            alias = tipo_por_alias(q)
+            if alias:
+                con_texto |= self.tipo == TIPOS.index(alias)
+            m &= con_texto
+        return m
+
+    # ------------------------------------------------------------------
+    # Orden
+    # ------------------------------------------------------------------
+    def ordenar(self, mascara: np.ndarray, orden: Optional[str] = None) -> np.ndarray:
+        """Índices seleccionados por la máscara en el orden pedido (argsort estable)."""
+        idx = np.flatnonzero(mascara)
+        if orden == 'precio_asc':
+            clave = self.precio[idx]
+        elif orden == 'precio_desc':
+            clave = -self.precio[idx]
+        elif orden == 'nombre':
+            clave = self.rango_nombre[idx]
+        elif orden == 'nombre_desc':
+            clave = -self.rango_nombre[idx]
+        elif orden == 'stock_desc':
+            clave = -self.stock[idx]
+        else:
+            return idx
+        return idx[np.argsort(clave, kind='stable')]
+
+    def parchear_stock(self, cambios: Dict[str, tuple]) -> int:
+        """Aplica {id: (stock, documento_json)} en sitio, sin reconstruir columnas ni índices.
+        Devuelve cuántos productos del catálogo se actualizaron."""
+        n = 0
+        for pid, (stock, documento) in cambios.items():
+            i = self.posicion.get(str(pid))
+            if i is None:
+                continue
+            self.stock[i] = int(stock)
+            if self.productos is not None:
+                self.productos[i].stock = int(stock)
+            if self.documentos is not None:
+                self.documentos[i] = documento.encode('utf-8')
+                if self._dicts is not None:
+                    self._dicts[i] = json.loads(documento)
+            else:
+                self._parches[i] = documento
+            n += 1
+        return n
+
+    def _documentos_snapshot(self, indices: Iterable[int]) -> List[str]:
+        indices = [int(i) for i in indices]
+        docs = self.snapshot.documentos_en(indices)
+        if self._parches:
+            docs = [self._parches.get(i, d) for i, d in zip(indices, docs)]
+        return docs
+
+    def datos_de(self, ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Nombre, precio, stock e imagen de varios productos en una pasada (carrito/checkout).
+        Los ids que no están en el catálogo se omiten."""
+        presentes = [pid for pid in dict.fromkeys(str(i) for i in ids) if pid in self.posicion]
+        if not presentes:
+            return {}
+        idx = np.fromiter((self.posicion[pid] for pid in presentes), dtype=np.int64, count=len(presentes))
+        docs = (self._documentos_snapshot(idx) if self.snapshot is not None
+                else [self.documentos[i] for i in idx])
+        out: Dict[str, Dict[str, Any]] = {}
+        for pid, precio, stock, doc in zip(presentes, self.precio[idx], self.stock[idx], docs):
+            d = json.loads(doc)
+            out[pid] = {
+                'id': pid,
+                'nombre': d.get('nombre'),
+                'precio': round(float(precio), 2),
+                'stock': int(stock),
+                'portada_url': d.get('portada_url') or d.get('imagen_url'),
+            }
+        return out
+
+    def productos_en(self, indices: np.ndarray) -> List[Producto]:
+        """Entidades de dominio (solo sin snapshot: con snapshot el worker no las tiene)."""
+        if self.productos is None:
+            raise RuntimeError("Catálogo cargado desde snapshot: sin entidades Producto")
+        return [self.productos[i] for i in indices]
+
+    def json_en(self, indices: Iterable[int], campos: Optional[Sequence[str]] = None) -> bytes:
+        """Arreglo JSON concatenando los documentos pre-renderizados.
+        Con `campos` (?fields=) se proyecta cada documento a esas claves.
+        """
+        if campos:
+            if self.snapshot is not None:
+                dicts = [json.loads(d) for d in self._documentos_snapshot(indices)]
+            else:
+                if self._dicts is None:
+                    self._dicts = [json.loads(d) for d in self.documentos]
+                dicts = [self._dicts[i] for i in indices]
+            return json.dumps(
+                [proyectar_documento(d, campos) for d in dicts], ensure_ascii=False, separators=(',', ':')
+            ).encode('utf-8')
+        if self.snapshot is not None:
+            if self._parches:
+                return ('[' + ','.join(self._documentos_snapshot(indices)) + ']').encode('utf-8')
+            return self.snapshot.json_en(indices)
+        return b'[' + b','.join([self.documentos[i] for i in indices]) + b']'
+
+    # ------------------------------------------------------------------
+    # Facetas
+    # ------------------------------------------------------------------
+    def facetas(self, mascara: np.ndarray) -> Dict[str, Any]:
+        """Conteos por tipo / categoría canónica / banda de precio en una sola pasada.
+
+        Combina los tres códigos en uno solo, cuenta con bincount y marginaliza.
+        """
+        nt, nb, np_ = len(TIPOS), len(CANON_CATS), len(BANDAS_PRECIO)
+        compuesto = (self.tipo[mascara].astype(np.int64) * nb + self.bucket[mascara]) * np_ + self.banda[mascara]
+        cubo = np.bincount(compuesto, minlength=nt * nb * np_).reshape(nt, nb, np_)
+        por_tipo = cubo.sum(axis=(1, 2))
+        por_cat = cubo.sum(axis=(0, 2))
+        por_banda = cubo.sum(axis=(0, 1))
+        precios = self.precio[mascara]
+        return {
+            'total': int(por_tipo.sum()),
+            'tipos': [{'tipo': t, 'total': int(por_tipo[i])} for i, t in enumerate(TIPOS)],
+            'categorias': [{'categoria': c, 'total': int(por_cat[i])} for i, c in enumerate(CANON_CATS)],
+            'precios': [dict(_etiqueta_banda(i), total=int(por_banda[i])) for i in range(np_)],
+            'precio_min': float(precios.min()) if precios.size else None,
+            'precio_max': float(precios.max()) if precios.size else None,
+        }
+
+
+# ------------------------------------------------------------------------------
+# Caché de proceso: se reconstruye tras cambios en el catálogo o al vencer el TTL
+# (el TTL cubre cambios hechos por otros workers). Con CATALOGO_SNAPSHOT=1 la
+# recarga parte del snapshot compartido y solo relee la DB si cambió la versión.
+# ------------------------------------------------------------------------------
+_lock = threading.Lock()
+_actual: Optional[CatalogoColumnar] = None
+_cargado_en = 0.0
+_generacion = 0
+_generacion_cargada = -1
+_ttl = int(os.getenv("CATALOGO_CACHE_TTL", "60"))
+
+
+def invalidar_catalogo() -> None:
+    """Marca el catálogo en memoria como obsoleto (llamar tras cada escritura)."""
+    global _generacion
+    _generacion += 1
+
+
+def parchear_stock(cambios: Dict[str, tuple]) -> int:
+    """Stock nuevo tras ventas: se parchea el catálogo cargado en este worker (no se invalida;
+    índices de sugerencias y snapshot siguen valiendo). Los demás workers lo ven al publicarse
+    la versión (reserva_stock) o al recargar por TTL."""
+    with _lock:
+        return _actual.parchear_stock(cambios) if _actual is not None else 0
+
+
+def _vigente() -> bool:
+    return (
+        _actual is not None
+        and _generacion_cargada == _generacion
+        and (time.monotonic() - _cargado_en) < _ttl
+    )
+
+
+def _cargar(repositorio, anterior: Optional[CatalogoColumnar]) -> CatalogoColumnar:
+    if not SNAPSHOT_HABILITADO:
+        return CatalogoColumnar(repositorio.listar_catalogo())
+    snapshot = abrir_snapshot(repositorio)
+    if anterior is not None and anterior.snapshot is not None and anterior.snapshot.version == snapshot.version:
+        # Misma versión: se conserva el catálogo ya cargado
+        snapshot.cerrar()
+        return anterior
+    return CatalogoColumnar(snapshot=snapshot)
+
+
+def obtener_catalogo_columnar(repositorio) -> CatalogoColumnar:
+    global _actual, _cargado_en, _generacion_cargada
+    if _vigente():
+        return _actual
+    with _lock:
+        if _vigente():
+            return _actual
+        # Si hay una invalidación durante la carga, la generación no coincide y se recarga después
+        generacion = _generacion
+        marca = time.monotonic()
+        _actual = _cargar(repositorio, _actual)
+        _cargado_en = marca
+        _generacion_cargada = generacion
+        return _actual
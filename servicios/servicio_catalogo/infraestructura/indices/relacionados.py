@@ -0,0 +1,188 @@
+# servicios/servicio_catalogo/infraestructura/indices/relacionados.py
+from __future__ import annotations
+
+import os
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from servicios.servicio_catalogo.dominio.producto import Producto
+from servicios.servicio_catalogo.dominio.categorias import normalizar_texto, bucket_categoria
+from utils import bloqueo
+from utils.tareas import TareaPeriodica
+
+# ==============================================================================
+# PRODUCTOS RELACIONADOS ("quienes compraron esto también compraron")
+# Combina dos señales, ambas normalizadas a [0, 1]:
+#   - Co-compra: pares de productos en la misma factura (COO disperso con
+#     np.unique), normalizado como coseno de las columnas de incidencia.
+#   - Contenido: TF-IDF disperso sobre nombre/autor/categoría y similitud coseno
+#     calculada por listas invertidas (solo pares que comparten algún término).
+# La matriz TF-IDF nunca es densa (n×vocabulario): solo el bloque de puntajes.
+# El top-K por producto se calcula por bloques de filas y se guarda en la tabla
+# producto_relacionados; el endpoint solo lee esa tabla. El job corre en un solo
+# worker del host (el líder) y nunca hay dos recálculos a la vez (flock).
+# ==============================================================================
+
+RELACIONADOS_K = int(os.getenv("RELACIONADOS_K", "10"))
+PESO_COMPRAS = float(os.getenv("RELACIONADOS_PESO_COMPRAS", "0.7"))
+INTERVALO = float(os.getenv("RELACIONADOS_INTERVALO", "3600"))  # 0 = sin job en segundo plano
+_BLOQUE = 512
+
+Fila = Tuple[str, int, str, float]  # (producto_id, posicion, relacionado_id, puntaje)
+
+
+def _co_compras(lineas: Iterable[Tuple[int, str]], posicion: dict, n: int):
+    """Pares (fila, columna, conteo) de productos comprados juntos + facturas por producto."""
+    fac, pos = [], []
+    for id_factura, pid in lineas:
+        p = posicion.get(str(pid))
+        if p is not None:
+            fac.append(int(id_factura))
+            pos.append(p)
+    vacio = (np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float32))
+    if not fac:
+        return vacio + (np.zeros(n, np.int64),)
+    # Un producto cuenta una vez por factura
+    codigos = np.unique(np.asarray(fac, np.int64) * n + np.asarray(pos, np.int64))
+    fac, pos = codigos // n, codigos % n
+    compras = np.bincount(pos, minlength=n)
+    filas, cols = [], []
+    for grupo in np.split(pos, np.flatnonzero(np.diff(fac)) + 1):
+        if grupo.size < 2:
+            continue
+        a, b = np.meshgrid(grupo, grupo, indexing='ij')
+        distinto = a != b
+        filas.append(a[distinto])
+        cols.append(b[distinto])
+    if not filas:
+        return vacio + (compras,)
+    pares, conteo = np.unique(np.concatenate(filas) * n + np.concatenate(cols), return_counts=True)
+    return pares // n, pares % n, conteo.astype(np.float32), compras
+
+
+def _tfidf(productos: Sequence[Producto]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """TF-IDF normalizado (L2) por producto en formato disperso: (doc, término, peso)
+    ordenado por doc, más el tamaño del vocabulario.
+
+    Solo se conservan términos presentes en 2+ productos: los demás no aportan
+    similitud entre productos.
+    """
+    n = len(productos)
+    vocab: dict = {}
+    docs, terms = [], []
+    for i, p in enumerate(productos):
+        texto = ' '.join(filter(None, [
+            p.nombre, getattr(p, 'autor', None) if getattr(p, 'autor', None) != 'Desconocido' else None,
+            getattr(p, 'categoria', None), bucket_categoria(p),
+        ]))
+        for tok in normalizar_texto(texto).replace(',', ' ').split():
+            if len(tok) < 3:
+                continue
+            docs.append(i)
+            terms.append(vocab.setdefault(tok, len(vocab)))
+    vacio = (np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float32), 0)
+    if not docs:
+        return vacio
+    v = len(vocab)
+    pares, tf = np.unique(np.asarray(docs, np.int64) * v + np.asarray(terms, np.int64), return_counts=True)
+    d, t = pares // v, pares % v
+    df = np.bincount(t, minlength=v)
+    utiles = np.flatnonzero(df >= 2)
+    if utiles.size == 0:
+        return vacio
+    remap = np.full(v, -1, np.int64)
+    remap[utiles] = np.arange(utiles.size)
+    sel = remap[t] >= 0
+    idf = (np.log((1.0 + n) / (1.0 + df)) + 1.0).astype(np.float32)
+    d, w, t = d[sel], (tf[sel] * idf[t[sel]]).astype(np.float32), remap[t[sel]]
+    normas = np.sqrt(np.bincount(d, weights=w.astype(np.float64) ** 2, minlength=n)).astype(np.float32)
+    return d, t, w / normas[d], int(utiles.size)
+
+
+def _similitud_bloque(inicio: int, fin: int, indptr, terminos, pesos, col_ptr, post_doc, post_peso):
+    """Productos punto de las filas [inicio, fin) contra todos, solo por términos compartidos.
+
+    Cada término de la fila se cruza con su lista invertida: (fila_local, columna, aporte)
+    con repetidos, que el llamador suma con bincount.
+    """
+    a, b = indptr[inicio], indptr[fin]
+    filas = np.repeat(np.arange(fin - inicio), np.diff(indptr[inicio:fin + 1]))
+    t, w = terminos[a:b], pesos[a:b]
+    largo = col_ptr[t + 1] - col_ptr[t]
+    total = int(largo.sum())
+    # posición de cada aporte dentro de post_doc: inicio de la lista del término + desplazamiento
+    desde = np.repeat(col_ptr[t] - (np.cumsum(largo) - largo), largo) + np.arange(total)
+    return np.repeat(filas, largo), post_doc[desde], np.repeat(w, largo) * post_peso[desde]
+
+
+def calcular_relacionados(productos: Sequence[Producto],
+                          lineas: Iterable[Tuple[int, str]],
+                          k: int = RELACIONADOS_K,
+                          peso_compras: float = PESO_COMPRAS) -> List[Fila]:
+    n = len(productos)
+    if n < 2 or k <= 0:
+        return []
+    ids = [str(p.id) for p in productos]
+    posicion = {pid: i for i, pid in enumerate(ids)}
+    filas, cols, conteo, compras = _co_compras(lineas, posicion, n)
+    # Coseno entre columnas de incidencia factura×producto
+    co = conteo / np.sqrt(compras[filas] * compras[cols]).astype(np.float32) if conteo.size else conteo
+    # TF-IDF por filas (CSR) y por términos (lista invertida, CSC)
+    docs, terminos, pesos, v = _tfidf(productos)
+    indptr = np.searchsorted(docs, np.arange(n + 1))
+    orden = np.argsort(terminos, kind='stable')
+    col_ptr = np.searchsorted(terminos[orden], np.arange(v + 1))
+    post_doc, post_peso = docs[orden], pesos[orden]
+
+    k = min(k, n - 1)
+
+    out: List[Fila] = []
+    for inicio in range(0, n, _BLOQUE):
+        fin = min(n, inicio + _BLOQUE)
+        # Solo el bloque es denso (filas del bloque × n), como siempre
+        f_tx, c_tx, s_tx = _similitud_bloque(inicio, fin, indptr, terminos, pesos, col_ptr, post_doc, post_peso)
+        puntajes = np.bincount(f_tx * n + c_tx, weights=s_tx, minlength=(fin - inicio) * n)
+        puntajes = ((1.0 - peso_compras) * puntajes).astype(np.float32).reshape(fin - inicio, n)
+        # filas del COO están ordenadas: recorte del bloque con searchsorted
+        a, b = np.searchsorted(filas, [inicio, fin])
+        puntajes[filas[a:b] - inicio, cols[a:b]] += peso_compras * co[a:b]
+        puntajes[np.arange(fin - inicio), np.arange(inicio, fin)] = -np.inf
+        top = np.argpartition(-puntajes, k - 1, axis=1)[:, :k]
+        top_p = np.take_along_axis(puntajes, top, axis=1)
+        orden = np.argsort(-top_p, axis=1, kind='stable')
+        top = np.take_along_axis(top, orden, axis=1)
+        top_p = np.take_along_axis(top_p, orden, axis=1)
+        for r in range(fin - inicio):
+            pos = 0
+            for j, s in zip(top[r], top_p[r]):
+                if s <= 0:
+                    break
+                out.append((ids[inicio + r], pos, ids[j], round(float(s), 6)))
+                pos += 1
+    return out
+
+
+def recalcular_relacionados(repositorio) -> int:
+    """Recalcula y reemplaza la tabla producto_relacionados. Devuelve filas guardadas
+    (0 sin hacer nada si otro proceso ya está recalculando)."""
+    with bloqueo.exclusivo('relacionados') as libre:
+        if not libre:
+            return 0
+        filas = calcular_relacionados(repositorio.listar_catalogo(), repositorio.lineas_vendidas())
+        repositorio.guardar_relacionados(filas)
+        return len(filas)
+
+
+_tarea = None
+
+
+def iniciar_recalculo_relacionados(repositorio) -> TareaPeriodica:
+    """Arranca (una vez por proceso) el job que recalcula cada RELACIONADOS_INTERVALO segundos;
+    en cada ronda solo ejecuta el worker líder."""
+    global _tarea
+    if _tarea is None:
+        _tarea = TareaPeriodica('relacionados', INTERVALO, lambda: recalcular_relacionados(repositorio),
+                                retraso_inicial=5, lider='relacionados')
+    _tarea.iniciar()
+    return _tarea
@@ -0,0 +1,223 @@
+# servicios/servicio_catalogo/infraestructura/indices/snapshot_catalogo.py
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from servicios.servicio_catalogo.dominio.producto import Producto
+from servicios.servicio_catalogo.dominio.categorias import CANON_CATS, bucket_categoria, normalizar_texto, texto_busqueda
+
+try:
+    import fcntl  # bloqueo entre procesos (Linux/macOS); en Windows se omite
+except Exception:  # pragma: no cover
+    fcntl = None
+
+# ==============================================================================
+# SNAPSHOT DEL CATÁLOGO (archivo SQLite de solo lectura compartido entre workers)
+# Un worker construye el archivo a partir de la DB cuando cambia la versión del
+# catálogo (tabla catalogo_meta) y lo publica con os.replace (swap atómico).
+# Los demás lo abren en modo solo lectura con mmap: las páginas las comparte el
+# sistema operativo y los documentos JSON se leen del archivo sin copiarlos.
+# Todo lo derivado del producto (bucket, texto de búsqueda, orden por nombre) se
+# calcula una vez al construir: cada worker solo carga las columnas numéricas y
+# los ids, sin objetos Producto; la búsqueda por texto corre en SQLite.
+# ==============================================================================
+
+_BASE_DIR = Path(__file__).resolve().parents[4]
+SNAPSHOT_PATH = Path(os.getenv("CATALOGO_SNAPSHOT_PATH") or (_BASE_DIR / "data" / "catalogo_snapshot.sqlite"))
+SNAPSHOT_HABILITADO = os.getenv("CATALOGO_SNAPSHOT", "0").lower() in ("1", "true", "yes")
+_MMAP_BYTES = 256 * 1024 * 1024
+_FORMATO = "3"  # subir si cambia _ESQUEMA o una columna derivada: los archivos de otro formato se reconstruyen
+
+_ESQUEMA = """
+CREATE TABLE meta (clave TEXT PRIMARY KEY, valor TEXT NOT NULL);
+CREATE TABLE productos (
+    pos INTEGER PRIMARY KEY,      -- orden del catálogo (id desc)
+    id TEXT NOT NULL,
+    tipo TEXT NOT NULL,           -- 'Libro' | 'UtilEscolar'
+    nombre TEXT NOT NULL,
+    precio REAL NOT NULL,
+    stock INTEGER NOT NULL,
+    autor TEXT,
+    isbn TEXT,
+    categoria TEXT,
+    material TEXT,
+    bucket INTEGER NOT NULL,      -- índice en CANON_CATS (bucket_categoria del producto completo)
+    categoria_norm TEXT NOT NULL, -- categoría sin acentos (filtro ?categoria=)
+    autor_norm TEXT NOT NULL,     -- autor o marca sin acentos (filtro ?autor=)
+    texto TEXT NOT NULL,          -- texto de búsqueda normalizado (?q=)
+    rango_nombre INTEGER NOT NULL,
+    documento TEXT NOT NULL       -- productos.documento_json
+);
+"""
+
+# Columnas que carga cada worker (en este orden)
+Columnas = Tuple[str, str, float, int, int, str, str, int]
+
+
+# ------------------------------------------------------------------------------
+# Versión del catálogo en la DB principal
+# ------------------------------------------------------------------------------
+def asegurar_tabla_meta(engine) -> None:
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS catalogo_meta (clave VARCHAR PRIMARY KEY, valor INTEGER NOT NULL)"
+            ))
+    except Exception as e:
+        print(f"[WARN] No se pudo verificar/crear tabla catalogo_meta: {e}")
+
+
+def version_catalogo(conn) -> int:
+    row = conn.execute(text("SELECT valor FROM catalogo_meta WHERE clave = 'version'")).first()
+    return int(row[0]) if row else 0
+
+
+def incrementar_version(conn) -> None:
+    """Sube la versión del catálogo (llamar dentro de la transacción de escritura).
+    Un solo UPSERT: dos escrituras concurrentes sobre la tabla vacía no chocan en la PK."""
+    conn.execute(text(
+        "INSERT INTO catalogo_meta (clave, valor) VALUES ('version', 1) "
+        "ON CONFLICT (clave) DO UPDATE SET valor = catalogo_meta.valor + 1"
+    ))
+
+
+# ------------------------------------------------------------------------------
+# Construcción
+# ------------------------------------------------------------------------------
+def construir_snapshot(productos: Iterable[Producto], version: int, destino: Path = SNAPSHOT_PATH) -> Path:
+    """Escribe el snapshot en un temporal y lo publica con os.replace (atómico)."""
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    tmp = destino.with_name(f"{destino.name}.{os.getpid()}.tmp")
+    if tmp.exists():
+        tmp.unlink()
+    productos = list(productos)
+    rango = [0] * len(productos)
+    for r, i in enumerate(sorted(range(len(productos)), key=lambda i: normalizar_texto(productos[i].nombre))):
+        rango[i] = r
+    con = sqlite3.connect(tmp.as_posix())
+    try:
+        con.execute("PRAGMA journal_mode=OFF")
+        con.executescript(_ESQUEMA)
+        con.executemany(
+            "INSERT INTO productos (pos,id,tipo,nombre,precio,stock,autor,isbn,categoria,material,bucket,"
+            "categoria_norm,autor_norm,texto,rango_nombre,documento) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            (
+                (
+                    i, str(p.id), p.__class__.__name__, p.nombre, float(p.precio or 0), int(p.stock or 0),
+                    getattr(p, 'autor', None), getattr(p, 'isbn', None), getattr(p, 'categoria', None),
+                    getattr(p, 'material', None), CANON_CATS.index(bucket_categoria(p)),
+                    normalizar_texto(getattr(p, 'categoria', '') or ''),
+                    normalizar_texto(getattr(p, 'autor', None) or getattr(p, 'marca', None) or ''),
+                    texto_busqueda(p), rango[i], p.documento_json,
+                )
+                for i, p in enumerate(productos)
+            ),
+        )
+        con.executemany("INSERT INTO meta (clave, valor) VALUES (?, ?)",
+                        [("version", str(version)), ("formato", _FORMATO)])
+        con.commit()
+    finally:
+        con.close()
+    os.replace(tmp, destino)
+    return destino
+
+
+# ------------------------------------------------------------------------------
+# Lectura
+# ------------------------------------------------------------------------------
+class SnapshotCatalogo:
+    """Conexión de solo lectura (mmap) a un snapshot publicado."""
+
+    def __init__(self, ruta: Path = SNAPSHOT_PATH):
+        self.ruta = ruta
+        # El descriptor abierto mantiene vivo el archivo aunque otro worker lo reemplace
+        self._con = sqlite3.connect(f"file:{ruta.as_posix()}?mode=ro", uri=True, check_same_thread=False)
+        self._con.execute(f"PRAGMA mmap_size={_MMAP_BYTES}")
+        self._lock = threading.Lock()
+        self.version = int(self._con.execute("SELECT valor FROM meta WHERE clave = 'version'").fetchone()[0])
+
+    def columnas(self) -> List[Columnas]:
+        """(id, tipo, precio, stock, bucket, categoria_norm, autor_norm, rango_nombre) por posición."""
+        with self._lock:
+            return self._con.execute(
+                "SELECT id,tipo,precio,stock,bucket,categoria_norm,autor_norm,rango_nombre FROM productos ORDER BY pos"
+            ).fetchall()
+
+    def posiciones_con(self, tokens: List[str]) -> List[int]:
+        """Posiciones cuyo texto de búsqueda contiene todos los tokens (ya normalizados)."""
+        where = " AND ".join("instr(texto, ?) > 0" for _ in tokens) or "1"
+        with self._lock:
+            return [r[0] for r in self._con.execute(f"SELECT pos FROM productos WHERE {where}", tokens)]
+
+    def filas_sugerencias(self) -> List[Tuple[str, str, Optional[str], Optional[str], int]]:
+        """(id, nombre, autor, categoria, bucket) para construir el índice de autocompletado."""
+        with self._lock:
+            return self._con.execute(
+                "SELECT id,nombre,autor,categoria,bucket FROM productos ORDER BY pos"
+            ).fetchall()
+
+    def json_en(self, indices: Iterable[int]) -> bytes:
+        """Arreglo JSON con los documentos en el orden pedido, concatenado por SQLite."""
+        with self._lock:
+            row = self._con.execute(
+                """
+                SELECT group_concat(documento, ',') FROM (
+                    SELECT p.documento FROM json_each(?) j JOIN productos p ON p.pos = j.value ORDER BY j.key
+                )
+                """,
+                (json.dumps([int(i) for i in indices]),),
+            ).fetchone()
+        return b'[' + (row[0] or '').encode('utf-8') + b']'
+
+    def documentos_en(self, indices: Iterable[int]) -> List[str]:
+        with self._lock:
+            rows = self._con.execute(
+                "SELECT p.documento FROM json_each(?) j JOIN productos p ON p.pos = j.value ORDER BY j.key",
+                (json.dumps([int(i) for i in indices]),),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def cerrar(self) -> None:
+        try:
+            self._con.close()
+        except Exception:
+            pass
+
+
+def _desactualizado(ruta: Path, version: int) -> bool:
+    publicada = _leer_version(ruta)
+    return publicada is None or publicada < version
+
+
+def _leer_version(ruta: Path) -> Optional[int]:
+    """Versión publicada en el archivo; None si no existe o es de otro formato."""
+    try:
+        con = sqlite3.connect(f"file:{ruta.as_posix()}?mode=ro", uri=True)
+        try:
+            meta = dict(con.execute("SELECT clave, valor FROM meta").fetchall())
+        finally:
+            con.close()
+        return int(meta["version"]) if meta.get("formato") == _FORMATO else None
+    except Exception:
+        return None
+
+
+def abrir_snapshot(repositorio, ruta: Path = SNAPSHOT_PATH) -> SnapshotCatalogo:
+    """Abre el snapshot de la versión vigente; si no existe, lo construye (un solo worker a la vez)."""
+    version = repositorio.version_catalogo()
+    if _desactualizado(ruta, version):
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        with open(ruta.with_name(ruta.name + ".lock"), "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            # Otro worker pudo haberlo publicado mientras esperábamos el bloqueo
+            if _desactualizado(ruta, version):
+                construir_snapshot(repositorio.listar_catalogo(), version, ruta)
+    return SnapshotCatalogo(ruta)
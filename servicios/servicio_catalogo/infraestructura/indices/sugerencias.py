@@ -0,0 +1,118 @@
+# servicios/servicio_catalogo/infraestructura/indices/sugerencias.py
+from __future__ import annotations
+
+import heapq
+import math
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+from servicios.servicio_catalogo.dominio.categorias import normalizar_texto
+from servicios.servicio_catalogo.infraestructura.indices.catalogo_columnar import (
+    CatalogoColumnar,
+    obtener_catalogo_columnar,
+)
+
+# ==============================================================================
+# AUTOCOMPLETADO POR PREFIJO
+# Arreglo ordenado de claves sin acentos + bisect. Cada frase se indexa desde el
+# inicio de cada palabra ("reina" encuentra "Biblia Reina Valera"). El peso
+# combina las unidades vendidas (factura_items) con un bonus si el prefijo
+# coincide con el inicio de la frase.
+# ==============================================================================
+
+_FIN = '\uffff'
+_PREFIJO_CORTO = 2  # prefijos de 1-2 letras se memorizan (son los que más candidatos tienen)
+
+
+class IndiceSugerencias:
+    def __init__(self, catalogo: CatalogoColumnar, ventas: Optional[Dict[str, int]] = None):
+        self.catalogo = catalogo
+        ventas = ventas or {}
+
+        # Sugerencias únicas: (tipo, texto) -> [id, unidades vendidas]
+        sugerencias: Dict[Tuple[str, str], List[Any]] = {}
+
+        def agregar(tipo: str, texto: str, pid: Optional[str], unidades: int) -> None:
+            texto = (texto or '').strip()
+            if not texto:
+                return
+            clave = (tipo, texto)
+            if clave in sugerencias:
+                sugerencias[clave][1] += unidades
+            else:
+                sugerencias[clave] = [pid, unidades]
+
+        for pid, nombre, autor, categoria, bucket in catalogo.filas_sugerencias():
+            unidades = int(ventas.get(pid, 0) or 0)
+            agregar('producto', nombre, pid, unidades)
+            if autor and autor != 'Desconocido':
+                agregar('autor', autor, None, unidades)
+            agregar('categoria', bucket, None, unidades)
+            if categoria:
+                agregar('categoria', categoria, None, unidades)
+
+        # Entradas: (clave_normalizada, inicio_de_frase, id_sugerencia)
+        self.items: List[Dict[str, Any]] = []
+        self.pesos: List[float] = []
+        entradas: List[Tuple[str, bool, int]] = []
+        for (tipo, texto), (pid, unidades) in sugerencias.items():
+            sid = len(self.items)
+            item = {'texto': texto, 'tipo': tipo}
+            if pid is not None:
+                item['id'] = pid
+            self.items.append(item)
+            self.pesos.append(math.log1p(unidades))
+            palabras = normalizar_texto(texto).split()
+            for i in range(len(palabras)):
+                entradas.append((' '.join(palabras[i:]), i == 0, sid))
+        entradas.sort()
+        self.claves = [e[0] for e in entradas]
+        self.inicio = [e[1] for e in entradas]
+        self.sids = [e[2] for e in entradas]
+        self._cortos: Dict[Tuple[str, int], List[Dict[str, Any]]] = {}
+
+    def sugerir(self, prefijo: str, limite: int = 8) -> List[Dict[str, Any]]:
+        q = ' '.join(normalizar_texto(prefijo).split())
+        if not q:
+            return []
+        memo = len(q) <= _PREFIJO_CORTO
+        if memo and (q, limite) in self._cortos:
+            return self._cortos[(q, limite)]
+
+        lo = bisect_left(self.claves, q)
+        hi = bisect_left(self.claves, q + _FIN, lo)
+        mejores: Dict[int, float] = {}
+        for i in range(lo, hi):
+            sid = self.sids[i]
+            puntaje = self.pesos[sid] + (1.0 if self.inicio[i] else 0.0)
+            if puntaje > mejores.get(sid, -1.0):
+                mejores[sid] = puntaje
+        top = heapq.nlargest(limite, mejores.items(), key=lambda kv: (kv[1], -len(self.items[kv[0]]['texto'])))
+        out = [self.items[sid] for sid, _ in top]
+        if memo:
+            self._cortos[(q, limite)] = out
+        return out
+
+
+# ------------------------------------------------------------------------------
+# Caché de proceso: se reconstruye cuando cambia el catálogo columnar
+# ------------------------------------------------------------------------------
+_lock = threading.Lock()
+_actual: Optional[IndiceSugerencias] = None
+
+
+def obtener_indice_sugerencias(repositorio) -> IndiceSugerencias:
+    global _actual
+    catalogo = obtener_catalogo_columnar(repositorio)
+    actual = _actual
+    if actual is not None and actual.catalogo is catalogo:
+        return actual
+    with _lock:
+        if _actual is None or _actual.catalogo is not catalogo:
+            try:
+                ventas = repositorio.unidades_vendidas()
+            except Exception:
+                ventas = {}
+            _actual = IndiceSugerencias(catalogo, ventas)
+        return _actual
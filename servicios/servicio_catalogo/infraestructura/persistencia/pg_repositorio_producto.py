@@ -1,15 +1,21 @@
 # servicios/servicio_catalogo/infraestructura/persistencia/pg_repositorio_producto.py
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine, or_, cast, String
+from sqlalchemy import create_engine, delete, insert, or_, cast, func, String
 
 from configuracion import Config
-from inicializar_db import ProductoORM, TipoProductoEnum
+from inicializar_db import ProductoORM, TipoProductoEnum, FacturaItemORM, ProductoRelacionadoORM
 from servicios.servicio_catalogo.dominio.producto import Producto, Libro, UtilEscolar
 from servicios.servicio_catalogo.aplicacion.repositorios.repositorio_producto_interface import IRepositorioProducto
+from servicios.servicio_catalogo.infraestructura.indices.catalogo_columnar import invalidar_catalogo, serializar_documento
+from servicios.servicio_catalogo.infraestructura.indices.snapshot_catalogo import (
+    asegurar_tabla_meta,
+    incrementar_version,
+    version_catalogo,
+)
 from pathlib import Path
 
 # Directorio de imágenes estáticas para productos
@@ -66,6 +72,35 @@ def _validate_or_fallback_image(img, is_libro, nombre, id_prod):
     return ('/static/img/productos/categoria_libros.png' if is_libro else '/static/img/productos/categoria_utiles.png')
 
 
+# Migración defensiva: asegurar columna documento_json y tablas auxiliares del catálogo (una vez por URL de DB)
+_documento_verificado: set = set()
+
+
+def _ensure_documento_column(engine) -> None:
+    url = str(engine.url)
+    if url in _documento_verificado:
+        return
+    asegurar_tabla_meta(engine)
+    try:
+        ProductoRelacionadoORM.__table__.create(engine, checkfirst=True)
+    except Exception as e:
+        print(f"[WARN] No se pudo verificar/crear tabla producto_relacionados: {e}")
+    try:
+        with engine.begin() as conn:
+            if conn.dialect.name == 'sqlite':
+                res = conn.exec_driver_sql("PRAGMA table_info(productos)")
+                cols = [row[1] for row in res]
+            else:
+                res = conn.exec_driver_sql(
+                    "SELECT column_name FROM information_schema.columns WHERE table_name='productos' AND table_schema = current_schema()"
+                )
+                cols = [row[0] for row in res]
+            if cols and 'documento_json' not in cols:
+                conn.exec_driver_sql("ALTER TABLE productos ADD COLUMN documento_json TEXT")
+        _documento_verificado.add(url)
+    except Exception as e:
+        print(f"[WARN] No se pudo verificar/agregar columna documento_json: {e}")
+
 
 class PGRepositorioProducto(IRepositorioProducto):
     """Repositorio de productos usando SQLAlchemy y Postgres (Neon)."""
@@ -74,6 +109,7 @@ class PGRepositorioProducto(IRepositorioProducto):
         self.db_url = db_url or Config.SQLALCHEMY_DATABASE_URI
         self.engine = create_engine(self.db_url, future=True)
         self.Session = sessionmaker(bind=self.engine, autoflush=False, autocommit=False, future=True)
+        _ensure_documento_column(self.engine)
 
     # Utilidad: reconstruir dominio a partir de ORM
     def _to_domain(self, row: ProductoORM) -> Producto:
@@ -92,6 +128,7 @@ class PGRepositorioProducto(IRepositorioProducto):
                 p.portada_url = _preferred_image(getattr(row, 'imagen_url', None), True, getattr(row, 'nombre', None), getattr(row, 'id_producto', None))
             except Exception:
                 pass
+            p.documento_json = getattr(row, 'documento_json', None)
             return p
         else:
             p = UtilEscolar(
@@ -103,10 +140,12 @@ class PGRepositorioProducto(IRepositorioProducto):
                 categoria=row.categoria or '',
                 marca='Generico',
             )
+            p.material = getattr(row, 'material', None)  # búsqueda ?q= y bucket de categoría
             try:
                 p.portada_url = _preferred_image(getattr(row, 'imagen_url', None), False, getattr(row, 'nombre', None), getattr(row, 'id_producto', None))
             except Exception:
                 pass
+            p.documento_json = getattr(row, 'documento_json', None)
             return p
 
     def buscar_productos(self, consulta: str) -> List[Producto]:
@@ -202,7 +241,10 @@ class PGRepositorioProducto(IRepositorioProducto):
             else:
                 row.categoria = getattr(p, 'categoria', None)
                 row.material = getattr(p, 'material', None)
+            row.documento_json = serializar_documento(self._to_domain(row))
+            incrementar_version(s)
             s.commit()
+        invalidar_catalogo()
 
     def obtener_por_id(self, producto_id: str) -> Optional[Producto]:
         with self.Session() as s:
@@ -213,3 +255,108 @@ class PGRepositorioProducto(IRepositorioProducto):
         with self.Session() as s:
             rows = s.query(ProductoORM).order_by(ProductoORM.id_producto.desc()).limit(100).all()
         return [self._to_domain(r) for r in rows]
+
+    def listar_catalogo(self) -> List[Producto]:
+        with self.Session() as s:
+            rows = s.query(ProductoORM).order_by(ProductoORM.id_producto.desc()).all()
+            productos = [self._to_domain(r) for r in rows]
+            # Relleno perezoso de documentos faltantes (filas previas a la columna)
+            pendientes = 0
+            for row, p in zip(rows, productos):
+                if not p.documento_json:
+                    p.documento_json = row.documento_json = serializar_documento(p)
+                    pendientes += 1
+            if pendientes:
+                try:
+                    s.commit()
+                except Exception as e:
+                    s.rollback()
+                    print(f"[WARN] No se pudieron guardar documentos JSON: {e}")
+        return productos
+
+    def regenerar_documentos(self, ids: Optional[Iterable[str]] = None) -> int:
+        """Re-renderiza documento_json (todos o solo `ids`), sube la versión e invalida el catálogo en memoria.
+        Llamar después de cada escritura que no pase por guardar_producto (SQL directo del admin).
+        """
+        with self.Session() as s:
+            q = s.query(ProductoORM)
+            if ids is not None:
+                ids = [str(i) for i in ids]
+                if not ids:
+                    return 0
+                q = q.filter(ProductoORM.id_producto.in_(ids))
+            rows = q.all()
+            for row in rows:
+                row.documento_json = serializar_documento(self._to_domain(row))
+            incrementar_version(s)
+            s.commit()
+        invalidar_catalogo()
+        return len(rows)
+
+    def refrescar_stock(self, ids: Iterable[str]) -> Dict[str, Tuple[int, str]]:
+        """Re-renderiza documento_json de `ids` tras cambiar su stock, sin subir la versión del
+        catálogo. Devuelve {id: (stock, documento_json)} para parchear el catálogo en memoria."""
+        ids = [str(i) for i in ids]
+        if not ids:
+            return {}
+        out: Dict[str, Tuple[int, str]] = {}
+        with self.Session() as s:
+            for row in s.query(ProductoORM).filter(ProductoORM.id_producto.in_(ids)):
+                row.documento_json = serializar_documento(self._to_domain(row))
+                out[row.id_producto] = (int(row.stock or 0), row.documento_json)
+            s.commit()
+        return out
+
+    def publicar_version(self) -> None:
+        """Sube la versión del catálogo: los demás workers (y el snapshot) recargan."""
+        with self.Session() as s:
+            incrementar_version(s)
+            s.commit()
+
+    def lineas_vendidas(self) -> List[Tuple[int, str]]:
+        """(id_factura, producto_id) de cada línea vendida, para la matriz de co-compra."""
+        with self.Session() as s:
+            rows = (
+                s.query(FacturaItemORM.id_factura, FacturaItemORM.producto_id)
+                .filter(FacturaItemORM.producto_id.isnot(None))
+                .all()
+            )
+        return [(int(f), str(p)) for f, p in rows]
+
+    def guardar_relacionados(self, filas: Sequence[Tuple[str, int, str, float]]) -> None:
+        """Reemplaza la tabla producto_relacionados en una sola transacción."""
+        with self.Session() as s:
+            s.execute(delete(ProductoRelacionadoORM))
+            if filas:
+                s.execute(insert(ProductoRelacionadoORM), [
+                    {'producto_id': pid, 'posicion': pos, 'relacionado_id': rid, 'puntaje': puntaje}
+                    for pid, pos, rid, puntaje in filas
+                ])
+            s.commit()
+
+    def obtener_relacionados(self, producto_id: str, limite: int = 10) -> List[str]:
+        with self.Session() as s:
+            rows = (
+                s.query(ProductoRelacionadoORM.relacionado_id)
+                .filter(ProductoRelacionadoORM.producto_id == str(producto_id))
+                .order_by(ProductoRelacionadoORM.posicion)
+                .limit(limite)
+                .all()
+            )
+        return [r[0] for r in rows]
+
+    def version_catalogo(self) -> int:
+        """Versión del catálogo (catalogo_meta); sube con cada escritura."""
+        with self.Session() as s:
+            return version_catalogo(s)
+
+    def unidades_vendidas(self) -> Dict[str, int]:
+        """Unidades vendidas por producto (factura_items), para ponderar popularidad."""
+        with self.Session() as s:
+            rows = (
+                s.query(FacturaItemORM.producto_id, func.sum(FacturaItemORM.cantidad))
+                .filter(FacturaItemORM.producto_id.isnot(None))
+                .group_by(FacturaItemORM.producto_id)
+                .all()
+            )
+        return {str(pid): int(total or 0) for pid, total in rows}
@@ -1,11 +1,18 @@
 # servicios/servicio_catalogo/presentacion/rutas.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from pathlib import Path
+import time
 
 from servicios.servicio_catalogo.aplicacion.casos_uso.obtener_detalles_producto import ObtenerDetallesDelProducto
 from servicios.servicio_catalogo.infraestructura.persistencia.pg_repositorio_producto import PGRepositorioProducto
-import unicodedata
 from servicios.servicio_catalogo.infraestructura.clientes_api.google_books_cliente import GoogleBooksCliente
+from servicios.servicio_catalogo.infraestructura.indices.catalogo_columnar import (
+    CAMPOS_PRODUCTO,
+    obtener_catalogo_columnar,
+)
+from servicios.servicio_catalogo.infraestructura.indices.sugerencias import obtener_indice_sugerencias
+from servicios.servicio_catalogo.infraestructura.analitica import registro_busquedas
+from utils.campos import parsear_campos
 
 catalogo_bp = Blueprint('catalogo', __name__, url_prefix='/api/v1/catalogo')
 
@@ -24,85 +31,100 @@ obtener_detalles_uc = ObtenerDetallesDelProducto(
 # --------------------------------------------------------------------
 # ENDPOINT: LISTAR PRODUCTOS (solo DB)
 # --------------------------------------------------------------------
-def _norm(s: str) -> str:
+def _float_arg(nombre: str):
+    raw = (request.args.get(nombre) or '').strip()
+    if not raw:
+        return None
     try:
-        nf = unicodedata.normalize('NFD', str(s or ''))
-        return ''.join(ch for ch in nf if unicodedata.category(ch) != 'Mn').lower().strip()
-    except Exception:
-        return (str(s or '')).lower().strip()
-
-
-CANON_CATS = [
-    'libros y textos',
-    'insumos de oficina',
-    'arte, manualidades, escritura y colorear',
-    'escolar',
-]
-
-
-def _bucket_category(p) -> str:
-    # Libros siempre a "libros y textos"
-    if p.__class__.__name__ == 'Libro':
-        return 'libros y textos'
-    txt = ' '.join([
-        str(getattr(p, 'nombre', '') or ''),
-        str(getattr(p, 'categoria', '') or ''),
-        str(getattr(p, 'material', '') or ''),
-    ])
-    nt = _norm(txt)
-    # Palabras clave por bucket
-    office = {'pluma', 'boligrafo', 'boligrafos', 'folder', 'clip', 'clips', 'folders', 'oficina', 'marcador', 'marcadores', 'resaltador'}
-    art = {'arte', 'manualidad', 'manualidades', 'pegamento', 'silicon', 'silicona', 'pincel', 'pintura', 'tempera', 'temperas', 'acrilico', 'acrilicos', 'papel crepe', 'crepe', 'cartulina', 'colores', 'crayola', 'crayolas'}
-    school = {'cuaderno', 'cuadernos', 'lapiz', 'lapices', 'lápiz', 'borrador', 'goma', 'sacapuntas', 'regla', 'tijera', 'tijeras', 'hoja', 'hojas', 'libreta'}
-    if any(k in nt for k in office):
-        return 'insumos de oficina'
-    if any(k in nt for k in art):
-        return 'arte, manualidades, escritura y colorear'
-    if any(k in nt for k in school):
-        return 'escolar'
-    # Por defecto, si es util, caer en 'escolar'
-    return 'escolar'
+        return float(raw)
+    except ValueError:
+        return None
+
+
+def _filtros_columnar() -> dict:
+    """Filtros de listado/facetas que se resuelven sobre el catálogo columnar."""
+    return {
+        'tipo': (request.args.get('tipo') or '').strip() or None,  # 'Libro' | 'UtilEscolar'
+        'categoria': (request.args.get('categoria') or '').strip() or None,
+        'autor': (request.args.get('autor') or request.args.get('marca') or '').strip() or None,
+        'precio_min': _float_arg('precio_min'),
+        'precio_max': _float_arg('precio_max'),
+        'en_stock': (request.args.get('en_stock') or '').lower() in ('1', 'true', 'yes'),
+    }
+
+
+LIMITE_LISTADO = 100  # mismo tope que obtener_todos()
+
+
+def _json_bytes(cuerpo: bytes) -> Response:
+    return Response(cuerpo, status=200, mimetype='application/json')
 
 
 @catalogo_bp.route('/productos', methods=['GET'])
 def buscar_productos():
     consulta = (request.args.get('q') or '').strip()
-    categoria = (request.args.get('categoria') or '').strip()
-    tipo = (request.args.get('tipo') or '').strip()  # 'Libro' | 'UtilEscolar'
+    orden = (request.args.get('orden') or '').strip() or None
+    filtros = _filtros_columnar()
+    # ?fields=id,nombre,precio,portada_url → solo esas claves por producto
+    campos, err = parsear_campos(request.args.get('fields'), CAMPOS_PRODUCTO)
+    if err:
+        return jsonify({'error': err}), 400
     try:
-        # Filtrado por categoria/tipo si se solicita
-        if categoria or tipo:
-            productos_db = obtener_detalles_uc.ejecutar_todos()
-            c_norm = _norm(categoria)
-            t_norm = _norm(tipo)
-            filtrados = []
-            for p in productos_db:
-                if t_norm:
-                    pt = _norm(p.__class__.__name__)
-                    if pt != t_norm:
-                        continue
-                if c_norm:
-                    # Si la categoria solicitada es una de las canónicas, usar bucketing
-                    if c_norm in [_norm(x) for x in CANON_CATS]:
-                        if _bucket_category(p) != categoria:
-                            continue
-                    else:
-                        pc = _norm(getattr(p, 'categoria', '') or '')
-                        if pc != c_norm:
-                            continue
-                filtrados.append(p)
-            return jsonify([p.to_dict() for p in filtrados]), 200
-        # Búsqueda por 'q'
-        if consulta:
-            productos_db = obtener_detalles_uc.buscar_productos(consulta)
-        else:
-            productos_db = obtener_detalles_uc.ejecutar_todos()
-        return jsonify([p.to_dict() for p in productos_db]), 200
+        # Las respuestas concatenan los documentos JSON pre-renderizados (productos.documento_json)
+        catalogo = obtener_catalogo_columnar(repositorio_producto)
+        inicio = time.perf_counter()
+        # q/filtros/orden: máscaras vectorizadas + argsort sobre el catálogo en memoria.
+        # Todo ?q= pasa por el mismo matcher (sin acentos), con o sin filtros.
+        if consulta or orden or any(filtros.values()):
+            mascara = catalogo.mascara(q=consulta, **filtros)
+            indices = catalogo.ordenar(mascara, orden)
+            registro_busquedas.registrar('catalogo', consulta, len(indices), (time.perf_counter() - inicio) * 1000)
+            return _json_bytes(catalogo.json_en(indices, campos))
+        return _json_bytes(catalogo.json_en(range(min(len(catalogo), LIMITE_LISTADO)), campos))
     except Exception as e:
         print(f"Error al consultar DB: {e}")
         return jsonify([]), 200
 
 
+# --------------------------------------------------------------------
+# ENDPOINT: FACETAS (conteos por tipo / categoría / banda de precio)
+# --------------------------------------------------------------------
+@catalogo_bp.route('/facets', methods=['GET'])
+def facetas_productos():
+    """Acepta los mismos filtros que /productos (q, tipo, categoria, autor, precio_min, precio_max, en_stock).
+    Respuesta: { total, tipos: [...], categorias: [...], precios: [...], precio_min, precio_max }
+    """
+    consulta = (request.args.get('q') or '').strip()
+    try:
+        catalogo = obtener_catalogo_columnar(repositorio_producto)
+        mascara = catalogo.mascara(q=consulta, **_filtros_columnar())
+        return jsonify(catalogo.facetas(mascara)), 200
+    except Exception as e:
+        print(f"Error al calcular facetas: {e}")
+        return jsonify({'total': 0, 'tipos': [], 'categorias': [], 'precios': []}), 200
+
+
+# --------------------------------------------------------------------
+# ENDPOINT: AUTOCOMPLETADO (nombres, autores y categorías por prefijo)
+# --------------------------------------------------------------------
+@catalogo_bp.route('/suggest', methods=['GET'])
+def sugerir_productos():
+    """Respuesta: { q, items: [ { texto, tipo: 'producto'|'autor'|'categoria', id? } ] }"""
+    consulta = (request.args.get('q') or '').strip()
+    try:
+        limite = max(1, min(int(request.args.get('limit', 8) or 8), 20))
+    except ValueError:
+        limite = 8
+    try:
+        items = obtener_indice_sugerencias(repositorio_producto).sugerir(consulta, limite)
+    except Exception as e:
+        print(f"Error en autocompletado: {e}")
+        items = []
+    resp = jsonify({'q': consulta, 'items': items})
+    resp.headers['Cache-Control'] = 'public, max-age=60'
+    return resp, 200
+
+
 # --------------------------------------------------------------------
 # ENDPOINT: OBTENER DETALLE DE UN PRODUCTO (solo DB)
 # --------------------------------------------------------------------
@@ -117,6 +139,31 @@ def obtener_producto(id_producto: str):
     return jsonify({'error': f'Producto con ID {id_producto} no encontrado.'}), 404
 
 
+# --------------------------------------------------------------------
+# ENDPOINT: PRODUCTOS RELACIONADOS (tabla precalculada por el job)
+# --------------------------------------------------------------------
+@catalogo_bp.route('/productos/<string:id_producto>/relacionados', methods=['GET'])
+def productos_relacionados(id_producto: str):
+    """Respuesta: lista de productos (mismo formato que /productos), solo con stock."""
+    try:
+        limite = max(1, min(int(request.args.get('limit', 6) or 6), 20))
+    except ValueError:
+        limite = 6
+    campos, err = parsear_campos(request.args.get('fields'), CAMPOS_PRODUCTO)
+    if err:
+        return jsonify({'error': err}), 400
+    try:
+        # Se piden de más para compensar los que están sin stock
+        ids = repositorio_producto.obtener_relacionados(id_producto, limite * 2)
+        catalogo = obtener_catalogo_columnar(repositorio_producto)
+        posiciones = [catalogo.posicion[i] for i in ids if i in catalogo.posicion]
+        posiciones = [i for i in posiciones if catalogo.stock[i] > 0][:limite]
+        return _json_bytes(catalogo.json_en(posiciones, campos))
+    except Exception as e:
+        print(f"Error al obtener relacionados: {e}")
+        return jsonify([]), 200
+
+
 # --------------------------------------------------------------------
 # ENDPOINT: LISTAR CATEGORIAS (distintas en DB)
 # --------------------------------------------------------------------
@@ -126,12 +173,8 @@ def listar_categorias():
     Respuesta: { items: [ { categoria: str, total: int } ] }
     """
     try:
-        totals = {c: 0 for c in CANON_CATS}
-        for p in repositorio_producto.obtener_todos():
-            b = _bucket_category(p)
-            if b in totals:
-                totals[b] += 1
-        out = [{ 'categoria': k, 'total': totals[k] } for k in CANON_CATS]
+        catalogo = obtener_catalogo_columnar(repositorio_producto)
+        out = catalogo.facetas(catalogo.mascara())['categorias']
         return jsonify({ 'items': out }), 200
     except Exception as e:
         print(f"Error al listar categorias: {e}")
@@ -83,10 +83,45 @@ document.addEventListener('DOMContentLoaded', () => {
       ...opts
     });
     const data = await res.json().catch(() => ({}));
-    if (!res.ok) throw new Error(data.error || `Error ${res.status}`);
+    if (!res.ok) {
+      const err = new Error(data.error || `Error ${res.status}`);
+      err.status = res.status;
+      err.retryAfter = res.headers.get('Retry-After');
+      throw err;
+    }
     return data;
   }
 
+  // Idempotency-Key: la misma operación (mismo cuerpo) reutiliza su clave mientras no
+  // haya respuesta (timeout, red caída) o el servidor pida reintentar (Retry-After), así
+  // un reintento no duplica facturas ni pagos. Con cualquier otra respuesta se usa una
+  // clave nueva: un error (p. ej. stock insuficiente) no queda "pegado" a la operación.
+  const idemKeys = new Map();
+  function idemKey(body) {
+    if (!idemKeys.has(body)) {
+      const k = (window.crypto && crypto.randomUUID) ? crypto.randomUUID()
+        : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+      idemKeys.set(body, k);
+    }
+    return idemKeys.get(body);
+  }
+  async function postIdempotente(url, payload) {
+    const body = JSON.stringify(payload);
+    const id = `${url}|${body}`;
+    try {
+      const data = await fetchJSON(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'Idempotency-Key': idemKey(id) },
+        body
+      });
+      idemKeys.delete(id);
+      return data;
+    } catch (e) {
+      if (e.status && !e.retryAfter) idemKeys.delete(id);
+      throw e;
+    }
+  }
+
   // ==========================
   // Productos
   // ==========================
@@ -515,9 +550,16 @@ document.addEventListener('DOMContentLoaded', () => {
     } catch {}
   }
 
+  // Avisos de stock que calcula el servidor al cotizar el carrito
+  function avisoCarrito(it) {
+    const txt = { no_disponible: 'Ya no está disponible', agotado: 'Agotado',
+                  stock_insuficiente: `Solo quedan ${it.stock}` }[it.aviso];
+    return txt ? `<div class="muted" style="color:#b45309">${txt}</div>` : '';
+  }
+
   function renderCart(cart) {
     const items = Object.values(cart || {});
-    const total = items.reduce((s, it) => s + (Number(it.precio) || 0) * (it.cantidad || 0), 0);
+    const total = items.reduce((s, it) => s + (Number(it.subtotal) || 0), 0);
 
     if (drawerBody) {
       drawerBody.innerHTML = items.map(it => `
@@ -525,7 +567,8 @@ document.addEventListener('DOMContentLoaded', () => {
           <img src="" alt="${(it.nombre || '').replace(/"/g,'&quot;')}">
           <div style="flex:1">
             <div class="name">${it.nombre || 'Producto'}</div>
-            <div class="price">${fmtQ(it.precio)}</div>
+            <div class="price">${it.precio == null ? '' : fmtQ(it.precio)}</div>
+            ${avisoCarrito(it)}
             <div class="qty">
               <button data-dec="${it.id}">-</button>
               <span>${it.cantidad}</span>
@@ -555,20 +598,20 @@ document.addEventListener('DOMContentLoaded', () => {
     drawerBody?.querySelectorAll('[data-del]').forEach(b => b.onclick = () => removeItem(b.dataset.del));
   }
 
-  async function updateQty(id, delta) {
+  // Cambios del carrito en una sola petición; la respuesta ya trae el carrito cotizado
+  async function cartOps(ops) {
     try {
-      const cart = await fetchJSON('/api/v1/cart');
-      const cur = cart[id]?.cantidad || 0;
-      const next = cur + delta;
-      await fetchJSON('/api/v1/cart/update', { method: 'POST', body: JSON.stringify({ id, cantidad: next }) });
+      const data = await fetchJSON('/api/v1/cart/ops', { method: 'POST', body: JSON.stringify({ ops }) });
+      renderCart(data.cart);
+    } catch (err) {
+      showStatus(err.message || 'No se pudo actualizar el carrito', true);
       loadCart();
-    } catch {}
+    }
   }
 
-  async function removeItem(id) {
-    await fetchJSON('/api/v1/cart/remove', { method: 'POST', body: JSON.stringify({ id }) });
-    loadCart();
-  }
+  function updateQty(id, delta) { return cartOps([{ op: 'add', id, cantidad: delta }]); }
+
+  function removeItem(id) { return cartOps([{ op: 'remove', id }]); }
 
   drawerClear?.addEventListener('click', async () => {
     await fetchJSON('/api/v1/cart/clear', { method: 'POST' });
@@ -579,8 +622,8 @@ document.addEventListener('DOMContentLoaded', () => {
   async function getCartSnapshot() {
     try {
       const cart = await fetchJSON('/api/v1/cart');
-      const arr = Object.values(cart || {});
-      const total = arr.reduce((s, it) => s + (Number(it.precio) || 0) * (it.cantidad || 0), 0);
+      const arr = Object.values(cart || {}).filter(it => it.precio != null);
+      const total = arr.reduce((s, it) => s + (Number(it.subtotal) || 0), 0);
       return { items: arr, total };
     } catch {
       return { items: [], total: 0 };
@@ -746,14 +789,19 @@ document.addEventListener('DOMContentLoaded', () => {
 
     const card   = btn.closest('.product-card');
     const id     = card?.dataset?.id;
-    const nombre = card?.querySelector('.product-name')?.textContent?.trim() || 'Producto';
-    const precio = parseFloat((card?.querySelector('.product-price')?.textContent || 'Q0').replace(/[^\d.]/g, '')) || 0;
-    const img    = card?.querySelector('img')?.getAttribute('src');
+    const precio = parseFloat((card?.querySelector('.product-price')?.textContent || 'Q0').replace(/[^\d.]/g, '')) || null;
 
-    await fetchJSON('/api/v1/cart/add', {
-      method: 'POST',
-      body: JSON.stringify({ id, nombre, precio, portada_url: img, cantidad: 1 })
-    });
+    // El servidor pone nombre, precio e imagen; el precio mostrado solo se envía para detectar si cambió
+    try {
+      await fetchJSON('/api/v1/cart/add', {
+        method: 'POST',
+        body: JSON.stringify({ id, precio, cantidad: 1 })
+      });
+    } catch (err) {
+      showStatus(err.message || 'No se pudo agregar al carrito', true);
+      loadProducts('');
+      return;
+    }
 
     await loadCart();
     openCart();
@@ -782,18 +830,12 @@ document.addEventListener('DOMContentLoaded', () => {
     return data;
   }
   async function crearPaymentIntentStripe(total) {
-    const data = await fetchJSON('/api/v1/payments/stripe/create-payment-intent', {
-      method: 'POST',
-      body: JSON.stringify({ total: Number(total) || 0 })
-    });
+    const data = await postIdempotente('/api/v1/payments/stripe/create-payment-intent', { total: Number(total) || 0 });
     console.log('Stripe clientSecret:', data.clientSecret);
     return data;
   }
   async function crearOrderPayPal(total, currency = 'GTQ') {
-    const data = await fetchJSON('/api/v1/payments/paypal/create-order', {
-      method: 'POST',
-      body: JSON.stringify({ total: Number(total) || 0, currency })
-    });
+    const data = await postIdempotente('/api/v1/payments/paypal/create-order', { total: Number(total) || 0, currency });
     console.log('PayPal order:', data);
     return data;
   }
@@ -805,10 +847,7 @@ document.addEventListener('DOMContentLoaded', () => {
       entrega: entrega || undefined,
       pago: pagoMetodo ? { metodo: pagoMetodo } : undefined,
     };
-    const data = await fetchJSON('/api/v1/facturas', {
-      method: 'POST',
-      body: JSON.stringify(payload)
-    });
+    const data = await postIdempotente('/api/v1/facturas', payload);
     console.log('Factura creada:', data);
     try {
       const snapshot = {
@@ -854,7 +893,7 @@ document.addEventListener('DOMContentLoaded', () => {
   window.crearFacturaLocal = crearFacturaLocal;
   window.enviarChatGPT = enviarChatGPT;
 });
-  const profileOrdersState = { page: 1, from: '', to: '', total: 0, email: '' };
+  const profileOrdersState = { page: 1, from: '', to: '', total: 0, email: '', cursor: null };
   async function loadUserOrders(email, { append = false } = {}){
     const wrap = document.getElementById('profile-orders');
     const moreBtn = document.getElementById('orders-more-btn');
@@ -870,13 +909,16 @@ document.addEventListener('DOMContentLoaded', () => {
       const params = new URLSearchParams();
       params.set('email', profileOrdersState.email);
       params.set('limit', '10');
-      params.set('page', String(page));
+      // 'Ver más' continúa desde el cursor de la página anterior (costo constante)
+      if (append && profileOrdersState.cursor) params.set('cursor', profileOrdersState.cursor);
+      else params.set('page', String(page));
       if (from) params.set('from', from);
       if (to) params.set('to', to);
       const res = await fetchJSON(`/api/v1/facturas?${params.toString()}`);
       const items = (res && res.items) || [];
       profileOrdersState.page = page;
       profileOrdersState.total = (res && res.total) || 0;
+      profileOrdersState.cursor = (res && res.next_cursor) || null;
       profileOrdersState.from = from; profileOrdersState.to = to;
       const html = items.map(it => `
         <div class="order-item" style="border:1px solid var(--border-color);border-radius:8px;padding:.5rem;display:flex;justify-content:space-between;align-items:center;gap:.5rem;">
@@ -906,8 +948,7 @@ document.addEventListener('DOMContentLoaded', () => {
       });
       // Toggle 'Ver más'
       if (moreBtn) {
-        const loaded = profileOrdersState.page * 10;
-        moreBtn.style.display = (loaded < profileOrdersState.total) ? '' : 'none';
+        moreBtn.style.display = profileOrdersState.cursor ? '' : 'none';
         moreBtn.onclick = () => loadUserOrders(profileOrdersState.email, { append: true });
       }
     } catch(e) {
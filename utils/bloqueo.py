@@ -0,0 +1,62 @@
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Dict, Iterator
+
+try:
+    import fcntl  # bloqueo entre procesos (Linux/macOS); en Windows solo vale dentro del proceso
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+# ==============================================================================
+# BLOQUEOS ENTRE PROCESOS
+# flock sobre LOCKS_DIR/<nombre>.lock: coordina los workers de gunicorn y los
+# scripts que corren en el mismo host. El sistema operativo suelta el bloqueo
+# si el proceso muere, así no quedan bloqueos huérfanos.
+# ==============================================================================
+
+LOCKS_DIR = Path(os.getenv("LOCKS_DIR") or (Path(__file__).resolve().parents[1] / "data" / "locks"))
+
+_lideres: Dict[str, IO] = {}
+_lock = threading.Lock()
+
+
+def _abrir(nombre: str) -> IO:
+    LOCKS_DIR.mkdir(parents=True, exist_ok=True)
+    return open(LOCKS_DIR / f"{nombre}.lock", "a+")
+
+
+def _tomar(f: IO) -> bool:
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+@contextmanager
+def exclusivo(nombre: str) -> Iterator[bool]:
+    """`with exclusivo("x") as libre:` — libre es False si otro proceso (u otro hilo) ya lo tiene.
+    No espera: quien llega segundo decide qué hacer."""
+    f = _abrir(nombre)
+    try:
+        yield _tomar(f)
+    finally:
+        f.close()  # cerrar el archivo suelta el flock
+
+
+def es_lider(nombre: str) -> bool:
+    """True si este proceso es el líder de `nombre`. El primero que lo pide se queda con el
+    bloqueo mientras viva; si muere, el siguiente proceso que pregunte lo reemplaza."""
+    with _lock:
+        if nombre in _lideres:
+            return True
+        f = _abrir(f"lider_{nombre}")
+        if not _tomar(f):
+            f.close()
+            return False
+        _lideres[nombre] = f
+        return True
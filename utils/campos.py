@@ -0,0 +1,23 @@
+from typing import Iterable, List, Optional, Tuple
+
+
+def parsear_campos(raw: Optional[str], permitidos: Iterable[str]) -> Tuple[Optional[List[str]], Optional[str]]:
+    """Lee un parámetro `fields=a,b,c` (sparse fieldsets).
+
+    Devuelve (campos, error). `campos` es None si no se pidió proyección (respuesta completa);
+    el orden se conserva y se eliminan duplicados.
+    """
+    raw = (raw or "").strip()
+    if not raw:
+        return None, None
+    permitidos = list(permitidos)
+    campos: List[str] = []
+    invalidos: List[str] = []
+    for c in raw.split(","):
+        c = c.strip()
+        if not c or c in campos:
+            continue
+        (campos if c in permitidos else invalidos).append(c)
+    if invalidos:
+        return None, f"Campos no válidos en 'fields': {', '.join(invalidos)}. Permitidos: {', '.join(permitidos)}"
+    return (campos or None), None
@@ -0,0 +1,160 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+
+from inicializar_db import resolve_db_uri, get_engine_and_session, IdempotenciaORM
+from utils.tareas import TareaPeriodica
+
+# ==============================================================================
+# ALMACÉN DE IDEMPOTENCIA
+# La primera petición con una clave la reserva (INSERT ... ON CONFLICT DO NOTHING,
+# estado 'en_curso'); al terminar se guarda la respuesta. Los reintentos con la
+# misma clave reciben esa respuesta: primero desde un LRU del worker y, si no
+# está, desde la tabla (compartida entre workers). Las claves caducan tras el TTL.
+# ==============================================================================
+
+_TTL_SEG = int(os.getenv("IDEMPOTENCIA_TTL_SEG", "86400"))
+_EN_CURSO_SEG = int(os.getenv("IDEMPOTENCIA_EN_CURSO_SEG", "60"))   # reserva huérfana (worker caído)
+_LRU_MAX = int(os.getenv("IDEMPOTENCIA_LRU", "1000"))
+
+# Resultado de reservar()
+NUEVA, REPETIR, EN_CURSO, CONFLICTO = "nueva", "repetir", "en_curso", "conflicto"
+
+Respuesta = Tuple[int, Optional[str], bytes]  # (status, mimetype, cuerpo)
+
+_engine = None
+_tabla_lista = False
+_cache: "OrderedDict[str, Tuple[str, float, Respuesta]]" = OrderedDict()  # clave -> (huella, expira ts, respuesta)
+_lock = threading.Lock()
+
+
+def _motor():
+    global _engine, _tabla_lista
+    if _engine is None:
+        _engine, _ = get_engine_and_session(resolve_db_uri())
+    if not _tabla_lista:
+        try:
+            IdempotenciaORM.__table__.create(_engine, checkfirst=True)
+        except Exception as e:
+            print(f"[WARN] No se pudo crear idempotencia_claves: {e}")
+        _tabla_lista = True
+        _purga.iniciar()
+    return _engine
+
+
+def clave_de(ambito: str, clave_cliente: str) -> str:
+    return hashlib.sha256(f"{ambito}|{clave_cliente}".encode("utf-8")).hexdigest()
+
+
+def huella_de(cuerpo: bytes) -> str:
+    return hashlib.sha256(cuerpo or b"").hexdigest()
+
+
+def _cachear(clave: str, huella: str, expira: datetime, resp: Respuesta) -> None:
+    with _lock:
+        _cache[clave] = (huella, expira.timestamp(), resp)
+        _cache.move_to_end(clave)
+        while len(_cache) > _LRU_MAX:
+            _cache.popitem(last=False)
+
+
+def _desde_cache(clave: str):
+    with _lock:
+        hit = _cache.get(clave)
+        if hit is None:
+            return None
+        if hit[1] <= datetime.now().timestamp():
+            del _cache[clave]
+            return None
+        _cache.move_to_end(clave)
+        return hit
+
+
+def reservar(clave: str, huella: str) -> Tuple[str, Optional[Respuesta]]:
+    """NUEVA (la petición debe ejecutarse y luego guardar()/liberar()), REPETIR con la respuesta
+    guardada, EN_CURSO (otra petición con la clave no terminó) o CONFLICTO (otra huella)."""
+    hit = _desde_cache(clave)
+    if hit is not None:
+        return (REPETIR, hit[2]) if hit[0] == huella else (CONFLICTO, None)
+
+    ahora = datetime.now()
+    expira = ahora + timedelta(seconds=_TTL_SEG)
+    with _motor().begin() as conn:
+        nueva = conn.execute(
+            text(
+                "INSERT INTO idempotencia_claves (clave, huella, estado, creada_en, expira_en) "
+                "VALUES (:clave, :huella, 'en_curso', :ahora, :expira) "
+                "ON CONFLICT (clave) DO NOTHING RETURNING clave"
+            ),
+            {"clave": clave, "huella": huella, "ahora": ahora, "expira": expira},
+        ).first()
+        if nueva is not None:
+            return NUEVA, None
+
+        fila = conn.execute(
+            text("SELECT huella, estado, status, mimetype, cuerpo, creada_en, expira_en "
+                 "FROM idempotencia_claves WHERE clave = :clave"),
+            {"clave": clave},
+        ).mappings().first()
+        if fila is None:  # purgada entre el INSERT y el SELECT: se trata como nueva en el reintento
+            return EN_CURSO, None
+
+        caducada = _fecha(fila["expira_en"]) <= ahora
+        huerfana = fila["estado"] == "en_curso" and _fecha(fila["creada_en"]) <= ahora - timedelta(seconds=_EN_CURSO_SEG)
+        if caducada or huerfana:
+            # Retomar la clave; condicionado a la fila leída para que solo un reintento la gane
+            tomada = conn.execute(
+                text(
+                    "UPDATE idempotencia_claves SET huella = :huella, estado = 'en_curso', status = NULL, "
+                    "mimetype = NULL, cuerpo = NULL, creada_en = :ahora, expira_en = :expira "
+                    "WHERE clave = :clave AND creada_en = :creada"
+                ),
+                {"clave": clave, "huella": huella, "ahora": ahora, "expira": expira, "creada": fila["creada_en"]},
+            ).rowcount
+            return (NUEVA, None) if tomada else (EN_CURSO, None)
+
+        if fila["huella"] != huella:
+            return CONFLICTO, None
+        if fila["estado"] != "completa":
+            return EN_CURSO, None
+        resp = (int(fila["status"]), fila["mimetype"], bytes(fila["cuerpo"] or b""))
+        _cachear(clave, huella, _fecha(fila["expira_en"]), resp)
+        return REPETIR, resp
+
+
+def guardar(clave: str, huella: str, status: int, mimetype: Optional[str], cuerpo: bytes) -> None:
+    expira = datetime.now() + timedelta(seconds=_TTL_SEG)
+    with _motor().begin() as conn:
+        conn.execute(
+            text("UPDATE idempotencia_claves SET estado = 'completa', status = :status, mimetype = :mimetype, "
+                 "cuerpo = :cuerpo, expira_en = :expira WHERE clave = :clave"),
+            {"clave": clave, "status": status, "mimetype": mimetype, "cuerpo": cuerpo, "expira": expira},
+        )
+    _cachear(clave, huella, expira, (status, mimetype, cuerpo))
+
+
+def liberar(clave: str) -> None:
+    """La petición falló sin respuesta reutilizable (excepción o 5xx): el reintento vuelve a ejecutarse."""
+    with _motor().begin() as conn:
+        conn.execute(text("DELETE FROM idempotencia_claves WHERE clave = :clave AND estado = 'en_curso'"),
+                     {"clave": clave})
+
+
+def purgar() -> int:
+    with _motor().begin() as conn:
+        return conn.execute(text("DELETE FROM idempotencia_claves WHERE expira_en <= :ahora"),
+                            {"ahora": datetime.now()}).rowcount
+
+
+def _fecha(v) -> datetime:
+    # SQLite devuelve texto en SQL crudo
+    return v if isinstance(v, datetime) else datetime.fromisoformat(str(v))
+
+
+_purga = TareaPeriodica("idempotencia_purga", float(os.getenv("IDEMPOTENCIA_PURGA_SEG", "3600")), purgar,
+                        retraso_inicial=60)
@@ -2,8 +2,17 @@ import base64
 import hmac
 import hashlib
 import json
+import os
+import threading
 import time
-from typing import Any, Dict, Tuple
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Tokens ya verificados: digest del token -> (secreto, payload, exp). Un mismo token
+# llega en cada petición del panel admin; así HMAC, base64 y json.loads se hacen una vez.
+_CACHE_MAX = int(os.getenv("JWT_CACHE_MAX", "1024"))
+_cache: "OrderedDict[bytes, Tuple[str, Dict[str, Any], Optional[int]]]" = OrderedDict()
+_lock = threading.Lock()
 
 
 def _b64url_encode(data: bytes) -> str:
@@ -41,7 +50,7 @@ class JWTError(ValueError):
     pass
 
 
-def decode_jwt(token: str, secret: str) -> Dict[str, Any]:
+def _verificar(token: str, secret: str) -> Dict[str, Any]:
     try:
         header_b64, payload_b64, signature = token.split(".")
     except ValueError:
@@ -63,3 +72,22 @@ def decode_jwt(token: str, secret: str) -> Dict[str, Any]:
 
     return payload
 
+
+def decode_jwt(token: str, secret: str) -> Dict[str, Any]:
+    """Verifica el token (firma y exp). Los válidos quedan en un LRU hasta su exp."""
+    clave = hashlib.blake2b(token.encode("utf-8", "replace"), digest_size=16).digest()
+    with _lock:
+        hit = _cache.get(clave)
+        if hit is not None:
+            if hit[0] == secret and (hit[2] is None or int(time.time()) <= hit[2]):
+                _cache.move_to_end(clave)
+                return dict(hit[1])
+            del _cache[clave]  # expirado o firmado con otro secreto: se verifica de nuevo
+
+    payload = _verificar(token, secret)
+    exp = payload.get("exp")
+    with _lock:
+        _cache[clave] = (secret, payload, int(exp) if exp is not None else None)
+        while len(_cache) > _CACHE_MAX:
+            _cache.popitem(last=False)
+    return dict(payload)
@@ -0,0 +1,68 @@
+import threading
+import time
+from typing import Callable, Optional
+
+from utils.bloqueo import es_lider
+
+
+class TareaPeriodica:
+    """Hilo daemon que ejecuta `funcion` cada `intervalo` segundos.
+
+    - iniciar() es idempotente (una sola vez por proceso/worker).
+    - despertar() adelanta la siguiente ejecución (p.ej. tras una escritura).
+    - Los errores se registran y no detienen el hilo.
+    - Con `lider`, el hilo corre en todos los workers pero solo ejecuta la tarea el que
+      tiene el bloqueo de líder (utils.bloqueo.es_lider); si ese worker muere, otro lo toma.
+    """
+
+    def __init__(self, nombre: str, intervalo: float, funcion: Callable[[], None], retraso_inicial: float = 0.0,
+                 lider: Optional[str] = None):
+        self.nombre = nombre
+        self.intervalo = float(intervalo)
+        self.funcion = funcion
+        self.retraso_inicial = float(retraso_inicial)
+        self.lider = lider
+        self.ultima_ejecucion: Optional[float] = None
+        self.ultimo_error: Optional[str] = None
+        self._hilo: Optional[threading.Thread] = None
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._lock = threading.Lock()
+
+    def iniciar(self) -> bool:
+        if self.intervalo <= 0:
+            return False
+        with self._lock:
+            if self._hilo is not None and self._hilo.is_alive():
+                return False
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._bucle, name=self.nombre, daemon=True)
+            self._hilo.start()
+            return True
+
+    def despertar(self) -> None:
+        self._despertar.set()
+
+    def detener(self) -> None:
+        self._detener.set()
+        self._despertar.set()
+
+    def ejecutar_ahora(self) -> None:
+        """Ejecuta la tarea en el hilo actual (scripts, admin, pruebas)."""
+        try:
+            self.funcion()
+            self.ultimo_error = None
+        except Exception as e:
+            self.ultimo_error = str(e)
+            print(f"[WARN] Tarea '{self.nombre}' falló: {e}")
+        finally:
+            self.ultima_ejecucion = time.time()
+
+    def _bucle(self) -> None:
+        if self.retraso_inicial > 0:
+            self._despertar.wait(self.retraso_inicial)
+        while not self._detener.is_set():
+            self._despertar.clear()
+            if self.lider is None or es_lider(self.lider):
+                self.ejecutar_ahora()
+            self._despertar.wait(self.intervalo)